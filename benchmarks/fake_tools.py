@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""Fake fio, rados, rbd, radosgw-admin and swift-bench executables.
+
+They print output shaped like the real tools at a configurable scale, so
+the charm's result processing can be exercised without a Ceph cluster.
+Install them in a directory put first on PATH:
+
+    python3 benchmarks/fake_tools.py install /tmp/fake-bin
+    PATH=/tmp/fake-bin:$PATH FAKE_JOBS=256 fio --output-format=json rbd.fio
+
+The scale is set through the environment:
+
+    FAKE_JOBS     fio jobs reported, defaults to the jobs of the job file
+    FAKE_SECONDS  seconds of progress lines of rados bench and rbd bench,
+                  defaults to the requested run time
+    FAKE_ERRORS   error lines printed among the output (error storm)
+    FAKE_EXIT     exit code, the output is printed anyway
+    FAKE_SEED     seed of the generated figures
+"""
+
+import collections
+import json
+import os
+import random
+import stat
+import sys
+
+TOOLS = ("fio", "rados", "rbd", "radosgw-admin", "swift-bench")
+PERCENTILES = (
+    "1.000000", "5.000000", "10.000000", "20.000000", "30.000000",
+    "40.000000", "50.000000", "60.000000", "70.000000", "80.000000",
+    "90.000000", "95.000000", "99.000000", "99.500000", "99.900000",
+    "99.950000", "99.990000")
+
+
+def _env(name, default=0):
+    return int(os.environ.get(name) or default)
+
+
+def _latency(rng, mean):
+    _stddev = mean * rng.uniform(0.1, 0.5)
+    _values = sorted(max(1000, int(rng.gauss(mean, _stddev)))
+                     for _ in PERCENTILES)
+    return {
+        "min": _values[0] // 2,
+        "max": _values[-1] * 4,
+        "mean": float(mean),
+        "stddev": _stddev,
+        "N": 0,
+        "percentile": dict(zip(PERCENTILES, _values))}
+
+
+def _fio_direction(rng, active, runtime_ms):
+    if not active:
+        _empty = _latency(rng, 0)
+        _empty.update(min=0, max=0, mean=0.0, stddev=0.0)
+        return {
+            "io_bytes": 0, "io_kbytes": 0, "bw_bytes": 0, "bw": 0,
+            "iops": 0.0, "runtime": 0, "total_ios": 0, "short_ios": 0,
+            "drop_ios": 0,
+            "slat_ns": {"min": 0, "max": 0, "mean": 0.0, "stddev": 0.0,
+                        "N": 0},
+            "clat_ns": _empty,
+            "lat_ns": {"min": 0, "max": 0, "mean": 0.0, "stddev": 0.0,
+                       "N": 0},
+            "bw_min": 0, "bw_max": 0, "bw_agg": 0.0, "bw_mean": 0.0,
+            "bw_dev": 0.0, "bw_samples": 0, "iops_min": 0, "iops_max": 0,
+            "iops_mean": 0.0, "iops_stddev": 0.0, "iops_samples": 0}
+    _iops = rng.uniform(500, 50000)
+    _bw = int(_iops * 4)
+    _total = int(_iops * runtime_ms / 1000)
+    _clat = _latency(rng, rng.uniform(2e5, 5e6))
+    _clat["N"] = _total
+    return {
+        "io_bytes": _total * 4096, "io_kbytes": _total * 4,
+        "bw_bytes": _bw * 1024, "bw": _bw, "iops": _iops,
+        "runtime": runtime_ms, "total_ios": _total, "short_ios": 0,
+        "drop_ios": 0,
+        "slat_ns": {"min": 1000, "max": 90000, "mean": 4000.0,
+                    "stddev": 1500.0, "N": _total},
+        "clat_ns": _clat,
+        "lat_ns": {"min": _clat["min"] + 1000, "max": _clat["max"] + 90000,
+                   "mean": _clat["mean"] + 4000.0,
+                   "stddev": _clat["stddev"], "N": _total},
+        "bw_min": int(_bw * 0.8), "bw_max": int(_bw * 1.2), "bw_agg": 100.0,
+        "bw_mean": float(_bw), "bw_dev": _bw * 0.05,
+        "bw_samples": runtime_ms // 500, "iops_min": int(_iops * 0.8),
+        "iops_max": int(_iops * 1.2), "iops_mean": _iops,
+        "iops_stddev": _iops * 0.05, "iops_samples": runtime_ms // 500}
+
+
+def _fio_job_names(job_file):
+    try:
+        with open(job_file) as fh:
+            _sections = [line.strip()[1:-1] for line in fh
+                         if line.strip().startswith("[")]
+    except OSError:
+        return ["job"]
+    return [s for s in _sections if s != "global"] or ["job"]
+
+
+def fio_output(rng, jobs, operation="randrw", runtime=30):
+    """fio --output-format=json output.
+
+    :param jobs: Job names
+    :type jobs: List[str]
+    :rtype: str
+    """
+    _runtime_ms = runtime * 1000
+    _read = "read" in operation or "rw" in operation
+    _write = "write" in operation or "rw" in operation
+    _jobs = []
+    for index, name in enumerate(jobs):
+        _jobs.append({
+            "jobname": name,
+            "groupid": index,
+            "error": 0,
+            "eta": 0,
+            "elapsed": runtime + 1,
+            "job options": {"rw": operation, "bs": "4k", "iodepth": "32"},
+            "read": _fio_direction(rng, _read, _runtime_ms),
+            "write": _fio_direction(rng, _write, _runtime_ms),
+            "trim": _fio_direction(rng, False, _runtime_ms),
+            "sync": {"total_ios": 0,
+                     "lat_ns": {"min": 0, "max": 0, "mean": 0.0,
+                                "stddev": 0.0, "N": 0}},
+            "job_runtime": _runtime_ms,
+            "usr_cpu": rng.uniform(1, 20),
+            "sys_cpu": rng.uniform(1, 20),
+            "ctx": rng.randrange(10 ** 6),
+            "majf": 0,
+            "minf": rng.randrange(1000),
+            "iodepth_level": {"1": 0.1, "2": 0.1, "4": 0.1, "8": 0.1,
+                              "16": 0.1, "32": 99.5, ">=64": 0.0},
+            "iodepth_submit": {"0": 0.0, "4": 100.0, "8": 0.0, "16": 0.0,
+                               "32": 0.0, "64": 0.0, ">=64": 0.0},
+            "iodepth_complete": {"0": 0.0, "4": 99.9, "8": 0.1,
+                                 "16": 0.0, "32": 0.0, "64": 0.0,
+                                 ">=64": 0.0},
+            "latency_ns": {"2": 0.0, "4": 0.0, "10": 0.0, "20": 0.0,
+                           "50": 0.0, "100": 0.0, "250": 0.0, "500": 0.0,
+                           "750": 0.0, "1000": 0.0},
+            "latency_us": {"2": 0.0, "4": 0.0, "10": 0.0, "20": 0.0,
+                           "50": 0.0, "100": 0.01, "250": 5.0, "500": 40.0,
+                           "750": 30.0, "1000": 10.0},
+            "latency_ms": {"2": 10.0, "4": 4.0, "10": 0.9, "20": 0.05,
+                           "50": 0.04, "100": 0.01, "250": 0.0, "500": 0.0,
+                           "750": 0.0, "1000": 0.0, "2000": 0.0,
+                           ">=2000": 0.0},
+            "latency_depth": 32,
+            "latency_target": 0,
+            "latency_percentile": 100.0,
+            "latency_window": 0})
+    return json.dumps({
+        "fio version": "fio-3.28",
+        "timestamp": 1700000000,
+        "timestamp_ms": 1700000000000,
+        "time": "Tue Nov 14 22:13:20 2023",
+        "global options": {"rw": operation, "bs": "4k"},
+        "jobs": _jobs,
+        "disk_util": []}, indent=2)
+
+
+def rados_bench_output(rng, seconds, operation="write", concurrency=16,
+                       size=4194304):
+    """rados bench output."""
+    _lines = []
+    if operation == "write":
+        _lines += [
+            "hints = 1",
+            "Maintaining {} concurrent writes of {} bytes to objects of size "
+            "{} for up to {} seconds or 0 objects".format(
+                concurrency, size, size, seconds),
+            "Object prefix: benchmark_data_fakehost_{}".format(os.getpid())]
+    _header = ("  sec Cur ops   started  finished  avg MB/s  cur MB/s "
+               "last lat(s)  avg lat(s)")
+    _finished = 0
+    _bandwidth = rng.uniform(100, 1000)
+    for second in range(seconds + 1):
+        if second % 20 == 0:
+            _lines.append(_header)
+        _current = rng.randrange(int(_bandwidth * 0.8 * 1048576 / size),
+                                 int(_bandwidth * 1.2 * 1048576 / size) + 2)
+        _finished += _current if second else 0
+        _lines.append("{:>5} {:>7} {:>9} {:>9} {:>9.5g} {:>9.5g} {:>11} "
+                      "{:>11}".format(
+                          second, concurrency, _finished + concurrency,
+                          _finished,
+                          _finished * size / 1048576 / max(second, 1),
+                          _current * size / 1048576,
+                          "{:.6f}".format(rng.uniform(0.01, 0.9)),
+                          "{:.6f}".format(rng.uniform(0.1, 0.5))))
+    _iops = _finished / max(seconds, 1)
+    _kind = "writes" if operation == "write" else "reads"
+    _lines += [
+        "Total time run:         {:.4f}".format(seconds + 0.2958),
+        "Total {} made:      {}".format(_kind, _finished),
+        "{} size:             {}".format(
+            "Write" if operation == "write" else "Read", size),
+        "Object size:            {}".format(size),
+        "Bandwidth (MB/sec):     {:.3f}".format(
+            _finished * size / 1048576 / max(seconds, 1)),
+        "Stddev Bandwidth:       {:.4f}".format(_bandwidth * 0.05),
+        "Max bandwidth (MB/sec): {}".format(int(_bandwidth * 1.2)),
+        "Min bandwidth (MB/sec): {}".format(int(_bandwidth * 0.8)),
+        "Average IOPS:           {}".format(int(_iops)),
+        "Stddev IOPS:            {:.5f}".format(_iops * 0.05),
+        "Max IOPS:               {}".format(int(_iops * 1.2)),
+        "Min IOPS:               {}".format(int(_iops * 0.8)),
+        "Average Latency(s):     {:.6f}".format(concurrency / _iops
+                                                if _iops else 0),
+        "Stddev Latency(s):      {:.6f}".format(rng.uniform(0.01, 0.1)),
+        "Max latency(s):         {:.6f}".format(rng.uniform(0.5, 2)),
+        "Min latency(s):         {:.6f}".format(rng.uniform(0.01, 0.1))]
+    return "\n".join(_lines) + "\n"
+
+
+def rbd_bench_output(rng, seconds, operation="write", threads=16,
+                     io_size=4096):
+    """rbd bench output."""
+    _lines = [
+        "bench  type {} io_size {} io_threads {} bytes 1073741824 pattern "
+        "sequential".format(operation, io_size, threads),
+        "  SEC       OPS   OPS/SEC   BYTES/SEC"]
+    _ops = 0
+    _rate = rng.uniform(5000, 50000)
+    for second in range(1, seconds + 1):
+        _current = _rate * rng.uniform(0.8, 1.2)
+        _ops += int(_current)
+        _lines.append("{:>5} {:>9} {:>9.2f} {:>7.0f} MiB/s".format(
+            second, _ops, _current, _current * io_size / 1048576))
+    _lines.append(
+        "elapsed: {}   ops: {}   ops/sec: {:.2f}   bytes/sec: {:.0f} "
+        "MiB/s".format(seconds, _ops, _ops / max(seconds, 1),
+                       _ops / max(seconds, 1) * io_size / 1048576))
+    return "\n".join(_lines) + "\n"
+
+
+def swift_bench_output(rng, seconds=30, errors=0):
+    """swift-bench output, printed on stderr by the real tool.
+
+    Error lines are spread over the progress lines.
+    """
+    _lines = []
+    _stamp = "2023-11-14 22:{:02d}:{:02d},{:03d}"
+    _progress = max(1, seconds // 15)
+    _errors = collections.Counter(
+        rng.randrange(_progress * 3) for _ in range(errors))
+    _index = 0
+    for phase, count in (("PUTS", 1000), ("GETS", 10000), ("DEL", 1000)):
+        for step in range(_progress):
+            _when = _stamp.format(step // 60 % 60, step % 60,
+                                  rng.randrange(1000))
+            _lines.append(
+                "swift-bench {} INFO {} {} [0 failures], {:.1f}/s".format(
+                    _when, count * (step + 1) // _progress, phase,
+                    rng.uniform(50, 500)))
+            _lines += [
+                "swift-bench {} ERROR Connection reset by peer: "
+                "PUT /v1/AUTH_benchmark/container/object_{}".format(
+                    _when, rng.randrange(count))
+                for _ in range(_errors[_index])]
+            _index += 1
+        _lines.append(
+            "swift-bench {} INFO {} {} **FINAL** [{} failures], "
+            "{:.1f}/s".format(
+                _stamp.format(59, 59, 999), count, phase,
+                errors if phase == "PUTS" else 0, rng.uniform(50, 500)))
+    return "\n".join(_lines) + "\n"
+
+
+def radosgw_user(uid):
+    """radosgw-admin user info output."""
+    return json.dumps({
+        "user_id": uid,
+        "display_name": uid,
+        "email": "",
+        "suspended": 0,
+        "max_buckets": 0,
+        "subusers": [{"id": "{}:swift".format(uid),
+                      "permissions": "full-control"}],
+        "keys": [],
+        "swift_keys": [{"user": "{}:swift".format(uid),
+                        "secret_key": "guessme"}],
+        "caps": [],
+        "op_mask": "read, write, delete",
+        "default_placement": "",
+        "placement_tags": [],
+        "bucket_quota": {"enabled": False, "max_size": -1,
+                         "max_objects": -1},
+        "user_quota": {"enabled": False, "max_size": -1,
+                       "max_objects": -1},
+        "temp_url_keys": [],
+        "type": "rgw",
+        "mfa_ids": []}, indent=4)
+
+
+def _option(args, names, default=None):
+    for index, arg in enumerate(args):
+        for name in names:
+            if arg == name and index + 1 < len(args):
+                return args[index + 1]
+            if arg.startswith(name + "="):
+                return arg.split("=", 1)[1]
+    return default
+
+
+def _positional(args):
+    # Options with a value of the fake tools' callers
+    _valued = {"-n", "-p", "-b", "-t", "-c", "--pool", "--size",
+               "--io-type", "--io-size", "--io-threads", "--io-total",
+               "--run-name", "--format", "--bucket", "--io-pattern"}
+    _args = []
+    _skip = False
+    for arg in args:
+        if _skip:
+            _skip = False
+        elif arg in _valued:
+            _skip = True
+        elif not arg.startswith("-"):
+            _args.append(arg)
+    return _args
+
+
+def run(tool, args):
+    """Output, error output and exit code of a fake tool.
+
+    :param tool: One of TOOLS
+    :type tool: str
+    :param args: Command line arguments
+    :type args: List[str]
+    :rtype: Tuple[str, str, int]
+    """
+    rng = random.Random(_env("FAKE_SEED", 0))
+    _errors = _env("FAKE_ERRORS")
+    _stderr = "".join(
+        "2023-11-14T22:13:20.000+0000 7f0000000000 -1 {}: error {}: "
+        "(5) Input/output error\n".format(tool, index)
+        for index in range(_errors))
+    _positionals = _positional(args)
+    if tool == "fio":
+        _job_file = _positionals[-1] if _positionals else ""
+        _names = _fio_job_names(_job_file)
+        _jobs = _env("FAKE_JOBS", len(_names))
+        _names = (_names * (_jobs // len(_names) + 1))[:_jobs]
+        _stdout = fio_output(
+            rng, ["{}-{}".format(n, i) for i, n in enumerate(_names)],
+            runtime=_env("FAKE_SECONDS", 30))
+    elif tool == "rados" and _positionals[:1] != ["bench"]:
+        _stdout = ""
+    elif tool == "rados":
+        # rados bench <seconds> <write|seq|rand>
+        _seconds = int(_positionals[1]) if len(_positionals) > 1 else 10
+        _stdout = rados_bench_output(
+            rng, _env("FAKE_SECONDS", _seconds),
+            _positionals[2] if len(_positionals) > 2 else "write",
+            int(_option(args, ["-t"], 16)),
+            int(_option(args, ["-b"], 4194304)))
+    elif tool == "rbd":
+        if _positionals[:1] != ["bench"]:
+            _stdout = ""
+        else:
+            _stdout = rbd_bench_output(
+                rng, _env("FAKE_SECONDS", 10),
+                _option(args, ["--io-type"], "write"))
+    elif tool == "radosgw-admin":
+        _stdout = radosgw_user(_option(args, ["--uid"], "benchmark"))
+    elif tool == "swift-bench":
+        # swift-bench logs everything, errors included, on stderr
+        _stdout = ""
+        _stderr = swift_bench_output(
+            rng, _env("FAKE_SECONDS", 30), _errors)
+    else:
+        raise ValueError("Unknown tool {}".format(tool))
+    return _stdout, _stderr, _env("FAKE_EXIT")
+
+
+def install(path):
+    """Write the fake executables into a directory.
+
+    :param path: Directory to put first on PATH
+    :type path: str
+    """
+    os.makedirs(path, exist_ok=True)
+    for tool in TOOLS:
+        _path = os.path.join(path, tool)
+        with open(_path, "w") as fh:
+            fh.write('#!/bin/sh\nexec "{}" "{}" {} "$@"\n'.format(
+                sys.executable, os.path.abspath(__file__), tool))
+        os.chmod(_path, os.stat(_path).st_mode | stat.S_IXUSR |
+                 stat.S_IXGRP | stat.S_IXOTH)
+
+
+def main():
+    if len(sys.argv) == 3 and sys.argv[1] == "install":
+        install(sys.argv[2])
+        return
+    if len(sys.argv) < 2 or sys.argv[1] not in TOOLS:
+        sys.exit("usage: {} install DIR | {{{}}} [ARGS...]".format(
+            sys.argv[0], ",".join(TOOLS)))
+    _stdout, _stderr, _code = run(sys.argv[1], sys.argv[2:])
+    sys.stdout.write(_stdout)
+    sys.stderr.write(_stderr)
+    sys.exit(_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Measure charm import and hook dispatch time per hook type.
+
+Every sample runs in a fresh interpreter, as Juju does for each hook, and
+reports the time spent importing charm.py, initialising the charm and
+dispatching the hook through the ops testing harness.
+
+    python3 benchmarks/hook_startup.py --repeat 10
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+CHARM_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Hook name to the harness calls dispatching it
+HOOKS = {
+    "update-status": "harness.charm.on.update_status.emit()",
+    "config-changed": "harness.charm.on.config_changed.emit()",
+    "leader-elected": "harness.set_leader(True)",
+    "peers-relation-changed": (
+        "rel = harness.add_relation('peers', harness.model.app.name)\n"
+        "harness.add_relation_unit(rel, harness.model.app.name + '/1')\n"
+        "harness.update_relation_data(\n"
+        "    rel, harness.model.app.name + '/1',\n"
+        "    {'ingress-address': '10.0.0.2'})"),
+    "ceph-client-relation-changed": (
+        "rel = harness.add_relation('ceph-client', 'ceph-mon')\n"
+        "harness.add_relation_unit(rel, 'ceph-mon/0')\n"
+        "harness.update_relation_data(\n"
+        "    rel, 'ceph-mon/0', {'auth': 'cephx'})"),
+}
+
+SAMPLE = """
+import sys
+import time
+_start = time.perf_counter()
+sys.path[:0] = ["src", "lib"]
+import yaml
+import charm
+from ops.testing import Harness
+_imported = time.perf_counter()
+harness = Harness(
+    charm.WoodpeckerCharmOcto,
+    meta=open("metadata.yaml").read(),
+    actions=open("actions.yaml").read())
+harness.begin()
+harness.update_config({{
+    k: v.get("default")
+    for k, v in yaml.safe_load(open("config.yaml"))["options"].items()
+    if v.get("default") is not None}})
+_initialised = time.perf_counter()
+{hook}
+_dispatched = time.perf_counter()
+print("{{}} {{}} {{}}".format(
+    _imported - _start, _initialised - _imported, _dispatched - _initialised))
+"""
+
+
+def sample(hook):
+    """Time one dispatch of hook in a fresh interpreter.
+
+    :returns: Import, init and dispatch time in milliseconds
+    :rtype: Tuple[float, float, float]
+    """
+    _output = subprocess.check_output(
+        [sys.executable, "-c", SAMPLE.format(hook=HOOKS[hook])],
+        cwd=CHARM_DIR, stderr=subprocess.PIPE)
+    return tuple(
+        float(v) * 1000 for v in _output.decode("UTF-8").split()[-3:])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("hooks", nargs="*", default=sorted(HOOKS))
+    args = parser.parse_args()
+
+    _results = {}
+    for hook in args.hooks:
+        try:
+            _samples = [sample(hook) for _ in range(args.repeat)]
+        except subprocess.CalledProcessError as e:
+            _results[hook] = {"error": e.stderr.decode("UTF-8")[-500:]}
+            continue
+        _results[hook] = {
+            phase: statistics.median(s[index] for s in _samples)
+            for index, phase in enumerate(("import", "init", "dispatch"))}
+
+    if args.json:
+        print(json.dumps(_results, indent=2))
+        return
+    print("{:<30} {:>10} {:>10} {:>10}  (median ms)".format(
+        "hook", "import", "init", "dispatch"))
+    for hook, result in _results.items():
+        if "error" in result:
+            print("{:<30} error: {}".format(
+                hook, (result["error"].splitlines() or [""])[-1]))
+            continue
+        print("{:<30} {:>10.1f} {:>10.1f} {:>10.1f}".format(
+            hook, result["import"], result["init"], result["dispatch"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""Measure the charm's result processing on the output of fake tools.
+
+Every stage, from parsing the raw output of fio, rados bench, rbd bench and
+swift-bench to updating the Prometheus gauges, is timed at several scales
+with the fake tools of fake_tools.py, so no Ceph cluster is needed. The
+time per call, parse throughput and peak memory of each stage are reported
+and can be compared with a previous run to catch regressions.
+
+    python3 benchmarks/result_pipeline.py --json > before.json
+    python3 benchmarks/result_pipeline.py --compare before.json
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+CHARM_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(CHARM_DIR, "src"),
+                os.path.join(CHARM_DIR, "lib"),
+                os.path.dirname(os.path.abspath(__file__))]
+
+import fake_tools  # noqa: E402
+
+# Scales of every stage, the first ones are used by --quick
+FIO_JOBS = (1, 64, 1024)
+BENCH_SECONDS = (60, 3600, 86400)
+SWIFT_ERRORS = (0, 1000, 100000)
+METRIC_UPDATES = (1000,)
+
+
+def make_charm():
+    """Charm instance run through the ops testing harness."""
+    import yaml
+    from ops.testing import Harness
+    import charm
+    _cwd = os.getcwd()
+    os.chdir(CHARM_DIR)
+    try:
+        harness = Harness(
+            charm.WoodpeckerCharmOcto,
+            meta=open("metadata.yaml").read(),
+            actions=open("actions.yaml").read())
+        harness.begin()
+        harness.update_config({
+            k: v.get("default")
+            for k, v in yaml.safe_load(open("config.yaml"))["options"].items()
+            if v.get("default") is not None})
+    finally:
+        os.chdir(_cwd)
+    return harness.charm
+
+
+def cases(charm, quick=False, bin_dir=None):
+    """Stages to measure.
+
+    :returns: Stage name, scale, input size (bytes) and the call to time
+    :rtype: List[Tuple[str, str, int, Callable[[], Any]]]
+    """
+    import bench_stats
+    rng = random.Random(0)
+    _scales = (lambda s: s[:2]) if quick else (lambda s: s)
+    _cases = []
+    for jobs in _scales(FIO_JOBS):
+        _output = fake_tools.fio_output(
+            rng, ["job-{}".format(i) for i in range(jobs)])
+        _result = json.loads(_output)
+        _scale = "{} jobs".format(jobs)
+        _cases += [
+            ("fio-json", _scale, len(_output),
+             lambda o=_output: bench_stats.fio_totals(json.loads(o))),
+            ("fio-metrics", _scale, len(_output),
+             lambda r=_result: charm.add_fio_metrics(r)),
+            ("fio-image-totals", _scale, len(_output),
+             lambda r=_result: charm.fio_image_totals(r))]
+    for seconds in _scales(BENCH_SECONDS):
+        _scale = "{} s".format(seconds)
+        _rados = fake_tools.rados_bench_output(rng, seconds)
+        _rbd = fake_tools.rbd_bench_output(rng, seconds)
+        _cases += [
+            ("rados-bench", _scale, len(_rados),
+             lambda o=_rados: charm.parse_rados_bench_output(o)),
+            ("rbd-bench", _scale, len(_rbd),
+             lambda o=_rbd: charm.parse_rbd_bench_output(o))]
+    for errors in _scales(SWIFT_ERRORS):
+        _swift = fake_tools.swift_bench_output(rng, 3600, errors)
+        _cases.append((
+            "swift-bench", "{} errors".format(errors), len(_swift),
+            lambda o=_swift: charm.parse_swift_bench_output(o)))
+    for updates in METRIC_UPDATES:
+
+        def _update(updates=updates):
+            for index in range(updates):
+                charm.add_benchmark_metric(
+                    "pipeline_metric_{}".format(index % 16),
+                    "Result pipeline benchmark metric", index)
+
+        _cases.append((
+            "metric-update", "{} updates".format(updates), 0, _update))
+    if bin_dir:
+        # The whole fio path: run the tool, decode, aggregate and export
+        import bench_tools
+        _bench = bench_tools.BenchTools(charm)
+        _job_file = os.path.join(CHARM_DIR, "templates", "disk.fio")
+        for jobs in _scales(FIO_JOBS):
+
+            def _end_to_end(jobs=jobs):
+                os.environ["FAKE_JOBS"] = str(jobs)
+                _result = json.loads(_bench.fio(_job_file))
+                charm.add_fio_metrics(_result)
+                return bench_stats.fio_totals(_result)
+
+            _cases.append((
+                "fio-end-to-end", "{} jobs".format(jobs), 0, _end_to_end))
+    return _cases
+
+
+def measure(call, repeat, min_time=0.2):
+    """Time a call.
+
+    :returns: Median time per call (s) and peak memory (bytes)
+    :rtype: Tuple[float, int]
+    """
+    # Calls per sample, so fast stages are not lost in timer resolution
+    _start = time.perf_counter()
+    call()
+    _once = max(time.perf_counter() - _start, 1e-9)
+    _loops = max(1, int(min_time / _once))
+    _samples = []
+    for _ in range(repeat):
+        _start = time.perf_counter()
+        for _ in range(_loops):
+            call()
+        _samples.append((time.perf_counter() - _start) / _loops)
+    tracemalloc.start()
+    try:
+        call()
+        _peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return statistics.median(_samples), _peak
+
+
+def compare(results, reference, threshold):
+    """Stages slower or larger than a previous run.
+
+    :param threshold: Tolerated increase (%)
+    :type threshold: float
+    :returns: Regression descriptions
+    :rtype: List[str]
+    """
+    _regressions = []
+    _reference = {(r["stage"], r["scale"]): r for r in reference}
+    for result in results:
+        _previous = _reference.get((result["stage"], result["scale"]))
+        if not _previous:
+            continue
+        for key in ("seconds", "peak_bytes"):
+            if not _previous[key]:
+                continue
+            _change = (result[key] - _previous[key]) / _previous[key] * 100
+            if _change > threshold:
+                _regressions.append("{} ({}) {} +{:.1f}%".format(
+                    result["stage"], result["scale"], key, _change))
+    return _regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true",
+                        help="Skip the largest scales")
+    parser.add_argument("--no-exec", action="store_true",
+                        help="Skip the stages running the fake executables")
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--compare", metavar="JSON",
+                        help="Results of a previous --json run")
+    parser.add_argument("--threshold", type=float, default=25.0,
+                        help="Tolerated increase over --compare (%%)")
+    parser.add_argument("stages", nargs="*",
+                        help="Only run these stages")
+    args = parser.parse_args()
+
+    _charm = make_charm()
+    with tempfile.TemporaryDirectory() as bin_dir:
+        if not args.no_exec:
+            fake_tools.install(bin_dir)
+            os.environ["PATH"] = bin_dir + os.pathsep + os.environ["PATH"]
+        _results = []
+        for stage, scale, size, call in cases(
+                _charm, args.quick, None if args.no_exec else bin_dir):
+            if args.stages and stage not in args.stages:
+                continue
+            _seconds, _peak = measure(call, args.repeat)
+            _results.append({
+                "stage": stage,
+                "scale": scale,
+                "input_bytes": size,
+                "seconds": _seconds,
+                "throughput_mbps": size / _seconds / 1e6 if size else None,
+                "peak_bytes": _peak})
+
+    if args.json:
+        print(json.dumps(_results, indent=2))
+    else:
+        print("{:<18} {:<14} {:>10} {:>11} {:>9} {:>10}".format(
+            "stage", "scale", "input KiB", "ms/call", "MB/s", "peak KiB"))
+        for result in _results:
+            print("{:<18} {:<14} {:>10} {:>11.3f} {:>9} {:>10.0f}".format(
+                result["stage"], result["scale"],
+                result["input_bytes"] // 1024 or "-",
+                result["seconds"] * 1000,
+                "{:.1f}".format(result["throughput_mbps"])
+                if result["throughput_mbps"] else "-",
+                result["peak_bytes"] / 1024))
+    if args.compare:
+        with open(args.compare) as fh:
+            _regressions = compare(_results, json.load(fh), args.threshold)
+        for regression in _regressions:
+            print("Regression: {}".format(regression), file=sys.stderr)
+        if _regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
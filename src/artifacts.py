@@ -0,0 +1,121 @@
+import datetime
+import gzip
+import hashlib
+import json
+import logging
+import os
+import struct
+
+logger = logging.getLogger()
+
+
+class ArtifactNotFoundError(Exception):
+    """Raised when an artifact reference is unknown."""
+    pass
+
+
+class ArtifactStore():
+    """Compressed storage of full benchmark outputs on the unit.
+
+    Actions only return a compact summary and a stable artifact ID. The full
+    output is kept gzip compressed and can be fetched in chunks later.
+    """
+
+    SUFFIX = ".json.gz"
+
+    def __init__(self, path, retention=50):
+        self.path = path
+        self.retention = retention
+
+    def _artifact_path(self, artifact_id):
+        # IDs are generated by save, refuse anything resembling a path
+        if os.path.basename(artifact_id) != artifact_id:
+            raise ArtifactNotFoundError(artifact_id)
+        _path = os.path.join(self.path, artifact_id + self.SUFFIX)
+        if not os.path.exists(_path):
+            raise ArtifactNotFoundError(artifact_id)
+        return _path
+
+    def save(self, name, content):
+        """Save content as a compressed artifact.
+
+        :param name: Name of the producer, e.g. the action name
+        :type name: str
+        :param content: JSON serializable content
+        :type content: Any
+        :returns: Artifact ID
+        :rtype: str
+        """
+        _data = json.dumps(content, sort_keys=True).encode("UTF-8")
+        _artifact_id = "{}-{}-{}".format(
+            name,
+            datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%S"),
+            hashlib.sha1(_data).hexdigest()[:8])
+        os.makedirs(self.path, mode=0o750, exist_ok=True)
+        _path = os.path.join(self.path, _artifact_id + self.SUFFIX)
+        # Write then rename so readers never see a partial artifact
+        with gzip.open(_path + ".tmp", "wb") as fh:
+            fh.write(_data)
+        os.rename(_path + ".tmp", _path)
+        logger.info("Saved artifact {} ({} bytes)".format(
+            _artifact_id, len(_data)))
+        self.prune()
+        return _artifact_id
+
+    def list(self):
+        """List artifact IDs, oldest first.
+
+        :returns: Artifact IDs
+        :rtype: List[str]
+        """
+        if not os.path.isdir(self.path):
+            return []
+        _files = [f for f in os.listdir(self.path) if f.endswith(self.SUFFIX)]
+        _files.sort(
+            key=lambda f: os.path.getmtime(os.path.join(self.path, f)))
+        return [f[:-len(self.SUFFIX)] for f in _files]
+
+    def prune(self):
+        """Remove the oldest artifacts beyond the retention count."""
+        _ids = self.list()
+        for artifact_id in _ids[:max(0, len(_ids) - self.retention)]:
+            os.remove(os.path.join(self.path, artifact_id + self.SUFFIX))
+
+    def size(self, artifact_id):
+        """Uncompressed size of an artifact.
+
+        :param artifact_id: Artifact ID
+        :type artifact_id: str
+        :returns: Size in bytes, from the gzip trailer
+        :rtype: int
+        """
+        with open(self._artifact_path(artifact_id), "rb") as fh:
+            fh.seek(-4, os.SEEK_END)
+            return struct.unpack("<I", fh.read(4))[0]
+
+    def read(self, artifact_id, offset=0, length=65536):
+        """Read a chunk of an artifact.
+
+        :param artifact_id: Artifact ID
+        :type artifact_id: str
+        :param offset: Offset in the uncompressed artifact
+        :type offset: int
+        :param length: Maximum chunk length
+        :type length: int
+        :returns: Uncompressed chunk
+        :rtype: str
+        """
+        with gzip.open(self._artifact_path(artifact_id), "rb") as fh:
+            fh.seek(offset)
+            return fh.read(length).decode("UTF-8", errors="replace")
+
+    def load(self, artifact_id):
+        """Load a whole artifact.
+
+        :param artifact_id: Artifact ID
+        :type artifact_id: str
+        :returns: Decoded content
+        :rtype: Any
+        """
+        with gzip.open(self._artifact_path(artifact_id), "rb") as fh:
+            return json.loads(fh.read().decode("UTF-8"))
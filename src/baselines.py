@@ -0,0 +1,141 @@
+import datetime
+import hashlib
+import json
+import logging
+import os
+
+logger = logging.getLogger()
+
+# Parameters which do not change what a benchmark measures
+IGNORED_PARAMS = ("trials", "save-baseline")
+
+
+def spec_id(name, params):
+    """Identify a benchmark specification.
+
+    :param name: Benchmark name, e.g. the action name
+    :type name: str
+    :param params: Action parameters
+    :type params: dict
+    :returns: Stable identifier of the benchmark and its parameters
+    :rtype: str
+    """
+    # Parameters added by the charm for rendering contain underscores
+    _spec = {k: v for k, v in params.items()
+             if "_" not in k and k not in IGNORED_PARAMS}
+    _hash = hashlib.sha1(
+        json.dumps(_spec, sort_keys=True).encode("UTF-8")).hexdigest()
+    return "{}-{}".format(name, _hash[:12])
+
+
+def is_relative(name):
+    """Whether a metric is already a change in percent, e.g. under
+    delta-percent/ or change-percent/.
+
+    :param name: Flat metric name
+    :type name: str
+    :rtype: bool
+    """
+    return any(segment.endswith("-percent")
+               for segment in name.lower().split("/"))
+
+
+def metric_kind(name):
+    """Classify a metric for regression checks.
+
+    Relative metrics are not checked, the relative change of a percentage
+    is meaningless.
+
+    :param name: Flat metric name
+    :type name: str
+    :returns: iops, bandwidth, latency or None for metrics not checked
+    :rtype: Union[str, None]
+    """
+    if is_relative(name):
+        return None
+    # Rates of rbd and rados bench are named per second, e.g. ops/sec and
+    # Bandwidth (MB/sec), the last path segment is the metric itself
+    _name = name.lower().replace("/sec", "_sec").split("/")[-1]
+    if any(s in _name for s in ("stddev", "min", "max")):
+        return None
+    if "p99" in _name:
+        return "latency"
+    if "iops" in _name or _name == "ops_sec":
+        return "iops"
+    if any(s in _name for s in ("bw", "bandwidth", "bytes_sec")):
+        return "bandwidth"
+    return None
+
+
+def compare(baseline, metrics, thresholds):
+    """Compare metrics with a baseline.
+
+    :param baseline: Flat baseline metrics
+    :type baseline: dict
+    :param metrics: Flat metrics of the run
+    :type metrics: dict
+    :param thresholds: Maximum regression in percent per metric kind
+    :type thresholds: dict
+    :returns: Regressed metrics with their baseline, value and change
+    :rtype: dict
+    """
+    _regressions = {}
+    for name, value in metrics.items():
+        _kind = metric_kind(name)
+        _reference = baseline.get(name)
+        if _kind is None or not _reference:
+            continue
+        _change = (value - _reference) * 100.0 / _reference
+        # Latency regresses up, throughput regresses down
+        _regression = _change if _kind == "latency" else -_change
+        if _regression > thresholds[_kind]:
+            _regressions[name] = {
+                "baseline": _reference,
+                "value": value,
+                "change-percent": round(_change, 2)}
+    return _regressions
+
+
+class BaselineStore():
+    """Baselines of benchmark specifications saved on the unit."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def _baseline_path(self, spec):
+        return os.path.join(self.path, "{}.json".format(spec))
+
+    def save(self, spec, metrics, artifact_id=None):
+        """Save the metrics of a run as the baseline of its specification.
+
+        :param spec: Benchmark specification ID
+        :type spec: str
+        :param metrics: Flat metrics of the run
+        :type metrics: dict
+        :param artifact_id: Artifact holding the full output of the run
+        :type artifact_id: str
+        """
+        os.makedirs(self.path, mode=0o750, exist_ok=True)
+        _path = self._baseline_path(spec)
+        with open(_path + ".tmp", "w") as fh:
+            json.dump({
+                "spec": spec,
+                "created": datetime.datetime.utcnow().isoformat(),
+                "artifact-id": artifact_id,
+                "metrics": metrics}, fh)
+        os.rename(_path + ".tmp", _path)
+        logger.info("Saved baseline {}".format(spec))
+
+    def load(self, spec):
+        """Load the baseline of a specification.
+
+        :param spec: Benchmark specification ID
+        :type spec: str
+        :returns: Baseline or None
+        :rtype: Union[dict, None]
+        """
+        try:
+            with open(self._baseline_path(spec)) as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            return None
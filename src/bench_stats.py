@@ -0,0 +1,291 @@
+import collections
+import json
+import math
+import numbers
+import statistics
+
+# Two-sided 95% Student's t quantiles by degrees of freedom
+T_95 = {
+    1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447,
+    7: 2.365, 8: 2.306, 9: 2.262, 10: 2.228, 11: 2.201, 12: 2.179,
+    13: 2.160, 14: 2.145, 15: 2.131, 16: 2.120, 17: 2.110, 18: 2.101,
+    19: 2.093, 20: 2.086, 25: 2.060, 30: 2.042, 40: 2.021, 60: 2.000,
+    120: 1.980}
+Z_95 = 1.96
+# Modified z-score above which a trial is an outlier (Iglewicz and Hoaglin)
+OUTLIER_Z = 3.5
+
+
+def slope(values):
+    """Least squares slope of values against their index.
+
+    :param values: Evenly spaced samples
+    :type values: List[float]
+    :returns: Change per sample
+    :rtype: float
+    """
+    _count = len(values)
+    if _count < 2:
+        return 0.0
+    _x_mean = (_count - 1) / 2
+    _y_mean = statistics.mean(values)
+    _num = sum((x - _x_mean) * (y - _y_mean) for x, y in enumerate(values))
+    _den = sum((x - _x_mean) ** 2 for x in range(_count))
+    return _num / _den
+
+
+def t_95(degrees):
+    """Two-sided 95% Student's t quantile.
+
+    Between the table entries the quantile is interpolated linearly in
+    1/degrees, which is accurate to the third decimal, and beyond the last
+    entry it converges to the normal quantile the same way.
+
+    :param degrees: Degrees of freedom, at least 1
+    :type degrees: int
+    :returns: Quantile
+    :rtype: float
+    """
+    if degrees in T_95:
+        return T_95[degrees]
+    _lower = max(d for d in T_95 if d < degrees)
+    _upper = min((d for d in T_95 if d > degrees), default=None)
+    if _upper is None:
+        return Z_95 + (T_95[_lower] - Z_95) * _lower / degrees
+    _weight = (1 / _lower - 1 / degrees) / (1 / _lower - 1 / _upper)
+    return T_95[_lower] + (T_95[_upper] - T_95[_lower]) * _weight
+
+
+def flatten(result, prefix=""):
+    """Flatten nested results into metric name to number.
+
+    :param result: Nested dictionaries of results
+    :type result: dict
+    :param prefix: Prefix of the metric names
+    :type prefix: str
+    :returns: Numeric leaves keyed by their slash separated path
+    :rtype: dict
+    """
+    _flat = {}
+    for key, value in result.items():
+        _name = "{}{}".format(prefix, key)
+        if isinstance(value, dict):
+            _flat.update(flatten(value, _name + "/"))
+        elif (isinstance(value, numbers.Number) and
+                not isinstance(value, bool)):
+            _flat[_name] = value
+    return _flat
+
+
+def delta_percent(reference, sample):
+    """Relative change of each metric from a reference.
+
+    :param reference: Flat reference metrics
+    :type reference: dict
+    :param sample: Flat metrics to compare
+    :type sample: dict
+    :returns: Change in percent of the metrics present in both
+    :rtype: dict
+    """
+    return {key: (sample[key] - value) * 100.0 / value
+            for key, value in reference.items()
+            if value and key in sample}
+
+
+def reject_outliers(values):
+    """Split values into kept values and outliers.
+
+    Uses the modified z-score, based on the median absolute deviation, which
+    unlike the standard z-score is not dragged by the outliers themselves.
+
+    :param values: Samples
+    :type values: List[float]
+    :returns: Kept values and outliers
+    :rtype: Tuple[List[float], List[float]]
+    """
+    if len(values) < 3:
+        return list(values), []
+    _median = statistics.median(values)
+    _mad = statistics.median([abs(v - _median) for v in values])
+    if not _mad:
+        return list(values), []
+    _kept = []
+    _outliers = []
+    for value in values:
+        if abs(0.6745 * (value - _median) / _mad) > OUTLIER_Z:
+            _outliers.append(value)
+        else:
+            _kept.append(value)
+    return _kept, _outliers
+
+
+def aggregate_trials(samples):
+    """Aggregate the metrics of repeated trials.
+
+    Every metric present in all trials is aggregated, one metric at a time.
+
+    :param samples: Flat metric name to value dictionary for each trial
+    :type samples: List[dict]
+    :returns: mean, median, stddev, 95% confidence interval, coefficient of
+              variation and rejected outliers per metric
+    :rtype: dict
+    """
+    if not samples:
+        return {}
+    _keys = set(samples[0])
+    for sample in samples[1:]:
+        _keys &= set(sample)
+    _statistics = {}
+    for key in sorted(_keys):
+        _kept, _outliers = reject_outliers([s[key] for s in samples])
+        _count = len(_kept)
+        _mean = statistics.mean(_kept)
+        _stddev = statistics.stdev(_kept) if _count > 1 else 0.0
+        _margin = (
+            t_95(_count - 1) * _stddev / math.sqrt(_count)
+            if _count > 1 else 0.0)
+        _statistics[key] = {
+            "n": _count,
+            "mean": _mean,
+            "median": statistics.median(_kept),
+            "stddev": _stddev,
+            "ci95": [_mean - _margin, _mean + _margin],
+            "cv": _stddev / _mean if _mean else 0.0,
+            "outliers": _outliers}
+    return _statistics
+
+
+def fio_totals(result):
+    """Aggregate a fio JSON result over its jobs.
+
+    :param result: Decoded fio JSON output
+    :type result: dict
+    :returns: iops, bandwidth (KiB/s), mean latency and p99 completion
+              latency (ns) per direction and the total iops.
+    :rtype: dict
+    """
+    _totals = {"iops": 0.0}
+    for metric in ('read', 'write'):
+        _iops = 0.0
+        _bw = 0.0
+        _lat = 0.0
+        for job in result["jobs"]:
+            _iops += job[metric]["iops"]
+            _bw += job[metric]["bw"]
+            # Weight job latencies by the number of I/Os they represent
+            _lat += job[metric]["lat_ns"]["mean"] * job[metric]["iops"]
+        _totals["{}_iops".format(metric)] = _iops
+        _totals["{}_bw".format(metric)] = _bw
+        _totals["{}_lat_ns".format(metric)] = _lat / _iops if _iops else 0.0
+        # Jobs are usually group reported, otherwise keep the worst one
+        _totals["{}_clat_p99_ns".format(metric)] = max(
+            [job[metric]["clat_ns"].get("percentile", {}).get(
+                "99.000000", 0) for job in result["jobs"]] or [0])
+        _totals["iops"] += _iops
+    return _totals
+
+
+def fio_client_results(output):
+    """Decode the JSON output of fio run as a client of fio servers.
+
+    fio prints the probe of each server ahead of the JSON document. Its
+    client_stats list the jobs of every server, then their sum over the
+    servers, named "All clients", when there is more than one.
+
+    :param output: Output of fio --client
+    :type output: str
+    :returns: Result summed over the servers and the result of each server
+              by hostname, both in the format of a local fio result
+    :rtype: Tuple[dict, Dict[str, dict]]
+    :raises: ValueError
+    """
+    _start = 0
+    if not output.startswith("{"):
+        _start = output.find("\n{") + 1
+        if not _start:
+            raise ValueError("No JSON document in the fio client output")
+    _result = json.loads(output[_start:])
+    _sum = []
+    _hosts = {}
+    for job in _result.get("client_stats", []):
+        if job.get("jobname") == "All clients":
+            _sum.append(job)
+        else:
+            _hosts.setdefault(
+                job.get("hostname", ""), {"jobs": []})["jobs"].append(job)
+    if not _hosts:
+        raise ValueError("No client stats in the fio client output")
+    return (
+        {"jobs": _sum or [job for host in _hosts.values()
+                          for job in host["jobs"]]},
+        _hosts)
+
+
+class SteadyStateDetector():
+    """Sliding window steady-state detector.
+
+    The workload is considered steady when, over the last ``window``
+    samples, both the range of the tracked metric and the drift implied by
+    its slope stay within ``tolerance`` of its mean. This mirrors fio's
+    ``iops`` and ``iops_slope`` steady-state criteria but works for every
+    ioengine and across fio invocations. Samples older than the window are
+    warm-up and are discarded.
+    """
+
+    def __init__(self, window=3, tolerance=0.05, key="iops"):
+        self.window = max(2, window)
+        self.tolerance = tolerance
+        self.key = key
+        self.samples = collections.deque(maxlen=self.window)
+        self.count = 0
+
+    def add(self, sample):
+        """Add a sample.
+
+        :param sample: Metric name to value
+        :type sample: dict
+        :returns: Whether the steady state is reached
+        :rtype: bool
+        """
+        self.samples.append(sample)
+        self.count += 1
+        return self.stable
+
+    @property
+    def warmup(self):
+        """Number of discarded samples."""
+        return self.count - len(self.samples)
+
+    @property
+    def stable(self):
+        if len(self.samples) < self.window:
+            return False
+        _values = [s[self.key] for s in self.samples]
+        _mean = statistics.mean(_values)
+        if not _mean:
+            return False
+        _range = (max(_values) - min(_values)) / _mean
+        _drift = abs(slope(_values)) * (self.window - 1) / _mean
+        return _range <= self.tolerance and _drift <= self.tolerance
+
+    def summary(self):
+        """Statistics over the current window.
+
+        :returns: Mean, min, max and standard deviation per metric
+        :rtype: dict
+        """
+        _summary = {
+            "steady": self.stable,
+            "samples": len(self.samples),
+            "warmup": self.warmup,
+            "metrics": {}}
+        if not self.samples:
+            return _summary
+        for key in self.samples[0]:
+            _values = [s[key] for s in self.samples]
+            _summary["metrics"][key] = {
+                "mean": statistics.mean(_values),
+                "min": min(_values),
+                "max": max(_values),
+                "stddev": statistics.pstdev(_values)}
+        return _summary
@@ -1,4 +1,6 @@
+import json
 import logging
+import os
 import subprocess
 
 import charmhelpers.core.host as ch_host
@@ -21,25 +23,47 @@ class BenchTools():
         _output = subprocess.check_output(_cmd, stderr=subprocess.PIPE)
         return _output.decode("UTF-8")
 
-    def rbd_remove_image(self, pool_name):
-        _cmd = ["rbd", "remove", self.charm_instance.RBD_IMAGE,
+    def rbd_remove_image(self, pool_name, image=None):
+        _cmd = ["rbd", "remove", image or self.charm_instance.RBD_IMAGE,
                 "-p", pool_name, "-n", self.charm_instance.CEPH_CLIENT_NAME]
         _output = subprocess.check_output(_cmd, stderr=subprocess.PIPE)
         return _output.decode("UTF-8")
 
-    def rbd_create_image(self, pool_name, image_size, extra_args=[]):
-        _cmd = ["rbd", "create", self.charm_instance.RBD_IMAGE,
+    def rbd_image_id(self, pool_name, image=None):
+        _cmd = ["rbd", "info", image or self.charm_instance.RBD_IMAGE,
+                "-p", pool_name, "-n", self.charm_instance.CEPH_CLIENT_NAME,
+                "--format", "json"]
+        _output = subprocess.check_output(_cmd, stderr=subprocess.PIPE)
+        return json.loads(_output.decode("UTF-8"))["id"]
+
+    def rbd_trash_image(self, pool_name, image=None):
+        _cmd = ["rbd", "trash", "move", image or self.charm_instance.RBD_IMAGE,
+                "-p", pool_name, "-n", self.charm_instance.CEPH_CLIENT_NAME]
+        _output = subprocess.check_output(_cmd, stderr=subprocess.PIPE)
+        return _output.decode("UTF-8")
+
+    def rbd_create_image(self, pool_name, image_size, extra_args=[],
+                         image=None):
+        _cmd = ["rbd", "create", image or self.charm_instance.RBD_IMAGE,
                 "--size", str(image_size), "-p", pool_name,
                 "-n", self.charm_instance.CEPH_CLIENT_NAME] + extra_args
         _output = subprocess.check_output(_cmd, stderr=subprocess.PIPE)
         return _output.decode("UTF-8")
 
-    def rbd_map_image(self, pool_name):
-        _cmd = ["rbd", "map", self.charm_instance.RBD_IMAGE,
+    def rbd_map_image(self, pool_name, image=None):
+        _cmd = ["rbd", "map", image or self.charm_instance.RBD_IMAGE,
                 "-p", pool_name, "-n", self.charm_instance.CEPH_CLIENT_NAME]
         _output = subprocess.check_output(_cmd, stderr=subprocess.PIPE)
         return _output.decode("UTF-8")
 
+    def rbd_unmap_image(self, pool_name, image=None):
+        _image = "{}/{}".format(
+            pool_name, image or self.charm_instance.RBD_IMAGE)
+        _cmd = ["rbd", "unmap", _image,
+                "-n", self.charm_instance.CEPH_CLIENT_NAME]
+        _output = subprocess.check_output(_cmd, stderr=subprocess.PIPE)
+        return _output.decode("UTF-8")
+
     def make_rbd_fs(self, pool_name, file_system_type="ext4"):
         _image_dev = "{}/{}/{}".format(
             str(self.charm_instance.RBD_DEV), pool_name,
@@ -59,6 +83,27 @@ class BenchTools():
         _output = subprocess.check_output(_cmd, stderr=subprocess.PIPE)
         return _output.decode("UTF-8")
 
+    def mount_cephfs(self, path, mount_type="kernel"):
+        ch_host.mkdir(str(self.charm_instance.CEPHFS_MOUNT))
+        if mount_type == "fuse":
+            _cmd = ["ceph-fuse", "-n", self.charm_instance.CEPH_CLIENT_NAME,
+                    "-r", path, str(self.charm_instance.CEPHFS_MOUNT)]
+        else:
+            # mount.ceph finds the monitors and key in ceph.conf
+            _cmd = ["mount", "-t", "ceph", ":{}".format(path),
+                    str(self.charm_instance.CEPHFS_MOUNT),
+                    "-o", "name={}".format(self.charm_instance.CLIENT_NAME)]
+        _output = subprocess.check_output(_cmd, stderr=subprocess.PIPE)
+        return _output.decode("UTF-8")
+
+    def umount(self, mount_point):
+        _cmd = ["umount", mount_point]
+        try:
+            subprocess.check_output(_cmd, stderr=subprocess.PIPE)
+        except subprocess.CalledProcessError as e:
+            logger.warning("Unable to unmount {}: {}".format(
+                mount_point, e.stderr.decode("UTF-8")))
+
     def rbd_bench(
             self, pool_name, operation):
         _cmd = ["rbd", "bench", "--io-type", operation,
@@ -77,51 +122,165 @@ class BenchTools():
         _output = subprocess.check_output(_cmd, stderr=subprocess.STDOUT)
         return _output.decode("UTF-8")
 
+    def ceph_df(self):
+        _cmd = ["ceph", "df", "detail", "--format", "json",
+                "-n", self.charm_instance.CEPH_CLIENT_NAME]
+        _output = subprocess.check_output(_cmd, stderr=subprocess.PIPE)
+        return json.loads(_output.decode("UTF-8"))
+
+    def ceph_status(self):
+        _cmd = ["ceph", "status", "--format", "json",
+                "-n", self.charm_instance.CEPH_CLIENT_NAME]
+        _output = subprocess.check_output(_cmd, stderr=subprocess.PIPE)
+        return json.loads(_output.decode("UTF-8"))
+
+    def ceph_config_get(self, who, option):
+        _cmd = ["ceph", "config", "get", who, option,
+                "-n", self.charm_instance.CEPH_CLIENT_NAME]
+        _output = subprocess.check_output(_cmd, stderr=subprocess.PIPE)
+        return _output.decode("UTF-8").strip()
+
+    def ceph_osd_out(self, osds):
+        _cmd = ["ceph", "osd", "out"] + [str(osd) for osd in osds] + [
+            "-n", self.charm_instance.CEPH_CLIENT_NAME]
+        _output = subprocess.check_output(_cmd, stderr=subprocess.PIPE)
+        return _output.decode("UTF-8")
+
     def fio(self, fio_conf):
         _cmd = ["fio", "--output-format=json", fio_conf]
         _output = subprocess.check_output(_cmd, stderr=subprocess.PIPE)
         return _output.decode("UTF-8")
 
-    def radosgw_user_create(self, user, subuser, secret):
+    def fio_clients(self, hosts_file, fio_conf):
+        """Run a job file on the fio servers listed in hosts_file.
+
+        :returns: Output of fio, see bench_stats.fio_client_results
+        :rtype: str
+        """
+        _cmd = ["fio", "--output-format=json",
+                "--client={}".format(hosts_file), fio_conf]
+        _output = subprocess.check_output(_cmd, stderr=subprocess.PIPE)
+        return _output.decode("UTF-8")
+
+    def blktrace_capture(self, device, seconds, output_dir):
+        """Capture a blktrace of device and merge it for fio replay.
+
+        :returns: Path to the merged binary trace
+        :rtype: str
         """
+        _name = os.path.basename(device)
+        _cmd = ["blktrace", "-d", device, "-w", str(seconds),
+                "-D", output_dir, "-o", _name]
+        subprocess.check_output(_cmd, stderr=subprocess.PIPE)
+        _trace = os.path.join(output_dir, "{}.bin".format(_name))
+        _cmd = ["blkparse", "-i", _name, "-D", output_dir,
+                "-d", _trace, "-O"]
+        subprocess.check_output(_cmd, stderr=subprocess.PIPE)
+        return _trace
+
+    def radosgw_user_info(self, user):
+        """Get radosgw user info.
+
+        :returns: Decoded user info or None if the user does not exist
+        :rtype: Union[dict, None]
+        """
+        _cmd = ["radosgw-admin", "user", "info",
+                "-n", self.charm_instance.CEPH_CLIENT_NAME,
+                "--uid={}".format(user)]
+        try:
+            _output = subprocess.check_output(_cmd, stderr=subprocess.PIPE)
+        except subprocess.CalledProcessError as e:
+            if "no user info saved" in e.stderr.decode("UTF-8"):
+                return None
+            raise
+        return json.loads(_output.decode("UTF-8"))
+
+    def radosgw_user_create(self, user, subuser=None, secret=None,
+                            max_buckets=0, s3_keys=None):
+        """Create or complete a radosgw user.
+
+        The user is inspected with a single user info call and only the
+        missing parts are created:
+
         radosgw-admin user create -n client.woodpecker
-          --uid="benchmark" --display-name="benchmark"
+          --uid="benchmark" --display-name="benchmark" --max-buckets=0
         radosgw-admin subuser create -n client.woodpecker
           --uid=benchmark --subuser=benchmark:swift --access=full
         radosgw-admin key create -n client.woodpecker
           --subuser=benchmark:swift --key-type=swift --secret=guessme
+        radosgw-admin key create -n client.woodpecker
+          --uid=benchmark --key-type=s3 --access-key=... --secret-key=...
         radosgw-admin user modify -n client.woodpecker
           --uid=benchmark --max-buckets=0
+
+        :param s3_keys: S3 access key to secret key
+        :type s3_keys: dict
         """
         _output = ""
-        _cmd = ["radosgw-admin", "user", "create",
-                "-n", self.charm_instance.CEPH_CLIENT_NAME,
-                "--uid={}".format(user), "--display-name={}".format(user)]
-        _output += (
-            subprocess.check_output(
-                _cmd, stderr=subprocess.PIPE).decode("UTF-8"))
+        _base = ["radosgw-admin", "-n", self.charm_instance.CEPH_CLIENT_NAME]
 
-        _cmd = ["radosgw-admin", "subuser", "create",
-                "-n", self.charm_instance.CEPH_CLIENT_NAME,
-                "--uid={}".format(user),
-                "--subuser={}:{}".format(user, subuser), "--access=full"]
-        _output += (
-            subprocess.check_output(
-                _cmd, stderr=subprocess.PIPE).decode("UTF-8"))
+        def _run(args):
+            return subprocess.check_output(
+                _base + args, stderr=subprocess.PIPE).decode("UTF-8")
 
-        _cmd = ["radosgw-admin", "key", "create",
-                "-n", self.charm_instance.CEPH_CLIENT_NAME,
-                "--subuser={}:{}".format(user, subuser),
-                "--key-type=swift", "--secret={}".format(secret)]
-        _output += (
-            subprocess.check_output(
-                _cmd, stderr=subprocess.PIPE).decode("UTF-8"))
+        _info = self.radosgw_user_info(user)
+        if _info is None:
+            _output += _run([
+                "user", "create", "--uid={}".format(user),
+                "--display-name={}".format(user),
+                "--max-buckets={}".format(max_buckets)])
+            _info = {"subusers": [], "swift_keys": [], "keys": [],
+                     "max_buckets": max_buckets}
 
-        _cmd = ["radosgw-admin", "user", "modify",
-                "-n", self.charm_instance.CEPH_CLIENT_NAME,
-                "--uid={}".format(user), "--max-buckets=0"]
-        _output += (
-            subprocess.check_output(
-                _cmd, stderr=subprocess.PIPE).decode("UTF-8"))
+        if subuser:
+            _subuser = "{}:{}".format(user, subuser)
+            if _subuser not in [s["id"] for s in _info["subusers"]]:
+                _output += _run([
+                    "subuser", "create", "--uid={}".format(user),
+                    "--subuser={}".format(_subuser), "--access=full"])
+            if {"user": _subuser, "secret_key": secret} not in [
+                    {"user": k["user"], "secret_key": k["secret_key"]}
+                    for k in _info["swift_keys"]]:
+                _output += _run([
+                    "key", "create", "--subuser={}".format(_subuser),
+                    "--key-type=swift", "--secret={}".format(secret)])
+
+        _keys = {k["access_key"]: k["secret_key"] for k in _info["keys"]}
+        for access_key, secret_key in (s3_keys or {}).items():
+            if _keys.get(access_key) != secret_key:
+                _output += _run([
+                    "key", "create", "--uid={}".format(user),
+                    "--key-type=s3", "--access-key={}".format(access_key),
+                    "--secret-key={}".format(secret_key)])
+
+        if _info["max_buckets"] != max_buckets:
+            _output += _run([
+                "user", "modify", "--uid={}".format(user),
+                "--max-buckets={}".format(max_buckets)])
 
         return _output
+
+    def radosgw_bucket_limit(self, user, bucket):
+        """Get the index shard usage of a radosgw bucket.
+
+        :returns: num_shards, objects_per_shard and fill_status of the
+                  bucket, or None if the bucket does not exist
+        :rtype: Union[dict, None]
+        """
+        _cmd = ["radosgw-admin", "bucket", "limit", "check",
+                "-n", self.charm_instance.CEPH_CLIENT_NAME,
+                "--uid={}".format(user)]
+        _output = subprocess.check_output(_cmd, stderr=subprocess.PIPE)
+        for _user in json.loads(_output.decode("UTF-8")):
+            for _bucket in _user.get("buckets", []):
+                if _bucket["bucket"] == bucket:
+                    return _bucket
+        return None
+
+    def radosgw_bucket_reshard(self, bucket, num_shards):
+        _cmd = ["radosgw-admin", "bucket", "reshard",
+                "-n", self.charm_instance.CEPH_CLIENT_NAME,
+                "--bucket={}".format(bucket),
+                "--num-shards={}".format(num_shards)]
+        _output = subprocess.check_output(_cmd, stderr=subprocess.PIPE)
+        return _output.decode("UTF-8")
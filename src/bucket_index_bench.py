@@ -0,0 +1,144 @@
+import concurrent.futures
+import http.client
+import logging
+import random
+import threading
+import time
+
+from metadata_bench import summarize
+
+logger = logging.getLogger()
+
+
+def parse_targets(value):
+    """Parse the object counts to fill a bucket to.
+
+    :param value: Space delimited object counts, e.g. "100000 1000000"
+    :type value: str
+    :returns: Increasing object counts
+    :rtype: List[int]
+    :raises: ValueError
+    """
+    _targets = sorted({int(target) for target in (value or "").split()})
+    if not _targets or _targets[0] < 1:
+        raise ValueError(
+            "targets must be a list of positive object counts")
+    return _targets
+
+
+class LatencySample():
+    """Operation latencies of a phase with bounded memory.
+
+    Count and mean are exact, percentiles come from a uniform reservoir
+    sample, as a phase may issue millions of operations.
+    """
+
+    def __init__(self, size=100000):
+        self.size = size
+        self.count = 0
+        self.total = 0
+        self.sample = []
+        self._lock = threading.Lock()
+
+    def add(self, latency):
+        with self._lock:
+            self.count += 1
+            self.total += latency
+            if len(self.sample) < self.size:
+                self.sample.append(latency)
+                return
+            _index = random.randrange(self.count)
+            if _index < self.size:
+                self.sample[_index] = latency
+
+    def summary(self, elapsed):
+        """ops/s and latency statistics, see metadata_bench.summarize."""
+        _summary = summarize(self.sample, elapsed)
+        if self.count:
+            _summary["ops"] = self.count
+            _summary["iops"] = self.count / elapsed if elapsed else 0.0
+            _summary["lat_ns"]["mean"] = self.total / self.count
+        return _summary
+
+
+class BucketIndexBench():
+    """Fill a container to growing object counts through a Swift stream and
+    measure PUT latency and paginated listing throughput at each count.
+    """
+
+    def __init__(self, stream, concurrency=64, page_size=1000, list_pages=100):
+        self.stream = stream
+        self.concurrency = concurrency
+        self.page_size = page_size
+        self.list_pages = list_pages
+
+    @staticmethod
+    def object_name(index):
+        return "obj-{:012d}".format(index)
+
+    def fill(self, start, end):
+        """PUT objects start to end - 1.
+
+        :param start: First object index
+        :type start: int
+        :param end: Object count to reach
+        :type end: int
+        :returns: PUT ops/s, latency and errors
+        :rtype: dict
+        """
+        _latencies = LatencySample()
+        _lock = threading.Lock()
+        _next = [start]
+        _errors = [0]
+
+        def _worker():
+            while True:
+                with _lock:
+                    _index = _next[0]
+                    if _index >= end:
+                        return
+                    _next[0] += 1
+                _start = time.perf_counter_ns()
+                try:
+                    self.stream.put(self.object_name(_index))
+                except (OSError, http.client.HTTPException) as e:
+                    logger.debug("PUT failed: {}".format(e))
+                    with _lock:
+                        _errors[0] += 1
+                    continue
+                _latencies.add(time.perf_counter_ns() - _start)
+
+        _start = time.monotonic()
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.concurrency) as executor:
+            for future in [executor.submit(_worker)
+                           for _ in range(self.concurrency)]:
+                future.result()
+        _summary = _latencies.summary(time.monotonic() - _start)
+        _summary["errors"] = _errors[0]
+        return _summary
+
+    def list(self):
+        """List the container page by page from its start.
+
+        :returns: Pages/s, objects/s and page latency
+        :rtype: dict
+        """
+        _latencies = LatencySample()
+        _objects = 0
+        _marker = ""
+        _start = time.monotonic()
+        while not self.list_pages or _latencies.count < self.list_pages:
+            _sent = time.perf_counter_ns()
+            _names = self.stream.list(_marker, self.page_size)
+            _latencies.add(time.perf_counter_ns() - _sent)
+            _objects += len(_names)
+            if len(_names) < self.page_size:
+                break
+            _marker = _names[-1]
+        _elapsed = time.monotonic() - _start
+        _summary = _latencies.summary(_elapsed)
+        _summary["objects"] = _objects
+        _summary["objects_per_second"] = (
+            _objects / _elapsed if _elapsed else 0.0)
+        return _summary
@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 
 from base64 import b64decode
+import atexit
+import concurrent.futures
+import contextlib
 import datetime
 import errno
 import hashlib
@@ -8,8 +11,10 @@ import json
 import socket
 import logging
 import os
+import signal
 import subprocess
 import sys
+import time
 from pathlib import Path
 
 sys.path.append("lib")
@@ -20,97 +25,31 @@ from ops.framework import (
 from ops.main import main
 import ops.model
 import charmhelpers.core.host as ch_host
-import charmhelpers.core.templating as ch_templating
-from charmhelpers.fetch import snap
 import interface_ceph_client.ceph_client as ceph_client
-import interface_tls_certificates.ca_client as ca_client
 import interface_woodpecker_peers
 
+import artifacts
+import baselines
+import bench_stats
 import bench_tools
+import tuning
 
-from prometheus_client import start_http_server, Gauge
-
-import ops_openstack.adapters
 import ops_openstack.core
-import cryptography.hazmat.primitives.serialization as serialization
-logger = logging.getLogger(__name__)
-
-
-class CephClientAdapter(ops_openstack.adapters.OpenStackOperRelationAdapter):
-    """Ceph Client Adapter."""
-
-    def __init__(self, relation):
-        super(CephClientAdapter, self).__init__(relation)
-
-    @property
-    def mon_hosts(self):
-        hosts = self.relation.get_relation_data()["mon_hosts"]
-        return " ".join(sorted(hosts))
-
-    @property
-    def auth_supported(self):
-        return self.relation.get_relation_data()["auth"]
-
-    @property
-    def key(self):
-        return self.relation.get_relation_data()["key"]
-
-    @property
-    def client_name(self):
-        return self.relation.model.app.name
-
-
-class PeerAdapter(ops_openstack.adapters.OpenStackOperRelationAdapter):
-    """Peer Adapter."""
-
-    def __init__(self, relation):
-        super(PeerAdapter, self).__init__(relation)
 
-
-class WoodpeckerPeerAdapter(PeerAdapter):
-    """Woodpecker Peer Adapter."""
-
-    def __init__(self, relation):
-        super(WoodpeckerPeerAdapter, self).__init__(relation)
-
-    @property
-    def hosts(self):
-        """woodpecker unit addresses."""
-        hosts = self.relation.peers_addresses
-        return " ".join(sorted(hosts))
-
-
-class TLSCertificatesAdapter(
-        ops_openstack.adapters.OpenStackOperRelationAdapter):
-    """TLS Certificates Adapter."""
-
-    def __init__(self, relation):
-        super(TLSCertificatesAdapter, self).__init__(relation)
-
-    @property
-    def enable_tls(self):
-        try:
-            return bool(self.relation.application_certificate)
-        except ca_client.CAClientError:
-            return False
-
-
-class WoodpeckerAdapters(
-        ops_openstack.adapters.OpenStackRelationAdapters):
-    """Woodpecker Adapters."""
-
-    relation_adapters = {
-        "ceph-client": CephClientAdapter,
-        "peers": WoodpeckerPeerAdapter,
-        "certificates": TLSCertificatesAdapter,
-    }
+# The metrics (prometheus_client), templating, snap, adapters and librados
+# subsystems are imported by the handlers that need them, and the TLS
+# certificates interface (cryptography) only by units related to a CA, so
+# that hooks such as update-status do not pay for their import.
+# ops_openstack.core provides the charm base class and is always imported.
+logger = logging.getLogger(__name__)
 
 
 class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
     """Woodpecker Charm Base."""
 
     state = StoredState()
-    PACKAGES = ["ceph-common", "fio"]
+    PACKAGES = [
+        "ceph-common", "ceph-fuse", "fio", "blktrace", "python3-rados"]
     SNAP_NAME = "swift-bench"
 
     CEPH_CAPABILITIES = [
@@ -132,14 +71,18 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
 
     RBD_MOUNT = Path("/mnt/ceph-block-device")
 
+    @staticmethod
+    def unit_rbd_image(unit_name):
+        """Name of the default rbd image of a unit."""
+        hash = hashlib.sha1(unit_name.encode("UTF-8")).hexdigest()
+        return hash[:10]
+
     @property
     def RBD_IMAGE(self):
-        hash = hashlib.sha1(
-            self.model.unit.name.encode("UTF-8")
-        ).hexdigest()
-        return hash[:10]
+        return self.unit_rbd_image(self.model.unit.name)
 
     RBD_DEV = Path("/dev/rbd")
+    CEPHFS_MOUNT = Path("/mnt/ceph-fs")
 
     @property
     def REQUIRED_RELATIONS(self):
@@ -150,9 +93,41 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
     CEPH_CONFIG_PATH = Path("/etc/ceph")
     RBD_FIO_CONF = CEPH_CONFIG_PATH / "rbd.fio"
     DISK_FIO_CONF = CEPH_CONFIG_PATH / "disk.fio"
+    REPLAY_FIO_CONF = CEPH_CONFIG_PATH / "replay.fio"
+    CEPHFS_FIO_CONF = CEPH_CONFIG_PATH / "cephfs.fio"
+    MIXED_FIO_CONF = CEPH_CONFIG_PATH / "mixed-rbd.fio"
+    DISTRIBUTED_FIO_CONF = CEPH_CONFIG_PATH / "distributed.fio"
     CEPH_CONF = CEPH_CONFIG_PATH / "ceph.conf"
     SWIFT_BENCH_CONF = Path("/etc/swift/swift-bench.conf")
     SSL_CA = Path("/usr/local/share/ca-certificates/ssl_ca.crt")
+    WOODPECKER_PATH = Path("/var/lib/woodpecker")
+    TRACE_PATH = WOODPECKER_PATH / "traces"
+    ARTIFACT_PATH = WOODPECKER_PATH / "artifacts"
+    BASELINE_PATH = WOODPECKER_PATH / "baselines"
+    CLEANUP_PATH = WOODPECKER_PATH / "cleanup.json"
+    # ceph.conf with the client overrides of the current run
+    RUN_CEPH_CONF = WOODPECKER_PATH / "ceph.run.conf"
+    CLEANUP_LOG = WOODPECKER_PATH / "cleanup.log"
+    RESULTS_PATH = WOODPECKER_PATH / "results"
+    RESULTS_API_PID = WOODPECKER_PATH / "results-api.pid"
+    RESULTS_API_LOG = WOODPECKER_PATH / "results-api.log"
+    # Progress of the fill-bench run, to resume it
+    FILL_STATE = WOODPECKER_PATH / "fill-bench.json"
+    FIO_SERVER_PID = WOODPECKER_PATH / "fio-server.pid"
+    FIO_SERVER_LOG = WOODPECKER_PATH / "fio-server.log"
+    # Servers the distributed fio job file is sent to
+    FIO_CLIENTS = WOODPECKER_PATH / "fio-clients"
+    # Set in the environment of the fio server of every unit, the shared
+    # distributed.fio job file runs against the rbd image of each unit
+    FIO_SERVER_IMAGE_ENV = "WOODPECKER_RBD_IMAGE"
+    # Containers swift-bench spreads its objects over
+    SWIFT_CONTAINERS = 20
+    # Wait for the OSDs to report the pool usage of a run (s)
+    POOL_USAGE_SETTLE = 10
+    # Duration of the fio iterations of the fio action, see rbd.fio (s)
+    FIO_ITERATION = 30
+    # Values of the regression-action option
+    REGRESSION_ACTIONS = ("fail", "blocked", "warn")
 
     @property
     def BENCHMARK_KEYRING(self):
@@ -171,13 +146,21 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
         "/usr/local/share/ca-certificates/vault_ca_cert.crt")
 
     # We have no services to restart so using configs_for_rendering.
+    # Instances get their own list, see add_config_for_rendering.
     configs_for_rendering = []
     release = "default"
     bindings = ["cluster", "peers", "public"]
     action_output_key = "test-results"
+    # Raw tool output returned by a failed action is truncated to this size
+    MAX_ERROR_OUTPUT = 4096
 
     # Cache on metric gauges for prometheus
     metrics = {}
+    # Metrics endpoint served by this process
+    metrics_server = None
+    # Content hash of the files written by write_if_changed
+    rendered_hashes = {}
+    METRICS_PORT = 8088
 
     def __init__(self, framework):
         """Init Woodpecker Charm Base."""
@@ -187,19 +170,31 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
         self._stored.set_default(
             swift_bench_snap_installed=False,
             target_created=False,
-            enable_tls=False)
+            enable_tls=False,
+            regression="",
+            rgw_users=[],
+            fio_server_port=0)
         self.ceph_client = ceph_client.CephClientRequires(
             self,
             "ceph-client")
         self.peers = interface_woodpecker_peers.WoodpeckerPeers(
             self,
             "peers")
-        self.ca_client = ca_client.CAClient(
-            self,
-            "certificates")
-        self.adapters = WoodpeckerAdapters(
-            (self.ceph_client, self.peers, self.ca_client),
-            self)
+        self.ca_client = None
+        if self.model.relations["certificates"]:
+            import interface_tls_certificates.ca_client as ca_client
+            self.ca_client = ca_client.CAClient(
+                self,
+                "certificates")
+            self.framework.observe(
+                self.ca_client.on.tls_app_config_ready,
+                self.on_tls_app_config_ready)
+            self.framework.observe(
+                self.ca_client.on.ca_available,
+                self.on_ca_available)
+        self._adapters = None
+        self._history = None
+        self.configs_for_rendering = []
         self.framework.observe(
             self.ceph_client.on.broker_available,
             self.request_ceph_pool)
@@ -210,20 +205,29 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
             self.peers.on.has_peers,
             self.on_has_peers)
         self.framework.observe(
-            self.ca_client.on.tls_app_config_ready,
-            self.on_tls_app_config_ready)
+            self.on.config_changed,
+            self.refresh_request)
+        self.framework.observe(
+            self.on.config_changed,
+            self.ensure_results_api)
         self.framework.observe(
-            self.ca_client.on.ca_available,
-            self.on_ca_available)
+            self.on.update_status,
+            self.ensure_results_api)
         self.framework.observe(
             self.on.config_changed,
-            self.render_config)
+            self.ensure_fio_server)
+        self.framework.observe(
+            self.on.update_status,
+            self.ensure_fio_server)
         self.framework.observe(
             self.on.upgrade_charm,
             self.render_config)
         self.framework.observe(
             self.on.rados_bench_action,
             self.on_rados_bench_action)
+        self.framework.observe(
+            self.on.rados_metadata_bench_action,
+            self.on_rados_metadata_bench_action)
         self.framework.observe(
             self.on.rbd_bench_action,
             self.on_rbd_bench_action)
@@ -233,6 +237,33 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
         self.framework.observe(
             self.on.fio_action,
             self.on_fio_action)
+        self.framework.observe(
+            self.on.cephfs_bench_action,
+            self.on_cephfs_bench_action)
+        self.framework.observe(
+            self.on.network_bench_action,
+            self.on_network_bench_action)
+        self.framework.observe(
+            self.on.distributed_fio_action,
+            self.on_distributed_fio_action)
+        self.framework.observe(
+            self.on.degraded_bench_action,
+            self.on_degraded_bench_action)
+        self.framework.observe(
+            self.on.fill_bench_action,
+            self.on_fill_bench_action)
+        self.framework.observe(
+            self.on.mixed_bench_action,
+            self.on_mixed_bench_action)
+        self.framework.observe(
+            self.on.bucket_index_bench_action,
+            self.on_bucket_index_bench_action)
+        self.framework.observe(
+            self.on.cleanup_action,
+            self.on_cleanup_action)
+        self.framework.observe(
+            self.on.fetch_artifact_action,
+            self.on_fetch_artifact_action)
         self.framework.observe(
             self.on.rbd_map_image_action,
             self.on_rbd_map_image_action)
@@ -240,9 +271,18 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
             self.on["prometheus-target"].relation_joined,
             self.on_prometheus_target_joined
         )
-        # snap retry is excessive
-        snap.SNAP_NO_LOCK_RETRY_DELAY = 0.5
-        snap.SNAP_NO_LOCK_RETRY_COUNT = 3
+
+    @property
+    def adapters(self):
+        """Relation adapters for rendering, created on first use."""
+        if self._adapters is None:
+            import woodpecker_adapters
+            self._adapters = woodpecker_adapters.WoodpeckerAdapters(
+                [relation for relation in (
+                    self.ceph_client, self.peers, self.ca_client)
+                 if relation is not None],
+                self)
+        return self._adapters
 
     def on_install(self, event):
         """Event handler on install.
@@ -252,6 +292,10 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
         :returns: This method is called for its side effects
         :rtype: None
         """
+        from charmhelpers.fetch import snap
+        # snap retry is excessive
+        snap.SNAP_NO_LOCK_RETRY_DELAY = 0.5
+        snap.SNAP_NO_LOCK_RETRY_COUNT = 3
         if ch_host.is_container():
             logging.warning("Some charm actions cannot be performed while "
                             "deployed in a container.")
@@ -304,14 +348,14 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
         event.relation.data[self.unit].update({
             "hostname": str(self.model.get_binding(
                 event.relation).network.ingress_address),
-            "port": "8088",
+            "port": str(self.METRICS_PORT),
         })
 
     def on_has_peers(self, event):
         """Event handler on has peers.
 
-        Currently a noop. Multiple units will allow for simultaneous stress
-        tests against ceph.
+        Publish the public and cluster addresses of the unit. Multiple
+        units will allow for simultaneous stress tests against ceph.
 
         :param event: Event
         :type event: Operator framework event object
@@ -319,6 +363,10 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
         :rtype: None
         """
         logging.info("Unit has peers")
+        # Peers measure the public and cluster networks between each other
+        self.peers.set_unit_addresses({
+            binding: self.model.get_binding(binding).network.bind_address
+            for binding in ("public", "cluster")})
 
     def request_ceph_pool(self, event):
         """Request pool from ceph cluster.
@@ -331,6 +379,7 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
         logging.info("Requesting replicated pool")
         self.ceph_client.create_replicated_pool(
             self.model.config["pool-name"])
+        self.request_ec_pools()
         logging.info("Requesting permissions")
         self.ceph_client.request_ceph_permissions(
             self.CEPH_CLIENT_NAME,
@@ -339,6 +388,61 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
             "osd heartbeat grace": 20,
             "osd heartbeat interval": 5})
 
+    def ec_profiles(self):
+        """Erasure code profiles configured for benchmarking.
+
+        :returns: Label to profile name, pool name, k and m
+        :rtype: Dict[str, dict]
+        :raises: ValueError if a profile is not a k,m pair
+        """
+        _profiles = {}
+        for profile in (self.model.config.get("ec-profiles") or "").split():
+            try:
+                _k, _m = (int(v) for v in profile.split(","))
+            except ValueError:
+                raise ValueError(
+                    "Invalid erasure code profile {}, expected k,m"
+                    .format(profile))
+            _label = "ec-{}-{}".format(_k, _m)
+            _profiles[_label] = {
+                "profile": "woodpecker-{}".format(_label),
+                "pool": "{}-{}".format(self.model.config["pool-name"], _label),
+                "k": _k,
+                "m": _m}
+        return _profiles
+
+    def request_ec_pools(self):
+        """Request the erasure coded pools from ceph.
+
+        Pools are requested with allow_ec_overwrites so that RBD images can
+        store their data on them.
+
+        :returns: This method is called for its side effects
+        :rtype: None
+        """
+        try:
+            _profiles = self.ec_profiles()
+        except ValueError as e:
+            logging.error(e)
+            return
+        if not _profiles:
+            return
+        _rq = self.ceph_client.get_existing_request()
+        for profile in _profiles.values():
+            logging.info("Requesting erasure coded pool {}".format(
+                profile["pool"]))
+            _rq.add_op_create_erasure_profile(
+                name=profile["profile"],
+                k=profile["k"],
+                m=profile["m"],
+                failure_domain=self.model.config["ec-failure-domain"])
+            _rq.add_op_create_erasure_pool(
+                name=profile["pool"],
+                erasure_profile=profile["profile"],
+                allow_ec_overwrites=True,
+                app_name="rbd")
+        self.ceph_client.send_request_if_needed(_rq)
+
     def refresh_request(self, event):
         """Refresh request for pool from ceph cluster.
 
@@ -348,7 +452,10 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
         :rtype: None
         """
         self.render_config(event)
-        self.request_ceph_pool(event)
+        # Pools, e.g. new erasure coded pools, can only be requested once
+        # related to ceph
+        if self.model.get_relation("ceph-client"):
+            self.request_ceph_pool(event)
 
     def get_pool_name(self, event):
         """Get pool name.
@@ -389,6 +496,52 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
         self.adapters.action_params = _action_parameters
         self.adapters._relations.add("action_params")
 
+    def add_config_for_rendering(self, config_file):
+        """Add a file to render, once.
+
+        :param config_file: Path of the file to render
+        :type config_file: str
+        :returns: This method is called for its side effects
+        :rtype: None
+        """
+        if config_file not in self.configs_for_rendering:
+            self.configs_for_rendering.append(config_file)
+
+    def write_if_changed(self, path, content, perms=0o444):
+        """Atomically write content to path if it differs.
+
+        The content hash is compared with the one of the last write, or of
+        the file on disk, so unchanged files are neither rewritten nor
+        trigger the work depending on them.
+
+        :param path: Path of the file
+        :type path: str
+        :param content: Content of the file
+        :type content: bytes
+        :param perms: Permissions of the file
+        :type perms: int
+        :returns: Whether the file was written
+        :rtype: bool
+        """
+        _hash = hashlib.sha256(content).hexdigest()
+        if self.rendered_hashes.get(path) != _hash:
+            try:
+                with open(path, "rb") as fh:
+                    self.rendered_hashes[path] = hashlib.sha256(
+                        fh.read()).hexdigest()
+            except FileNotFoundError:
+                pass
+        if self.rendered_hashes.get(path) == _hash:
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _tmp = "{}.{}.tmp".format(path, os.getpid())
+        with open(_tmp, "wb") as fh:
+            fh.write(content)
+        os.chmod(_tmp, perms)
+        os.replace(_tmp, path)
+        self.rendered_hashes[path] = _hash
+        return True
+
     def render_config(self, event):
         """Render configuration files.
 
@@ -401,10 +554,8 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
         """
         ceph_storage = self.ceph_client.pools_available
         if ceph_storage:
-            self.configs_for_rendering += [
-                str(self.CEPH_CONF),
-                str(self.BENCHMARK_KEYRING)
-            ]
+            self.add_config_for_rendering(str(self.CEPH_CONF))
+            self.add_config_for_rendering(str(self.BENCHMARK_KEYRING))
             self.CEPH_CONFIG_PATH.mkdir(
                 exist_ok=True,
                 mode=0o750)
@@ -416,20 +567,28 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
         # Check for config based (not vault certificates) SSL
         # Write the CA certificate
         if self.model.config.get("ssl_ca"):
-            with open(self.SSL_CA, 'wb') as fh:
-                fh.write(b64decode(self.model.config.get("ssl_ca")))
-            subprocess.check_call(['update-ca-certificates', '--fresh'])
+            if self.write_if_changed(
+                    str(self.SSL_CA),
+                    b64decode(self.model.config.get("ssl_ca")),
+                    perms=0o644):
+                subprocess.check_call(['update-ca-certificates', '--fresh'])
             self._stored.enable_tls = True
 
+        import charmhelpers.core.templating as ch_templating
+
         def _render_configs():
             for config_file in self.configs_for_rendering:
                 template_file = os.path.basename(config_file)
                 if config_file == str(self.BENCHMARK_KEYRING):
                     template_file = self.CEPH_CLIENT_TEMPLATE
-                ch_templating.render(
+                # Render in memory, only write out changed content
+                _content = ch_templating.render(
                     template_file,
-                    config_file,
+                    None,
                     self.adapters)
+                if self.write_if_changed(
+                        config_file, _content.encode("UTF-8")):
+                    logging.info("Rendered {}".format(config_file))
         logging.info("Rendering config")
         _render_configs()
 
@@ -467,6 +626,7 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
         :returns: This method is called for its side effects
         :rtype: None
         """
+        import cryptography.hazmat.primitives.serialization as serialization
         self.TLS_KEY_PATH.write_bytes(
             self.ca_client.application_key.private_bytes(
                 encoding=serialization.Encoding.PEM,
@@ -475,9 +635,11 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
         self.TLS_CERT_PATH.write_bytes(
             self.ca_client.application_certificate.public_bytes(
                 encoding=serialization.Encoding.PEM))
-        self.TLS_CA_CERT_PATH.write_bytes(
+        _ca_changed = self.write_if_changed(
+            str(self.TLS_CA_CERT_PATH),
             self.ca_client.ca_certificate.public_bytes(
-                encoding=serialization.Encoding.PEM))
+                encoding=serialization.Encoding.PEM),
+            perms=0o644)
         self.TLS_KEY_AND_CERT_PATH.write_bytes(
             self.ca_client.application_certificate.public_bytes(
                 encoding=serialization.Encoding.PEM) +
@@ -491,24 +653,242 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
             self.ca_client.application_key.public_key().public_bytes(
                 format=serialization.PublicFormat.SubjectPublicKeyInfo,
                 encoding=serialization.Encoding.PEM))
-        subprocess.check_call(["update-ca-certificates"])
+        if _ca_changed:
+            subprocess.check_call(["update-ca-certificates"])
         self._stored.enable_tls = True
         self.render_config(event)
 
     def custom_status_check(self):
         """Custom status check.
 
-        Inform the operator if the charm has been deployed in a container.
+        Inform the operator if the charm has been deployed in a container,
+        if the last benchmark regressed from its baseline or if the erasure
+        code profiles are invalid.
 
         :returns: This method is called for its side effects
         :rtype: None
         """
+        _action = self.model.config["regression-action"]
+        if _action not in self.REGRESSION_ACTIONS:
+            return ops.model.BlockedStatus(
+                "regression-action must be one of {}".format(
+                    ", ".join(self.REGRESSION_ACTIONS)))
+        if self._stored.regression and _action == "blocked":
+            return ops.model.BlockedStatus(self._stored.regression)
+        try:
+            self.ec_profiles()
+        except ValueError as e:
+            return ops.model.BlockedStatus(str(e))
+        _messages = []
+        if self._stored.regression and _action == "warn":
+            _messages.append(self._stored.regression)
         if ch_host.is_container():
-            return ops.model.ActiveStatus(
+            _messages.append(
                 "Some charm actions cannot be performed when deployed in a "
                 "container")
-        else:
-            return ops.model.ActiveStatus()
+        return ops.model.ActiveStatus("; ".join(_messages))
+
+    def start_metrics_server(self, event):
+        """Start the Prometheus target for scraping of collected metrics.
+
+        The target also serves the JSON results API, including the run in
+        progress. When the action exits, the results API daemon takes over
+        the port until the next run.
+
+        :param event: Event of the action, failed when the port cannot be
+                      bound
+        :type event: Operator framework event object
+        :returns: Whether the target is served
+        :rtype: bool
+        """
+        import results_api
+        from prometheus_client import make_wsgi_app
+        if self.metrics_server:
+            return True
+        self.stop_results_api()
+        try:
+            _server = results_api.start_server(
+                self.METRICS_PORT,
+                results_api.make_app(self.history, make_wsgi_app()))
+        except OSError as e:
+            # e.g. the results API daemon did not exit in time
+            _msg = "Cannot serve metrics on port {}: {}".format(
+                self.METRICS_PORT, e)
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+            self.start_results_api()
+            return False
+        self.metrics_server = _server
+        atexit.register(self.stop_metrics_server)
+        return True
+
+    def stop_metrics_server(self):
+        """Stop the metrics target of this process and hand the port over to
+        the results API daemon.
+
+        :returns: This method is called for its side effects
+        :rtype: None
+        """
+        if not self.metrics_server:
+            return
+        self.metrics_server.shutdown()
+        self.metrics_server.server_close()
+        self.metrics_server = None
+        self.start_results_api()
+
+    @property
+    def history(self):
+        """History of the benchmark runs served by the results API."""
+        if self._history is None:
+            import results_api
+            self._history = results_api.ResultHistory(
+                str(self.RESULTS_PATH),
+                retention=self.model.config["results-retention"])
+        return self._history
+
+    def results_api_pid(self):
+        """PID of the results API daemon, None when it is not running.
+
+        :rtype: Union[int, None]
+        """
+        return self.daemon_pid(self.RESULTS_API_PID)
+
+    @staticmethod
+    def daemon_pid(pid_file):
+        """PID of a daemon, None when it is not running.
+
+        :param pid_file: PID file of the daemon
+        :type pid_file: Path
+        :rtype: Union[int, None]
+        """
+        try:
+            _pid = int(pid_file.read_text())
+            os.kill(_pid, 0)
+        except (OSError, ValueError):
+            return None
+        return _pid
+
+    def start_results_api(self):
+        """Serve the results API from a daemon between benchmark runs.
+
+        :returns: This method is called for its side effects
+        :rtype: None
+        """
+        import results_api
+        if self.results_api_pid() or self.metrics_server:
+            return
+        logging.info("Starting the results API daemon")
+        os.makedirs(str(self.WOODPECKER_PATH), mode=0o750, exist_ok=True)
+        with open(str(self.RESULTS_API_LOG), "a") as log:
+            subprocess.Popen(
+                [sys.executable, results_api.__file__,
+                 str(self.RESULTS_PATH), "--port", str(self.METRICS_PORT),
+                 "--pid-file", str(self.RESULTS_API_PID)],
+                stdin=subprocess.DEVNULL, stdout=log, stderr=log,
+                # The charm libraries, e.g. prometheus_client
+                env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)),
+                # Outlive the hook
+                start_new_session=True)
+
+    def stop_results_api(self, timeout=10):
+        """Stop the results API daemon to free the metrics port.
+
+        :param timeout: Maximum wait for the daemon to exit (s)
+        :type timeout: float
+        :returns: This method is called for its side effects
+        :rtype: None
+        """
+        _pid = self.results_api_pid()
+        if not _pid:
+            return
+        logging.info("Stopping the results API daemon")
+        os.kill(_pid, signal.SIGTERM)
+        _deadline = time.monotonic() + timeout
+        while self.results_api_pid() and time.monotonic() < _deadline:
+            time.sleep(0.1)
+
+    def ensure_results_api(self, event):
+        """Event handler restarting the results API daemon, e.g. after a
+        reboot.
+
+        :param event: Event
+        :type event: Operator framework event object
+        :returns: This method is called for its side effects
+        :rtype: None
+        """
+        self.start_results_api()
+
+    def fio_server_pid(self):
+        """PID of the fio server, None when it is not running.
+
+        :rtype: Union[int, None]
+        """
+        return self.daemon_pid(self.FIO_SERVER_PID)
+
+    def start_fio_server(self, port):
+        """Serve fio jobs sent by the leader, see on_distributed_fio_action.
+
+        :param port: Port to listen on
+        :type port: int
+        :returns: This method is called for its side effects
+        :rtype: None
+        """
+        if self.fio_server_pid():
+            return
+        logging.info("Starting the fio server on port {}".format(port))
+        os.makedirs(str(self.WOODPECKER_PATH), mode=0o750, exist_ok=True)
+        with open(str(self.FIO_SERVER_LOG), "a") as log:
+            _server = subprocess.Popen(
+                ["fio", "--server=,{}".format(port)],
+                stdin=subprocess.DEVNULL, stdout=log, stderr=log,
+                env=dict(os.environ, **{
+                    self.FIO_SERVER_IMAGE_ENV: self.RBD_IMAGE}),
+                # Outlive the hook
+                start_new_session=True)
+        self.FIO_SERVER_PID.write_text(str(_server.pid))
+        self._stored.fio_server_port = port
+
+    def stop_fio_server(self, timeout=10):
+        """Stop the fio server.
+
+        :param timeout: Maximum wait for the server to exit (s)
+        :type timeout: float
+        :returns: This method is called for its side effects
+        :rtype: None
+        """
+        _pid = self.fio_server_pid()
+        if not _pid:
+            return
+        logging.info("Stopping the fio server")
+        os.kill(_pid, signal.SIGTERM)
+        _deadline = time.monotonic() + timeout
+        while self.fio_server_pid() and time.monotonic() < _deadline:
+            time.sleep(0.1)
+
+    def ensure_fio_server(self, event):
+        """Event handler keeping the fio server running on the configured
+        port, e.g. after a reboot or a change of fio-server-port.
+
+        :param event: Event
+        :type event: Operator framework event object
+        :returns: This method is called for its side effects
+        :rtype: None
+        """
+        _port = self.model.config["fio-server-port"]
+        if (self.fio_server_pid() and
+                self._stored.fio_server_port == _port):
+            return
+        self.stop_fio_server()
+        if not _port:
+            return
+        try:
+            self.start_fio_server(_port)
+        except FileNotFoundError:
+            # fio comes with the charm packages
+            logging.warning("fio is not installed, fio server not started")
 
     def add_benchmark_metric(self, label, description, value):
         """
@@ -517,6 +897,7 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
             rbd_bench_{read|write}_??
             rados_bench_{read|write}_??
         """
+        from prometheus_client import Gauge
         if label not in self.metrics:
             self.metrics[label] = Gauge(
                 label, description,
@@ -524,12 +905,142 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
             )
         self.metrics[label].labels(
             self.model.name, self.unit.name).set(value)
+        self.history.record(label, value)
 
-    # Actions
-    def on_rbd_map_image_action(self, event):
-        """Event handler on rbd map image action.
+    def add_fio_metrics(self, result):
+        """Add the metrics of a fio JSON result.
 
-        Create and map rbd image
+        :param result: Decoded fio JSON output
+        :type result: dict
+        :returns: This method is called for its side effects
+        :rtype: None
+        """
+        for job in result["jobs"]:
+            for metric in ('read', 'write'):
+                bandwidth = job[metric]["bw"]
+                iops = job[metric]["iops"]
+                # lat_ns is broadly slat + clat so
+                # represents what the calling application
+                # would actually see in terms of latency
+                latency = job[metric]["lat_ns"]["mean"]
+                if all((bandwidth, iops, latency)):
+                    self.add_benchmark_metric(
+                        'fio_{}_bandwidth'.format(metric),
+                        'FIO {} bandwidth (B/s)'.format(metric),
+                        bandwidth
+                    )
+                    self.add_benchmark_metric(
+                        'fio_{}_iops'.format(metric),
+                        'FIO {} IOPS'.format(metric),
+                        iops
+                    )
+                    self.add_benchmark_metric(
+                        'fio_{}_latency'.format(metric),
+                        'FIO {} latency (ns)'.format(metric),
+                        latency
+                    )
+                # But add some more detailed latency reporting anyway
+                _keys = ('min', 'max', 'mean', 'stddev')
+                for _key in _keys:
+                    self.add_benchmark_metric(
+                        'fio_{}_{}_{}'.format(metric,
+                                              'clat',
+                                              _key),
+                        'FIO {} {} {} (ns)'.format(metric,
+                                                   'clat',
+                                                   _key),
+                        job[metric]["clat_ns"][_key]
+                    )
+                percentiles = job[metric]["clat_ns"]["percentile"]
+                for percentile, latency in percentiles.items():
+                    self.add_benchmark_metric(
+                        'fio_{}_{}_{}'.format(
+                            metric,
+                            'clat',
+                            percentile.replace('.', '_')),
+                        'FIO {} {} {} (ns)'.format(metric,
+                                                   'clat',
+                                                   percentile),
+                        latency
+                    )
+
+    @property
+    def artifacts(self):
+        return artifacts.ArtifactStore(
+            str(self.ARTIFACT_PATH),
+            retention=self.model.config["artifact-retention"])
+
+    @property
+    def cleanup(self):
+        import cleanup
+        return cleanup.CleanupRegistry(str(self.CLEANUP_PATH))
+
+    def retire_rbd_image(self, pool_name, image):
+        """Move an rbd image to the trash for background removal.
+
+        Removing a large image takes long, moving it to the trash frees its
+        name right away. The trashed image is registered for cleanup by its
+        ID, as its name may already refer to a new image when it is removed.
+
+        :param pool_name: Pool of the image
+        :type pool_name: str
+        :param image: Image name
+        :type image: str
+        :returns: This method is called for its side effects.
+        :rtype: None
+        """
+        _bench = bench_tools.BenchTools(self)
+        try:
+            _id = _bench.rbd_image_id(pool_name, image)
+        except subprocess.CalledProcessError as e:
+            if e.returncode != errno.ENOENT:
+                raise
+            # Nothing to retire
+            return
+        # A mapped image cannot be moved
+        if os.path.exists(
+                "{}/{}/{}".format(str(self.RBD_DEV), pool_name, image)):
+            _bench.rbd_unmap_image(pool_name, image)
+        _bench.rbd_trash_image(pool_name, image)
+        self.cleanup.register("rbd", pool_name, _id, image=image)
+
+    def start_cleanup(self, concurrency=64, wait=False, keys=None):
+        """Remove the registered benchmark data.
+
+        :param concurrency: Concurrent removals per item
+        :type concurrency: int
+        :param wait: Remove in this process instead of in the background
+        :type wait: bool
+        :param keys: Only remove these items, all pending items if None
+        :type keys: Union[List[str], None]
+        :returns: This method is called for its side effects.
+        :rtype: None
+        """
+        import cleanup
+        _registry = self.cleanup
+        if wait:
+            cleanup.CleanupWorker(
+                _registry, self.CEPH_CLIENT_NAME, str(self.CEPH_CONF),
+                concurrency).run(keys)
+            return
+        logging.info("Starting background cleanup")
+        _cmd = [sys.executable, cleanup.__file__, str(self.CLEANUP_PATH),
+                "-n", self.CEPH_CLIENT_NAME, "-c", str(self.CEPH_CONF),
+                "-t", str(concurrency)]
+        for key in keys or []:
+            _cmd += ["-k", key]
+        with open(str(self.CLEANUP_LOG), "a") as log:
+            _worker = subprocess.Popen(
+                _cmd, stdin=subprocess.DEVNULL, stdout=log, stderr=log,
+                # Outlive the action
+                start_new_session=True)
+        _registry.add_worker(_worker.pid)
+
+    def on_cleanup_action(self, event):
+        """Event handler on cleanup action.
+
+        Remove the data left behind by benchmarks in the background and
+        report the progress of the removal.
 
         :param event: Event
         :type event: Operator framework event object
@@ -537,14 +1048,240 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
                   results.
         :rtype: None
         """
-        # Prepare the rbd image
-        self.rbd_create_image(event)
-        self.rbd_map_image(event)
+        _registry = self.cleanup
+        if not event.params["status-only"]:
+            if not _registry.workers_running:
+                # Only report the current removal
+                _registry.forget_done()
+            _registry.retry_failed()
+            self.start_cleanup(
+                concurrency=event.params["concurrency"],
+                wait=event.params["wait"])
+        event.set_results({
+            self.action_output_key: json.dumps(_registry.progress())})
 
-    def on_rados_bench_action(self, event):
-        """Event handler on RADOS bench action.
+    @property
+    def ceph_conf(self):
+        """ceph.conf of the current run."""
+        return os.environ.get("CEPH_CONF", str(self.CEPH_CONF))
 
-        Run the rados-bench test.
+    @contextlib.contextmanager
+    def client_config(self, overrides):
+        """Run with client configuration overrides.
+
+        The overrides are rendered into a run-scoped copy of ceph.conf,
+        which the ceph tools started meanwhile read through CEPH_CONF.
+
+        :param overrides: Option to value
+        :type overrides: Dict[str, str]
+        """
+        if not overrides:
+            yield
+            return
+        self.write_if_changed(
+            str(self.RUN_CEPH_CONF),
+            tuning.render_overrides(
+                self.CEPH_CONF.read_text(), overrides).encode("UTF-8"),
+            perms=0o640)
+        logging.info("Running with ceph client overrides {}".format(
+            overrides))
+        os.environ["CEPH_CONF"] = str(self.RUN_CEPH_CONF)
+        try:
+            yield
+        finally:
+            del os.environ["CEPH_CONF"]
+
+    def repeat_trial(self, trial, count):
+        """Run a benchmark trial count times.
+
+        :returns: Result and flat metrics of every trial
+        :rtype: Tuple[List[Any], List[dict]]
+        """
+        _outputs = []
+        _samples = []
+        for index in range(count):
+            if count > 1:
+                logging.info("Running trial {}/{}".format(index + 1, count))
+            _result, _sample = trial()
+            _outputs.append(_result)
+            _samples.append(_sample)
+        return _outputs, _samples
+
+    def run_trials(self, event, trial):
+        """Run a benchmark trial as many times as requested.
+
+        When more than one trial is requested, the metrics of every trial
+        are aggregated into statistics returned alongside the last result.
+        The action only returns the compact metrics of the last trial, the
+        full output of every trial is saved as an artifact.
+
+        Trials run with the ceph-config client overrides of the action, or
+        once per combination of its ceph-config-matrix.
+
+        :param event: Event
+        :type event: Operator framework event object
+        :param trial: Runs one trial, returns its result and flat metrics
+        :type trial: Callable[[], Tuple[Any, dict]]
+        :returns: Results to set on the event
+        :rtype: dict
+        """
+        _name = event.handle.kind.replace("_action", "")
+        _count = max(1, int(event.params.get("trials") or 1))
+        try:
+            _overrides = tuning.parse_overrides(
+                event.params.get("ceph-config"))
+            _matrix = None
+            if event.params.get("ceph-config-matrix"):
+                _matrix = tuning.parse_matrix(
+                    event.params["ceph-config-matrix"], _overrides)
+        except ValueError as e:
+            _msg = str(e)
+            logging.error(_msg)
+            event.fail(_msg)
+            return {"stderr": _msg, "code": "1"}
+        # Runs are recorded for the results API, failed ones included
+        self.history.start_run(_name, event.params)
+        try:
+            if _matrix:
+                _results = self.run_tuning_matrix(
+                    event, _name, trial, _matrix)
+            else:
+                with self.client_config(_overrides):
+                    _outputs, _samples = self.repeat_trial(trial, _count)
+        except Exception:
+            self.history.finish_run(state="failed")
+            raise
+        if _matrix:
+            self.history.finish_run({
+                "ranking": json.loads(_results[self.action_output_key]),
+                "artifact-id": _results["artifact-id"]})
+            return _results
+        _sample = _samples[-1]
+        _artifact = {
+            "params": event.params,
+            "outputs": _outputs,
+            "samples": _samples}
+        _results = {self.action_output_key: json.dumps(_sample)}
+        _metrics = _sample
+        if _count > 1:
+            _artifact["statistics"] = bench_stats.aggregate_trials(_samples)
+            _results["statistics"] = json.dumps(_artifact["statistics"])
+            _metrics = {key: value["mean"] for key, value
+                        in _artifact["statistics"].items()}
+        _results["artifact-id"] = self.artifacts.save(_name, _artifact)
+        _results.update(self.check_baseline(
+            event, _name, _metrics, _results["artifact-id"]))
+        self.history.finish_run(dict(
+            {key: value for key, value in _results.items()
+             if key not in (self.action_output_key, "statistics")},
+            metrics=_metrics,
+            statistics=_artifact.get("statistics", {})))
+        return _results
+
+    def run_tuning_matrix(self, event, name, trial, matrix):
+        """Run a benchmark for every combination of client overrides.
+
+        :param event: Event
+        :type event: Operator framework event object
+        :param name: Benchmark name
+        :type name: str
+        :param trial: Runs one trial, returns its result and flat metrics
+        :type trial: Callable[[], Tuple[Any, dict]]
+        :param matrix: Overrides of every combination
+        :type matrix: List[Dict[str, str]]
+        :returns: Combinations ranked by the rank-by metric
+        :rtype: dict
+        """
+        _count = max(1, int(event.params.get("trials") or 1))
+        _runs = []
+        _combinations = []
+        for index, overrides in enumerate(matrix):
+            logging.info("Running combination {}/{}".format(
+                index + 1, len(matrix)))
+            with self.client_config(overrides):
+                _outputs, _samples = self.repeat_trial(trial, _count)
+            _sample = _samples[-1]
+            if _count > 1:
+                _sample = {
+                    key: value["mean"] for key, value
+                    in bench_stats.aggregate_trials(_samples).items()}
+            _runs.append((overrides, _sample))
+            _combinations.append({
+                "ceph-config": overrides,
+                "outputs": _outputs,
+                "samples": _samples})
+        _ranking = tuning.rank(_runs, event.params.get("rank-by"))
+        return {
+            self.action_output_key: json.dumps(_ranking),
+            "artifact-id": self.artifacts.save(name, {
+                "params": event.params,
+                "combinations": _combinations,
+                "ranking": _ranking})}
+
+    def check_baseline(self, event, name, metrics, artifact_id):
+        """Save or compare the metrics of a run with its baseline.
+
+        Runs with the same action and parameters share a baseline. A
+        regression beyond the configured thresholds fails the action or
+        blocks the unit, depending on the regression-action option.
+
+        :param event: Event
+        :type event: Operator framework event object
+        :param name: Benchmark name
+        :type name: str
+        :param metrics: Flat metrics of the run
+        :type metrics: dict
+        :param artifact_id: Artifact holding the full output of the run
+        :type artifact_id: str
+        :returns: Baseline results to set on the event
+        :rtype: dict
+        """
+        _store = baselines.BaselineStore(str(self.BASELINE_PATH))
+        _spec = baselines.spec_id(name, event.params)
+        if event.params.get("save-baseline"):
+            _store.save(_spec, metrics, artifact_id)
+            self._stored.regression = ""
+            return {"baseline": _spec, "verdict": "baseline-saved"}
+        _baseline = _store.load(_spec)
+        if not _baseline:
+            return {"baseline": _spec, "verdict": "no-baseline"}
+
+        _regressions = baselines.compare(
+            _baseline["metrics"],
+            metrics,
+            {"iops": self.model.config["regression-iops-threshold"],
+             "bandwidth": self.model.config["regression-bandwidth-threshold"],
+             "latency": self.model.config["regression-latency-threshold"]})
+        self.add_benchmark_metric(
+            '{}_regression'.format(name),
+            '{} regression against baseline (1 regressed)'.format(name),
+            int(bool(_regressions)))
+        _results = {
+            "baseline": _spec,
+            "verdict": "regression" if _regressions else "pass"}
+        if not _regressions:
+            self._stored.regression = ""
+            return _results
+
+        _results["regressions"] = json.dumps(_regressions)
+        _msg = "{} regressed from baseline {}: {}".format(
+            name, _spec, ", ".join(sorted(_regressions)))
+        logging.warning(_msg)
+        if self.model.config["regression-action"] in ("blocked", "warn"):
+            # Shown in the unit status until a later run passes
+            self._stored.regression = _msg
+            self.update_status()
+        else:
+            # An invalid regression-action blocks the unit, the run fails
+            # as with the default
+            event.fail(_msg)
+        return _results
+
+    # Actions
+    def on_fetch_artifact_action(self, event):
+        """Event handler on fetch artifact action.
+
+        Return a chunk of a saved artifact, or the list of artifacts.
 
         :param event: Event
         :type event: Operator framework event object
@@ -552,40 +1289,490 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
                   results.
         :rtype: None
         """
-        _bench = bench_tools.BenchTools(self)
-        logging.info(
-            "Running rados bench {}".format(event.params["operation"]))
+        _store = self.artifacts
+        _artifact_id = event.params.get("artifact-id")
+        if not _artifact_id:
+            event.set_results({"artifacts": " ".join(_store.list())})
+            return
+        _offset = event.params["offset"]
         try:
-            _result = _bench.rados_bench(
-                self.get_pool_name(event),
-                event.params["seconds"],
-                event.params["operation"],
-                switches=event.params.get("switches"))
-            event.set_results({self.action_output_key: _result})
-        except subprocess.CalledProcessError as e:
-            _msg = ("rados bench failed: {}"
-                    .format(e.stderr.decode("UTF-8")))
-            logging.error(_msg)
+            _size = _store.size(_artifact_id)
+            _chunk = _store.read(
+                _artifact_id, _offset, event.params["length"])
+        except artifacts.ArtifactNotFoundError:
+            _msg = "Unknown artifact: {}".format(_artifact_id)
             event.fail(_msg)
             event.set_results({
                 "stderr": _msg,
                 "code": "1"})
+            return
+        event.set_results({
+            "chunk": _chunk,
+            "offset": str(_offset),
+            "next-offset": str(_offset + len(_chunk)),
+            "size": str(_size)})
 
-    def rbd_create_image(self, event):
-        """Create map and mount rbd block device.
+    def on_rbd_map_image_action(self, event):
+        """Event handler on rbd map image action.
 
-        Create RBD image. Map RBD Image. Prepare and mount RBD block device.
+        Create and map rbd image
 
         :param event: Event
         :type event: Operator framework event object
-        :returns: This method is called for its side effects.
+        :returns: This method is called for its side effect of setting event
+                  results.
         :rtype: None
         """
-        _bench = bench_tools.BenchTools(self)
+        # Prepare the rbd image
+        self.rbd_create_image(event)
+        self.rbd_map_image(event)
 
-        # Remove image if existing
-        logging.info("Removing rbd image if existing")
-        try:
+    def data_pattern(self, event, size):
+        """Write buffers of the data pattern parameters of an action.
+
+        :param event: Event
+        :type event: Operator framework event object
+        :param size: Buffer size
+        :type size: int
+        :returns: Buffer generator, None for the default incompressible data
+        :rtype: Union[data_patterns.BufferGenerator, None]
+        :raises: ValueError, OSError
+        """
+        import data_patterns
+        _pattern = event.params.get("data-pattern") or "random"
+        _compress = event.params.get("compress-percentage") or 0
+        _dedupe = event.params.get("dedupe-percentage") or 0
+        if _pattern == "random" and not _compress and not _dedupe:
+            return None
+        if _pattern == "sample" and not event.params.get("sample-file"):
+            raise ValueError("data-pattern sample requires sample-file")
+        return data_patterns.BufferGenerator(
+            size, _pattern, _compress, _dedupe,
+            event.params.get("sample-file"))
+
+    def with_pool_usage(self, pool_name, trial):
+        """Report the pool usage caused by a benchmark trial.
+
+        The logical and raw bytes the trial added to the pool, as counted by
+        ``ceph df detail``, give its logical against effective throughput and
+        the compression ratio BlueStore achieved. Other clients writing to
+        the pool meanwhile skew the report.
+
+        :param pool_name: Returns the pool the trial writes to
+        :type pool_name: Callable[[], str]
+        :param trial: Runs one trial, returns its result and flat metrics
+        :type trial: Callable[[], Tuple[Any, dict]]
+        :returns: The trial, reporting the pool usage under pool-usage/
+        :rtype: Callable[[], Tuple[Any, dict]]
+        """
+        import data_patterns
+        _bench = bench_tools.BenchTools(self)
+
+        def _trial():
+            _pool_name = pool_name()
+            _before = data_patterns.pool_usage(_bench.ceph_df(), _pool_name)
+            _start = time.monotonic()
+            _result, _sample = trial()
+            _elapsed = time.monotonic() - _start
+            # The OSDs report their usage to the mgr periodically
+            time.sleep(self.POOL_USAGE_SETTLE)
+            _after = data_patterns.pool_usage(_bench.ceph_df(), _pool_name)
+            _usage = data_patterns.compression_report(
+                _before, _after, _elapsed)
+            logging.info("Pool {} usage of the run: {}".format(
+                _pool_name, _usage))
+            return _result, dict(_sample, **bench_stats.flatten(
+                _usage, "pool-usage/"))
+
+        return _trial
+
+    def on_rados_bench_action(self, event):
+        """Event handler on RADOS bench action.
+
+        Run the rados-bench test.
+
+        :param event: Event
+        :type event: Operator framework event object
+        :returns: This method is called for its side effect of setting event
+                  results.
+        :rtype: None
+        """
+        import mixed_bench
+        if (event.params.get("object-sizes") or
+                event.params.get("concurrency-levels")):
+            self.rados_bench_sweep(event)
+            return
+
+        _bench = bench_tools.BenchTools(self)
+        _pool_name = self.get_pool_name(event)
+        _buffers = None
+        if event.params["operation"] == "write":
+            # rados bench writes the same buffer over and over, writes of
+            # another data pattern go through our own librados writer
+            try:
+                _block_size, _concurrency = self.parse_rados_bench_switches(
+                    event.params.get("switches"))
+                _buffers = self.data_pattern(event, _block_size)
+            except (OSError, ValueError) as e:
+                _msg = "Invalid data pattern: {}".format(e)
+                logging.error(_msg)
+                event.fail(_msg)
+                event.set_results({
+                    "stderr": _msg,
+                    "code": "1"})
+                return
+
+        def _rados_bench():
+            _output = _bench.rados_bench(
+                _pool_name,
+                event.params["seconds"],
+                event.params["operation"],
+                switches=event.params.get("switches"))
+            self.register_rados_bench_objects(_pool_name, _output)
+            return _output, self.parse_rados_bench_output(_output)
+
+        _trial = _rados_bench
+        if _buffers:
+            _trial = self.rados_pattern_write(
+                event, _pool_name, _buffers, _concurrency)
+        if event.params.get("pool-usage"):
+            _trial = self.with_pool_usage(lambda: _pool_name, _trial)
+
+        logging.info(
+            "Running rados bench {}".format(event.params["operation"]))
+        try:
+            event.set_results(self.run_trials(event, _trial))
+        except subprocess.CalledProcessError as e:
+            _msg = ("rados bench failed: {}"
+                    .format(e.stderr.decode("UTF-8")))
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+        except mixed_bench.StreamError as e:
+            _msg = "rados write failed: {}".format(e)
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+
+    def parse_rados_bench_switches(self, switches):
+        """Object size and concurrency of rados bench switches.
+
+        :param switches: rados bench switches, e.g. "-b 4K -t 32"
+        :type switches: str
+        :returns: Object size (bytes) and concurrency, rados bench defaults
+                  when not set
+        :rtype: Tuple[int, int]
+        :raises: ValueError
+        """
+        _size = 4 << 20
+        _concurrency = 16
+        _switches = (switches or "").split()
+        for switch, value in zip(_switches, _switches[1:]):
+            if switch in ("-b", "--block-size"):
+                _size = self.parse_object_size(value)
+            elif switch in ("-t", "--concurrent-ios"):
+                _concurrency = self.parse_concurrency(value)
+        return _size, _concurrency
+
+    @staticmethod
+    def parse_object_size(value):
+        """Parse an object size as given to rados bench -b.
+
+        :param value: Size in bytes, or with a K, M or G suffix, e.g. "4M"
+        :type value: str
+        :returns: Size (bytes)
+        :rtype: int
+        :raises: ValueError
+        """
+        _units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+        _value = value.upper().rstrip("B").rstrip("I")
+        _size = int(_value.rstrip("KMG")) * _units.get(_value[-1:], 1)
+        if _size <= 0:
+            raise ValueError("Invalid object size {}".format(value))
+        return _size
+
+    @staticmethod
+    def parse_concurrency(value):
+        """Parse a concurrency level as given to rados bench -t.
+
+        :param value: Operations in flight
+        :type value: str
+        :rtype: int
+        :raises: ValueError
+        """
+        _concurrency = int(value)
+        if _concurrency <= 0:
+            raise ValueError("Invalid concurrency level {}".format(value))
+        return _concurrency
+
+    def rados_pattern_write(self, event, pool_name, buffers, concurrency):
+        """Write new objects of a data pattern through librados.
+
+        :param event: Event
+        :type event: Operator framework event object
+        :param pool_name: Pool to write to
+        :type pool_name: str
+        :param buffers: Object content
+        :type buffers: data_patterns.BufferGenerator
+        :param concurrency: Writes in flight
+        :type concurrency: int
+        :returns: Runs one trial, returns its summary and flat metrics
+        :rtype: Callable[[], Tuple[dict, dict]]
+        """
+        import mixed_bench
+        _prefix = "woodpecker_pattern_{}".format(self.RBD_IMAGE)
+
+        def _trial():
+            if mixed_bench.rados is None:
+                raise mixed_bench.StreamError("python3-rados is not available")
+            # Unlike rados bench, the objects are left for the cleanup action
+            self.cleanup.register("rados", pool_name, _prefix)
+            _stream = mixed_bench.RadosStream(
+                self.ceph_conf,
+                self.CEPH_CLIENT_NAME,
+                pool_name,
+                # Every trial writes new objects
+                "{}_{}".format(_prefix, time.time_ns()),
+                objects=0,
+                buffers=buffers,
+                concurrency=concurrency,
+                size=buffers.size)
+            _stream.setup()
+            try:
+                logging.info("Writing {} data with {} writes in flight"
+                             .format(buffers.pattern, concurrency))
+                _summary = _stream.run(event.params["seconds"])
+            finally:
+                _stream.close()
+            return _summary, bench_stats.flatten(_summary)
+
+        return _trial
+
+    def register_rados_bench_objects(self, pool_name, output, run_name=None):
+        """Register the objects a rados bench write left for cleanup.
+
+        :param pool_name: Pool of the objects
+        :type pool_name: str
+        :param output: rados bench text output
+        :type output: str
+        :param run_name: Run name, whose metadata object is removed as well
+        :type run_name: str
+        :returns: Cleanup item keys
+        :rtype: List[str]
+        """
+        _keys = []
+        for line in output.split("\n"):
+            # Only printed by writes, objects are named after host and pid
+            if line.startswith("Object prefix:"):
+                _keys.append(self.cleanup.register(
+                    "rados", pool_name, line.split(":", 1)[1].strip(),
+                    objects=[run_name] if run_name else []))
+        return _keys
+
+    def parse_rados_bench_output(self, output):
+        """Parse RADOS Bench Output
+
+        :param output: RADOS Bench text output
+        :type output: string
+        :returns: Dictionary of the final summary.
+        :rtype: dict
+        """
+        _result = {}
+        _summary = False
+        for line in output.split("\n"):
+            if line.startswith("Total time run"):
+                _summary = True
+            if not _summary or ":" not in line:
+                continue
+            _key, _value = line.split(":", 1)
+            try:
+                _result[_key.strip()] = float(_value)
+            except ValueError:
+                continue
+        return _result
+
+    def rados_bench_sweep(self, event):
+        """Run rados bench over object sizes and concurrency levels.
+
+        Each point writes its objects once and reuses them for the seq and
+        rand phases. All the objects are removed in the background at the
+        end.
+
+        :param event: Event
+        :type event: Operator framework event object
+        :returns: This method is called for its side effect of setting event
+                  results.
+        :rtype: None
+        """
+        # Parsed before the first trial, so that a typo does not fail the
+        # sweep after data was written
+        try:
+            _sizes = [self.parse_object_size(size) for size in (
+                event.params.get("object-sizes") or "4194304").split()]
+            _levels = [self.parse_concurrency(level) for level in (
+                event.params.get("concurrency-levels") or "16").split()]
+        except ValueError as e:
+            _msg = ("Invalid object-sizes or concurrency-levels: {}"
+                    .format(e))
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+            return
+        _bench = bench_tools.BenchTools(self)
+        _pool_name = self.get_pool_name(event)
+        _switches = event.params.get("switches") or ""
+        # Cleanup items of the objects written by the sweep
+        _keys = []
+
+        def _trial():
+            _table = []
+            _sample = {}
+            for size in _sizes:
+                for level in _levels:
+                    _run_name = "woodpecker_sweep_{}_{}_{}".format(
+                        self.RBD_IMAGE, size, level)
+                    for operation in ("write", "seq", "rand"):
+                        logging.info(
+                            "Running rados bench {} -b {} -t {}"
+                            .format(operation, size, level))
+                        _point_switches = [
+                            _switches, "-t", str(level),
+                            "--run-name", _run_name]
+                        if operation == "write":
+                            _point_switches += [
+                                "-b", str(size), "--no-cleanup"]
+                        _output = _bench.rados_bench(
+                            _pool_name,
+                            event.params["seconds"],
+                            operation,
+                            switches=" ".join(_point_switches))
+                        _keys.extend(self.register_rados_bench_objects(
+                            _pool_name, _output, _run_name))
+                        _summary = self.parse_rados_bench_output(_output)
+                        _point = {
+                            "object-size": size,
+                            "concurrency": level,
+                            "operation": operation,
+                            "bandwidth-mb": _summary.get(
+                                "Bandwidth (MB/sec)"),
+                            "iops": _summary.get("Average IOPS"),
+                            "latency-s": _summary.get(
+                                "Average Latency(s)")}
+                        _table.append(_point)
+                        _sample.update(bench_stats.flatten(
+                            _point,
+                            "{}/{}/{}/".format(size, level, operation)))
+            return json.dumps(_table), _sample
+
+        try:
+            _results = self.run_trials(event, _trial)
+        except subprocess.CalledProcessError as e:
+            _msg = ("rados bench sweep failed: {}"
+                    .format(e.stderr.decode("UTF-8")))
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+        else:
+            event.set_results(_results)
+        finally:
+            # The objects are removed in the background
+            if _keys:
+                self.start_cleanup(keys=_keys)
+
+    def on_rados_metadata_bench_action(self, event):
+        """Event handler on RADOS metadata bench action.
+
+        Run small object, xattr and omap operations through librados.
+
+        :param event: Event
+        :type event: Operator framework event object
+        :returns: This method is called for its side effect of setting event
+                  results.
+        :rtype: None
+        """
+        import rados_metadata_bench
+        if rados_metadata_bench.rados is None:
+            _msg = "python3-rados is not available"
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+            return
+
+        # Prometheus target for scraping of collected metrics
+        if not self.start_metrics_server(event):
+            return
+
+        logging.info("Running rados metadata bench")
+
+        def _trial():
+            # Connect per trial, with the ceph.conf of the trial
+            _cluster = rados_metadata_bench.rados.Rados(
+                conffile=self.ceph_conf,
+                name=self.CEPH_CLIENT_NAME)
+            try:
+                _cluster.connect()
+                with _cluster.open_ioctx(self.get_pool_name(event)) as ioctx:
+                    _result = rados_metadata_bench.RadosMetadataBench(
+                        ioctx,
+                        "woodpecker_{}".format(self.RBD_IMAGE),
+                        objects=event.params["objects"],
+                        object_size=event.params["object-size"],
+                        omap_objects=event.params["omap-objects"],
+                        omap_keys=event.params["omap-keys"],
+                        concurrency=event.params["concurrency"]).run()
+            finally:
+                _cluster.shutdown()
+            for operation, summary in _result.items():
+                if not summary["ops"]:
+                    continue
+                self.add_benchmark_metric(
+                    'rados_{}_iops'.format(operation),
+                    'RADOS {} ops/s'.format(operation),
+                    summary["iops"])
+                self.add_benchmark_metric(
+                    'rados_{}_latency'.format(operation),
+                    'RADOS {} mean latency (ns)'.format(operation),
+                    summary["lat_ns"]["mean"])
+            return _result, bench_stats.flatten(_result)
+
+        try:
+            _results = self.run_trials(event, _trial)
+        except rados_metadata_bench.rados.Error as e:
+            _msg = "rados metadata bench failed: {}".format(e)
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+            return
+
+        event.set_results(_results)
+
+    def rbd_create_image(self, event):
+        """Create map and mount rbd block device.
+
+        Create RBD image. Map RBD Image. Prepare and mount RBD block device.
+
+        :param event: Event
+        :type event: Operator framework event object
+        :returns: This method is called for its side effects.
+        :rtype: None
+        """
+        _bench = bench_tools.BenchTools(self)
+
+        # Remove image if existing
+        logging.info("Removing rbd image if existing")
+        try:
             _bench.rbd_remove_image(
                 self.get_pool_name(event),
             )
@@ -653,6 +1840,87 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
                 "code": "1"})
             raise
 
+    def rbd_images(self, count):
+        """Names of the rbd images of this unit.
+
+        The first image keeps the historical single image name.
+
+        :param count: Number of images
+        :type count: int
+        :returns: Image names
+        :rtype: List[str]
+        """
+        return [self.RBD_IMAGE] + [
+            "{}-{}".format(self.RBD_IMAGE, index)
+            for index in range(1, max(1, count))]
+
+    def prepare_rbd_images(self, event, images, map_images=True):
+        """Recreate and map rbd images in parallel.
+
+        Existing images are moved to the trash and registered for cleanup.
+
+        :param event: Event
+        :type event: Operator framework event object
+        :param images: Image names
+        :type images: List[str]
+        :param map_images: Map the images, when possible in this unit
+        :type map_images: bool
+        :returns: This method is called for its side effects.
+        :rtype: None
+        """
+        _bench = bench_tools.BenchTools(self)
+        _pool_name = self.get_pool_name(event)
+        _extra_args = []
+        if event.params.get("ec-pool-name"):
+            _extra_args = ["--data-pool", event.params.get("ec-pool-name")]
+        _map = map_images and not ch_host.is_container()
+
+        def _prepare(image):
+            # The previous image is removed by the cleanup action
+            self.retire_rbd_image(_pool_name, image)
+            _bench.rbd_create_image(
+                _pool_name, event.params["image-size"], _extra_args, image)
+            if _map:
+                _bench.rbd_map_image(_pool_name, image)
+
+        logging.info("Preparing {} rbd images".format(len(images)))
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=min(16, len(images))) as executor:
+            _futures = [executor.submit(_prepare, image) for image in images]
+        try:
+            for future in _futures:
+                future.result()
+        except subprocess.CalledProcessError as e:
+            _msg = ("rbd image preparation failed: {}"
+                    .format(e.stderr.decode("UTF-8")))
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+            raise
+
+    def fio_image_totals(self, result):
+        """Aggregate and per image totals of a multi image fio result.
+
+        :param result: Decoded fio JSON output, one job group per image
+        :type result: dict
+        :returns: Flat metrics
+        :rtype: dict
+        """
+        _totals = bench_stats.fio_totals(result)
+        for metric in ('read', 'write'):
+            for key in ('iops', 'bw'):
+                self.add_benchmark_metric(
+                    'fio_aggregate_{}_{}'.format(metric, key),
+                    'FIO {} {} over all rbd images'.format(metric, key),
+                    _totals["{}_{}".format(metric, key)])
+        return bench_stats.flatten({
+            "aggregate": _totals,
+            "images": {
+                job["jobname"]: bench_stats.fio_totals({"jobs": [job]})
+                for job in result["jobs"]}})
+
     def mount_rbd(self, event):
         """Mount rbd block device.
 
@@ -679,12 +1947,463 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
             event.set_results({
                 "stderr": _msg,
                 "code": "1"})
-            raise
+            raise
+
+    def on_rbd_bench_action(self, event):
+        """Event handler on RBD bench action.
+
+        Run the rbd-bench test.
+
+        :param event: Event
+        :type event: Operator framework event object
+        :returns: This method is called for its side effect of setting event
+                  results.
+        :rtype: None
+        """
+        # Prepare the rbd image
+        self.rbd_create_image(event)
+        self.rbd_map_image(event)
+        self.mount_rbd(event)
+
+        _bench = bench_tools.BenchTools(self)
+
+        def _trial():
+            _output = _bench.rbd_bench(
+                self.get_pool_name(event),
+                event.params["operation"])
+            return _output, self.parse_rbd_bench_output(_output)
+
+        # Run bench
+        logging.info("Running rbd bench")
+        try:
+            event.set_results(self.run_trials(event, _trial))
+        except subprocess.CalledProcessError as e:
+            _msg = ("rbd bench failed: {}"
+                    .format(e.stderr.decode("UTF-8")))
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+            raise
+
+    def parse_rbd_bench_output(self, output):
+        """Parse RBD Bench Output
+
+        :param output: RBD Bench text output
+        :type output: string
+        :returns: Dictionary of the final summary.
+        :rtype: dict
+        """
+        _units = {"B/s": 1, "KiB/s": 1024, "MiB/s": 1024 ** 2,
+                  "GiB/s": 1024 ** 3}
+        _result = {}
+        for line in output.split("\n"):
+            if not line.startswith("elapsed:"):
+                continue
+            _parts = line.split()
+            for index, part in enumerate(_parts[:-1]):
+                if not part.endswith(":"):
+                    continue
+                try:
+                    _value = float(_parts[index + 1])
+                except ValueError:
+                    continue
+                # Recent releases print bytes/sec with a unit
+                if index + 2 < len(_parts) and _parts[index + 2] in _units:
+                    _value *= _units[_parts[index + 2]]
+                _result[part.rstrip(":")] = _value
+        return _result
+
+    def on_cephfs_bench_action(self, event):
+        """Event handler on CephFS bench action.
+
+        Mount CephFS, run fio against the mount and then a parallel metadata
+        workload.
+
+        :param event: Event
+        :type event: Operator framework event object
+        :returns: This method is called for its side effect of setting event
+                  results.
+        :rtype: None
+        """
+        if not self.ceph_client.pools_available:
+            _msg = "CephFS bench requires the ceph-client relation"
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+            return
+
+        event.params["cephfs_mount"] = str(self.CEPHFS_MOUNT)
+        # Add action_parms to adapters
+        self.set_action_params(event)
+        _fio_conf = str(self.CEPHFS_FIO_CONF)
+        self.add_config_for_rendering(_fio_conf)
+        self.render_config(event)
+
+        import metadata_bench
+        _bench = bench_tools.BenchTools(self)
+
+        # Prometheus target for scraping of collected metrics
+        if not self.start_metrics_server(event):
+            return
+
+        logging.info("Mounting CephFS {}".format(event.params["path"]))
+        try:
+            _bench.mount_cephfs(
+                event.params["path"], event.params["mount-type"])
+        except subprocess.CalledProcessError as e:
+            _msg = ("CephFS mount failed: {}"
+                    .format(e.stderr.decode("UTF-8")))
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+            return
+
+        def _trial():
+            logging.info("Running fio against CephFS")
+            _data = json.loads(_bench.fio(_fio_conf))
+            self.add_fio_metrics(_data)
+
+            logging.info("Running CephFS metadata workload")
+            _metadata = metadata_bench.MetadataBench(
+                str(self.CEPHFS_MOUNT / "woodpecker-{}".format(
+                    self.RBD_IMAGE)),
+                threads=event.params["metadata-threads"],
+                files=event.params["metadata-files"],
+                depth=event.params["metadata-depth"]).run()
+            for shape, operations in _metadata.items():
+                for operation, summary in operations.items():
+                    if not summary["ops"]:
+                        continue
+                    self.add_benchmark_metric(
+                        'cephfs_{}_{}_iops'.format(shape, operation),
+                        'CephFS {} tree {} ops/s'.format(shape, operation),
+                        summary["iops"])
+                    self.add_benchmark_metric(
+                        'cephfs_{}_{}_latency'.format(shape, operation),
+                        'CephFS {} tree {} mean latency (ns)'.format(
+                            shape, operation),
+                        summary["lat_ns"]["mean"])
+            return (
+                json.dumps({"data": _data, "metadata": _metadata}),
+                bench_stats.flatten({
+                    "data": bench_stats.fio_totals(_data),
+                    "metadata": _metadata}))
+
+        try:
+            event.set_results(self.run_trials(event, _trial))
+        except subprocess.CalledProcessError as e:
+            _msg = ("CephFS fio failed: {}"
+                    .format(e.stderr.decode("UTF-8")))
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+        except OSError as e:
+            _msg = "CephFS metadata workload failed: {}".format(e)
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+        finally:
+            _bench.umount(str(self.CEPHFS_MOUNT))
+
+    def network_addresses(self, network):
+        """Address of every unit on a network.
+
+        :param network: Binding name, "peers", "public" or "cluster"
+        :type network: str
+        :returns: Unit name to address, including this unit
+        :rtype: Dict[str, str]
+        """
+        _addresses = {
+            self.unit.name: str(
+                self.model.get_binding(network).network.bind_address)}
+        if not self.peers.is_joined:
+            return _addresses
+        if network == "peers":
+            _addresses.update({
+                unit: details["ip"] for unit, details
+                in self.peers.ready_peer_details.items()})
+        else:
+            _addresses.update(self.peers.unit_addresses(network))
+        return _addresses
+
+    def on_network_bench_action(self, event):
+        """Event handler on network bench action.
+
+        Serve the peers and measure TCP throughput and round trip time to
+        each of them, and the connect time to the Ceph monitors.
+
+        :param event: Event
+        :type event: Operator framework event object
+        :returns: This method is called for its side effect of setting event
+                  results.
+        :rtype: None
+        """
+        import network_bench
+        _network = event.params["network"]
+        if _network not in self.bindings:
+            _msg = "Unknown network {}, expected one of {}".format(
+                _network, ", ".join(self.bindings))
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+            return
+        _addresses = self.network_addresses(_network)
+        _peers = network_bench.schedule(list(_addresses), self.unit.name)
+        _mon_hosts = []
+        if self.model.get_relation("ceph-client"):
+            _mon_hosts = self.ceph_client.get_relation_data().get(
+                "mon_hosts") or []
+        if not _peers and not _mon_hosts:
+            _msg = "No peers or Ceph monitors to measure"
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+            return
+
+        # Prometheus target for scraping of collected metrics
+        if not self.start_metrics_server(event):
+            return
+
+        try:
+            _server = network_bench.NetworkBenchServer(event.params["port"])
+        except OSError as e:
+            _msg = "Cannot serve on port {}: {}".format(
+                event.params["port"], e)
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+            return
+
+        _client = network_bench.NetworkBenchClient(
+            self.unit.name,
+            event.params["port"],
+            streams=event.params["streams"],
+            duration=event.params["duration"],
+            buffer_size=event.params["buffer-size"],
+            ping_count=event.params["ping-count"])
+        _wait = event.params["wait-timeout"]
+        # Streams each peer completed against this unit by the end of the
+        # current trial, all units run the same number of trials
+        _expected = [0]
+
+        def _trial():
+            _results = {"network": _network, "peers": {}, "ceph-mons": {}}
+            for peer in _peers:
+                _address = _addresses[peer]
+                logging.info("Measuring network to {} at {}".format(
+                    peer, _address))
+                if not _client.wait_for(_address, _wait):
+                    _results["peers"][peer] = {
+                        "address": _address,
+                        "error": "not serving within {}s".format(_wait)}
+                    continue
+                try:
+                    _results["peers"][peer] = {
+                        "address": _address,
+                        "rtt": _client.rtt(_address),
+                        "throughput": _client.throughput(_address)}
+                except OSError as e:
+                    _results["peers"][peer] = {
+                        "address": _address, "error": str(e)}
+            for mon in _mon_hosts:
+                logging.info("Measuring connect time to {}".format(mon))
+                try:
+                    _results["ceph-mons"][mon] = _client.connect_rtt(
+                        mon, event.params["mon-port"])
+                except OSError as e:
+                    _results["ceph-mons"][mon] = {"error": str(e)}
+            # Peers started later may still be measuring against us, the
+            # next trial starts once they are done with this one
+            _expected[0] += event.params["streams"]
+            if not _server.wait_completed(_peers, _wait, _expected[0]):
+                logging.warning("Peers did not complete: {}".format(
+                    ", ".join(_server.pending(_peers, _expected[0]))))
+
+            _bandwidths = [
+                r["throughput"]["bandwidth_bps"]
+                for r in _results["peers"].values() if "error" not in r]
+            _rtts = [r["rtt"]["rtt_ns"]["mean"]
+                     for r in _results["peers"].values() if "error" not in r]
+            if _bandwidths:
+                self.add_benchmark_metric(
+                    'network_bench_bandwidth',
+                    'Lowest TCP bandwidth to a peer (bit/s)',
+                    min(_bandwidths))
+                self.add_benchmark_metric(
+                    'network_bench_rtt',
+                    'Highest mean TCP round trip time to a peer (ns)',
+                    max(_rtts))
+            return _results, bench_stats.flatten(_results)
+
+        _server.start()
+        try:
+            event.set_results(self.run_trials(event, _trial))
+        finally:
+            _server.stop()
+
+    def on_mixed_bench_action(self, event):
+        """Event handler on mixed bench action.
+
+        Run rbd, rados and swift streams alone then concurrently.
+
+        :param event: Event
+        :type event: Operator framework event object
+        :returns: This method is called for its side effect of setting event
+                  results.
+        :rtype: None
+        """
+        import mixed_bench
+        _names = event.params["streams"].split()
+        _msg = None
+        if not _names or set(_names) - {"rbd", "rados", "swift"}:
+            _msg = "streams must be a list of rbd, rados and swift"
+        elif "rados" in _names and mixed_bench.rados is None:
+            _msg = "python3-rados is not available"
+        elif "swift" in _names and not event.params.get("swift-address"):
+            _msg = "swift-address is required by the swift stream"
+        elif "swift" in _names and not self.get_swift_key():
+            _msg = ("Unable to set swift key. Please run the action on the "
+                    "leader.")
+        if _msg:
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+            return
+
+        _concurrency = mixed_bench.split_concurrency(
+            event.params["concurrency"],
+            {name: event.params["{}-weight".format(name)] for name in _names})
+        _duration = event.params["duration"]
+        _pool_name = self.get_pool_name(event)
+        _bench = bench_tools.BenchTools(self)
+        _prefix = "woodpecker_mixed_{}".format(self.RBD_IMAGE)
+        _container = "woodpecker-{}-mixed".format(self.RBD_IMAGE)
+
+        if "rbd" in _names:
+            self.prepare_rbd_images(event, [self.RBD_IMAGE])
+            event.params["client"] = self.CLIENT_NAME
+            event.params["rbd_iodepth"] = _concurrency["rbd"]
+            self.set_action_params(event)
+            self.add_config_for_rendering(str(self.MIXED_FIO_CONF))
+            self.render_config(event)
+        if "rados" in _names:
+            self.cleanup.register("rados", _pool_name, _prefix)
+        if "swift" in _names:
+            if not self.peers.swift_user_created:
+                self.radosgw_user_create()
+            self.cleanup.register("bucket", None, _container)
+
+        def _make_streams():
+            # Streams connect in their setup, with the ceph.conf of the trial
+            _streams = []
+            if "rbd" in _names:
+                _streams.append(mixed_bench.FioStream(
+                    lambda: json.loads(_bench.fio(str(self.MIXED_FIO_CONF))),
+                    bench_stats.fio_totals))
+            if "rados" in _names:
+                _streams.append(mixed_bench.RadosStream(
+                    self.ceph_conf,
+                    self.CEPH_CLIENT_NAME,
+                    _pool_name,
+                    _prefix,
+                    concurrency=_concurrency["rados"],
+                    rate=event.params["rados-rate-ops"],
+                    size=event.params["object-size"]))
+            if "swift" in _names:
+                _streams.append(mixed_bench.SwiftStream(
+                    "{}://{}/auth/v1.0".format(
+                        "https" if self._stored.enable_tls else "http",
+                        event.params["swift-address"]),
+                    self.SWIFT_USER,
+                    self.get_swift_key(),
+                    _container,
+                    concurrency=_concurrency["swift"],
+                    rate=event.params["swift-rate-ops"],
+                    size=event.params["object-size"]))
+            return _streams
+
+        # Prometheus target for scraping of collected metrics
+        if not self.start_metrics_server(event):
+            return
+
+        def _trial():
+            _results = {}
+            _streams = _make_streams()
+            try:
+                for stream in _streams:
+                    stream.setup()
+                if event.params["solo"]:
+                    for stream in _streams:
+                        logging.info("Running {} stream alone".format(
+                            stream.name))
+                        _results[stream.name] = {
+                            "solo": stream.run(_duration)}
+                logging.info("Running {} streams together".format(
+                    ", ".join(_names)))
+                _mixed = mixed_bench.run_streams(_streams, _duration)
+            finally:
+                for stream in _streams:
+                    stream.close()
+            for name, summary in _mixed.items():
+                _result = _results.setdefault(name, {})
+                _result["mixed"] = summary
+                self.add_benchmark_metric(
+                    'mixed_{}_iops'.format(name),
+                    'Mixed workload {} ops/s'.format(name),
+                    summary.get("iops", 0.0))
+                self.add_benchmark_metric(
+                    'mixed_{}_latency'.format(name),
+                    'Mixed workload {} mean latency (ns)'.format(name),
+                    summary.get("lat_ns", {}).get("mean", 0.0))
+                if "solo" in _result:
+                    # Change caused by the other streams
+                    _result["interference-percent"] = (
+                        bench_stats.delta_percent(
+                            bench_stats.flatten(_result["solo"]),
+                            bench_stats.flatten(summary)))
+            return _results, bench_stats.flatten(_results)
+
+        try:
+            event.set_results(self.run_trials(event, _trial))
+        except subprocess.CalledProcessError as e:
+            _msg = ("mixed bench failed: {}"
+                    .format(e.stderr.decode("UTF-8")))
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+        except mixed_bench.StreamError as e:
+            _msg = "mixed bench stream setup failed: {}".format(e)
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
 
-    def on_rbd_bench_action(self, event):
-        """Event handler on RBD bench action.
+    def on_bucket_index_bench_action(self, event):
+        """Event handler on bucket index bench action.
 
-        Run the rbd-bench test.
+        Fill a bucket to growing object counts through the Swift API and
+        measure PUT latency and listing throughput against the index shard
+        count at each of them.
 
         :param event: Event
         :type event: Operator framework event object
@@ -692,29 +2411,124 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
                   results.
         :rtype: None
         """
-        # Prepare the rbd image
-        self.rbd_create_image(event)
-        self.rbd_map_image(event)
-        self.mount_rbd(event)
+        import bucket_index_bench
+        import mixed_bench
+        _msg = None
+        try:
+            _targets = bucket_index_bench.parse_targets(
+                event.params["targets"])
+        except ValueError as e:
+            _msg = str(e)
+        if not _msg and not self.get_swift_key():
+            _msg = ("Unable to set swift key. Please run the action on the "
+                    "leader.")
+        if _msg:
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+            return
 
+        if not self.peers.swift_user_created:
+            self.radosgw_user_create()
         _bench = bench_tools.BenchTools(self)
+        # Cleanup items of the buckets filled
+        _keys = []
+
+        # Prometheus target for scraping of collected metrics
+        if not self.start_metrics_server(event):
+            return
+
+        def _trial():
+            # A new bucket for every trial, the index starts empty
+            _bucket = "woodpecker-{}-index-{}".format(
+                self.RBD_IMAGE,
+                datetime.datetime.utcnow().strftime("%Y%m%d%H%M%S"))
+            _keys.append(self.cleanup.register("bucket", None, _bucket))
+            _stream = mixed_bench.SwiftStream(
+                "{}://{}/auth/v1.0".format(
+                    "https" if self._stored.enable_tls else "http",
+                    event.params["swift-address"]),
+                self.SWIFT_USER,
+                self.get_swift_key(),
+                _bucket,
+                concurrency=event.params["concurrency"],
+                size=event.params["object-size"])
+            _stream.setup()
+            if event.params["num-shards"]:
+                _bench.radosgw_bucket_reshard(
+                    _bucket, event.params["num-shards"])
+            _index_bench = bucket_index_bench.BucketIndexBench(
+                _stream,
+                concurrency=event.params["concurrency"],
+                page_size=event.params["list-page-size"],
+                list_pages=event.params["list-pages"])
+            _checkpoints = {}
+            _filled = 0
+            for target in _targets:
+                logging.info("Filling bucket {} to {} objects".format(
+                    _bucket, target))
+                _put = _index_bench.fill(_filled, target)
+                _filled = target
+                _list = _index_bench.list()
+                _index = _bench.radosgw_bucket_limit(
+                    self.CLIENT_NAME, _bucket) or {}
+                _checkpoints[str(target)] = {
+                    "num_shards": _index.get("num_shards"),
+                    "objects_per_shard": _index.get("objects_per_shard"),
+                    "fill_status": _index.get("fill_status"),
+                    "put": _put,
+                    "list": _list}
+                logging.info("{} objects: {}".format(
+                    target, _checkpoints[str(target)]))
+                self.add_benchmark_metric(
+                    'bucket_index_put_latency',
+                    'Bucket index bench mean PUT latency (ns)',
+                    _put.get("lat_ns", {}).get("mean", 0.0))
+                self.add_benchmark_metric(
+                    'bucket_index_list_objects',
+                    'Bucket index bench listed objects/s',
+                    _list["objects_per_second"])
+                self.add_benchmark_metric(
+                    'bucket_index_num_shards',
+                    'Bucket index bench index shards',
+                    _index.get("num_shards") or 0)
+            _first = _checkpoints[str(_targets[0])]
+            _last = _checkpoints[str(_targets[-1])]
+            _result = {
+                "bucket": _bucket,
+                "checkpoints": _checkpoints,
+                # Degradation from the smallest to the largest index
+                "change-percent": bench_stats.delta_percent(
+                    bench_stats.flatten(
+                        {"put": _first["put"], "list": _first["list"]}),
+                    bench_stats.flatten(
+                        {"put": _last["put"], "list": _last["list"]}))}
+            return _result, bench_stats.flatten(_result)
 
-        # Run bench
-        logging.info("Running rbd bench")
         try:
-            _result = _bench.rbd_bench(
-                self.get_pool_name(event),
-                event.params["operation"])
-            event.set_results({self.action_output_key: _result})
+            event.set_results(self.run_trials(event, _trial))
         except subprocess.CalledProcessError as e:
-            _msg = ("rbd bench failed: {}"
+            _msg = ("bucket index bench failed: {}"
                     .format(e.stderr.decode("UTF-8")))
             logging.error(_msg)
             event.fail(_msg)
             event.set_results({
                 "stderr": _msg,
                 "code": "1"})
-            raise
+        except mixed_bench.StreamError as e:
+            _msg = "bucket index bench setup failed: {}".format(e)
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+        finally:
+            # Millions of objects take long to remove, kept buckets are left
+            # for the cleanup action
+            if _keys and not event.params["keep-bucket"]:
+                self.start_cleanup(keys=_keys)
 
     def get_swift_key(self):
         """Get Swift Key.
@@ -750,10 +2564,32 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
                     "bw": _parts[9].replace("/s", "")}
         return _result
 
+    def get_s3_credentials(self):
+        """Get S3 credentials.
+
+        Generate, on the leader, the missing credentials of the users of
+        the s3-users config option.
+
+        :returns: User name to access-key and secret-key
+        :rtype: dict
+        """
+        _credentials = self.peers.s3_credentials
+        _users = (self.model.config.get("s3-users") or "").split()
+        if (self.unit.is_leader() and
+                any(u not in _credentials for u in _users)):
+            for user in _users:
+                _credentials.setdefault(user, {
+                    "access-key": ch_host.pwgen(20).upper(),
+                    "secret-key": ch_host.pwgen(40)})
+            self.peers.set_s3_credentials(_credentials)
+        return _credentials
+
     def radosgw_user_create(self):
-        """Create raodsgw user.
+        """Create raodsgw users.
 
-        Create the radosgw ceph user
+        Create the radosgw ceph users, their swift and S3 keys. Users are
+        inspected first and only the missing parts are created. Verified
+        users are cached by a hash of their keys.
         :returns: This method is called for its side effects.
         :rtype: None
         """
@@ -764,24 +2600,39 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
 
         _bench = bench_tools.BenchTools(self)
 
-        if not self.peers.swift_user_created:
-            logging.info("Create radosgw user and key")
+        _users = {self.CLIENT_NAME: {
+            "subuser": "swift",
+            "secret": self.get_swift_key(),
+            "s3_keys": {}}}
+        for user, credentials in self.get_s3_credentials().items():
+            _user = _users.setdefault(
+                user, {"subuser": None, "secret": None, "s3_keys": {}})
+            _user["s3_keys"][credentials["access-key"]] = (
+                credentials["secret-key"])
+
+        for user, spec in sorted(_users.items()):
+            # Users already verified with the same keys are skipped
+            _hash = hashlib.sha256(json.dumps(
+                [user, spec], sort_keys=True).encode("UTF-8")).hexdigest()
+            if _hash in self._stored.rgw_users:
+                continue
+            logging.info("Provision radosgw user {}".format(user))
             try:
                 _bench.radosgw_user_create(
-                    self.CLIENT_NAME,
-                    "swift",
-                    self.get_swift_key())
-                self.peers.set_swift_user_created(self.SWIFT_USER)
-                logging.info("Successfully created the radosgw user and key")
+                    user,
+                    spec["subuser"],
+                    spec["secret"],
+                    s3_keys=spec["s3_keys"])
             except subprocess.CalledProcessError as e:
-                if ("user: {} exists".format(self.CLIENT_NAME)
-                        not in e.stderr.decode("UTF-8")):
-                    _msg = ("Rados GW user and key creation failed: {}"
-                            .format(e.stderr.decode("UTF-8")))
-                    logging.error(_msg)
-                else:
-                    logging.warning(
-                        "User: {} already exists.".format(self.CLIENT_NAME))
+                _msg = ("Rados GW user {} provisioning failed: {}"
+                        .format(user, e.stderr.decode("UTF-8")))
+                logging.error(_msg)
+                continue
+            self._stored.rgw_users.append(_hash)
+            if user == self.CLIENT_NAME:
+                self.peers.set_swift_user_created(self.SWIFT_USER)
+            logging.info("Successfully provisioned radosgw user {}".format(
+                user))
 
     def on_swift_bench_action(self, event):
         """Event handler on Swift bench action.
@@ -817,19 +2668,28 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
 
         _bench = bench_tools.BenchTools(self)
 
+        # Name the containers so that kept objects can be cleaned up
+        event.params["container_name"] = "woodpecker-{}-{}".format(
+            self.RBD_IMAGE,
+            datetime.datetime.utcnow().strftime("%Y%m%d%H%M%S"))
+        event.params["num_containers"] = self.SWIFT_CONTAINERS
+        if not event.params["delete-objects"]:
+            for index in range(self.SWIFT_CONTAINERS):
+                self.cleanup.register("bucket", None, "{}_{}".format(
+                    event.params["container_name"], index))
+
         # Add action_parms to adapters
         self.set_action_params(event)
         # Add swift-bench.conf for rendering
-        self.configs_for_rendering.append(str(self.SWIFT_BENCH_CONF))
+        self.add_config_for_rendering(str(self.SWIFT_BENCH_CONF))
         # Render swift-bench.conf with action_params
         self.render_config(event)
 
         # Prometheus target for scraping of collected FIO metrics
-        start_http_server(8088)
+        if not self.start_metrics_server(event):
+            return
 
-        # Run bench
-        logging.info("Running swift bench")
-        try:
+        def _trial():
             _result = _bench.swift_bench(delete=event.params["delete-objects"])
             job = self.parse_swift_bench_output(_result)
             json_result = json.dumps(job)
@@ -855,7 +2715,20 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
                         failures
                     )
 
-            event.set_results({self.action_output_key: json_result})
+            _sample = {}
+            for metric, values in job.items():
+                for key in ("successes", "failures", "bw"):
+                    try:
+                        _sample["{}/{}".format(metric, key)] = float(
+                            values[key])
+                    except ValueError:
+                        continue
+            return json_result, _sample
+
+        # Run bench
+        logging.info("Running swift bench")
+        try:
+            event.set_results(self.run_trials(event, _trial))
         except subprocess.CalledProcessError as e:
             # For some reason swift-bench sends outpout to stderr
             # So stderr is also on stdout
@@ -863,14 +2736,17 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
             _result = self.parse_swift_bench_output(_output)
             # There may be too many connection reset tracebacks in the raw
             # output overloading stack limits.
+            _artifact_id = self.artifacts.save(
+                "swift_bench", {"params": event.params, "outputs": [_output]})
             if _result.get("puts"):
                 # If we got partial data use that
                 _result = json.dumps(_result)
             else:
-                # Otherwise, return raw output (tracebacks)
-                _result = _output
-            _msg = ("swift bench failed: {}"
-                    .format(_result))
+                # Otherwise, return the tail of the raw output (tracebacks)
+                # the full output is in the artifact
+                _result = _output[-self.MAX_ERROR_OUTPUT:]
+            _msg = ("swift bench failed, full output in artifact {}: {}"
+                    .format(_artifact_id, _result))
             logging.error(_msg)
             event.fail(_msg)
             event.set_results({
@@ -878,10 +2754,47 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
                 "code": "1"})
             raise
 
+    def get_fio_trace(self, event):
+        """Get the I/O trace to replay with fio.
+
+        Return the trace file provided as action parameter, or capture a
+        blktrace from the trace-device action parameter. fio detects
+        whether the trace is an iolog or a blktrace.
+
+        :param event: Event
+        :type event: Operator framework event object
+        :returns: Path to the trace or None if no trace is to be replayed
+        :rtype: Union[str, None]
+        """
+        _trace_file = event.params.get("trace-file")
+        _trace_device = event.params.get("trace-device")
+        if _trace_file:
+            if not os.path.exists(_trace_file):
+                raise FileNotFoundError(
+                    errno.ENOENT, "Trace file not found", _trace_file)
+            return _trace_file
+        if not _trace_device:
+            return None
+
+        test_devices = self.model.storages.get('test-devices') or []
+        _locations = [str(d.location) for d in test_devices]
+        if _trace_device not in _locations:
+            raise ValueError(
+                "Trace device {} is not a test-devices storage: {}"
+                .format(_trace_device, " ".join(_locations)))
+        _bench = bench_tools.BenchTools(self)
+        logging.info("Capturing blktrace from {}".format(_trace_device))
+        self.TRACE_PATH.mkdir(parents=True, exist_ok=True)
+        return _bench.blktrace_capture(
+            _trace_device,
+            event.params["trace-capture-seconds"],
+            str(self.TRACE_PATH))
+
     def on_fio_action(self, event):
         """Event handler on FIO action.
 
-        Run the FIO test.
+        Run the FIO test. When a trace is provided, replay it against the
+        target device instead of the synthetic profile.
 
         :param event: Event
         :type event: Operator framework event object
@@ -889,6 +2802,51 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
                   results.
         :rtype: None
         """
+        try:
+            _trace = self.get_fio_trace(event)
+        except (OSError, ValueError) as e:
+            _msg = "fio trace unavailable: {}".format(e)
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+            return
+        except subprocess.CalledProcessError as e:
+            _msg = ("blktrace capture failed: {}"
+                    .format(e.stderr.decode("UTF-8")))
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+            return
+
+        import data_patterns
+        _msg = None
+        _pattern = event.params.get("data-pattern") or "random"
+        if _pattern not in data_patterns.PATTERNS:
+            _msg = "data-pattern must be one of {}".format(
+                ", ".join(data_patterns.PATTERNS))
+        elif (_pattern == "sample" and
+                not os.path.isfile(event.params.get("sample-file") or "")):
+            _msg = "data-pattern sample requires an existing sample-file"
+        elif (event.params.get("steady-state") and not _trace and
+                int(event.params["runtime"]) <
+                bench_stats.SteadyStateDetector(
+                    window=event.params["steady-state-window"]).window *
+                self.FIO_ITERATION):
+            _msg = ("steady-state requires a runtime of at least "
+                    "steady-state-window times {}s, the duration of an "
+                    "iteration".format(self.FIO_ITERATION))
+        if _msg:
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+            return
+
         test_devices = self.model.storages.get('test-devices')
         # If storage binding provided then override disk-devices
         # unless the application is related to ceph.
@@ -897,98 +2855,188 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
                 " ".join([str(d.location) for d in test_devices])
             )
 
+        _rbd_path = event.params.get("rbd-path") or "librbd"
+        _disk_devices = bool(event.params.get("disk-devices"))
+        # Pools to compare, images are prepared for each of them in turn
+        _pools = []
         # If not disk specified use RBD mount
         if not event.params.get("disk-devices"):
-            # Prepare the rbd image
-            self.rbd_create_image(event)
-            if not ch_host.is_container():
-                self.rbd_map_image(event)
+            if (_trace or _rbd_path != "librbd") and ch_host.is_container():
+                _msg = ("fio trace replay and krbd require a mapped rbd "
+                        "device, which is not possible in a container")
+                logging.error(_msg)
+                event.fail(_msg)
+                event.set_results({
+                    "stderr": _msg,
+                    "code": "1"})
+                return
+            # Prepare the rbd images
+            _images = self.rbd_images(
+                1 if _trace else event.params["image-count"])
+            if event.params.get("ec-compare") and not _trace:
+                try:
+                    _pools = [("replicated", None)] + [
+                        (label, profile["pool"]) for label, profile
+                        in self.ec_profiles().items()]
+                except ValueError as e:
+                    _pools = []
+                    logging.error(e)
+                if len(_pools) < 2:
+                    _msg = ("ec-compare requires valid ec-profiles in the "
+                            "charm configuration")
+                    logging.error(_msg)
+                    event.fail(_msg)
+                    event.set_results({
+                        "stderr": _msg,
+                        "code": "1"})
+                    return
+            else:
+                self.prepare_rbd_images(event, _images)
 
             # Add context for the render of rbd.fio
             event.params["client"] = self.CLIENT_NAME
             event.params["rbd_image"] = self.RBD_IMAGE
+            event.params["rbd_images"] = _images
             event.params["pool_name"] = self.get_pool_name(event)
             event.params["ioengine"] = 'rbd'
             _fio_conf = str(self.RBD_FIO_CONF)
+            # The rbd ioengine cannot replay an iolog, replay against the
+            # mapped device instead.
+            _replay_target = "{}/{}/{}".format(
+                str(self.RBD_DEV), self.get_pool_name(event), self.RBD_IMAGE)
+            if _rbd_path != "librbd":
+                # Run through the kernel client against the mapped images
+                event.params["disk_devices"] = [
+                    "{}/{}/{}".format(
+                        str(self.RBD_DEV), self.get_pool_name(event), image)
+                    for image in _images]
+                event.params["ioengine"] = event.params["krbd-ioengine"]
+                self.add_config_for_rendering(str(self.DISK_FIO_CONF))
+                self.add_config_for_rendering(str(self.RBD_FIO_CONF))
+            if _rbd_path == "krbd":
+                _fio_conf = str(self.DISK_FIO_CONF)
         else:
             event.params["disk_devices"] = event.params["disk-devices"].split()
             event.params["ioengine"] = 'libaio'
             _fio_conf = str(self.DISK_FIO_CONF)
+            _replay_target = event.params["disk_devices"][0]
+            _rbd_path = "librbd"
+
+        if _trace:
+            _rbd_path = "librbd"
+            event.params["ioengine"] = 'libaio'
+            event.params["trace_file"] = _trace
+            event.params["replay_target"] = _replay_target
+            event.params["replay_time_scale"] = int(
+                float(event.params["replay-speed"]) * 100)
+            _fio_conf = str(self.REPLAY_FIO_CONF)
 
         # Add action_parms to adapters
         self.set_action_params(event)
         # Individual test execution runtime
         # This allows us to report metrics periodically to prometheus
-        test_runtime = 30
+        test_runtime = self.FIO_ITERATION
         # Total test duration time (from action params)
         runtime = max(test_runtime, int(event.params.get('runtime')))
         # Render fio config file
-        self.configs_for_rendering.append(_fio_conf)
+        self.add_config_for_rendering(_fio_conf)
         self.render_config(event)
 
         _bench = bench_tools.BenchTools(self)
 
         # Prometheus target for scraping of collected FIO metrics
-        start_http_server(8088)
+        if not self.start_metrics_server(event):
+            return
+
+        def _run(fio_conf):
+            if _trace:
+                logging.info(
+                    "Replaying fio trace {} against {}"
+                    .format(_trace, _replay_target))
+                # The trace defines the duration of the run
+                _result = json.loads(_bench.fio(fio_conf))
+                self.add_fio_metrics(_result)
+            else:
+                logging.info(
+                    "Running fio {}".format(event.params["operation"]))
+                _steady = None
+                if event.params.get("steady-state"):
+                    _steady = bench_stats.SteadyStateDetector(
+                        window=event.params["steady-state-window"],
+                        tolerance=event.params["steady-state-tolerance"])
+                test_end = (
+                    datetime.datetime.now() +
+                    datetime.timedelta(seconds=runtime)
+                )
+                while (datetime.datetime.now() < test_end):
+                    _result = json.loads(_bench.fio(fio_conf))
+                    self.add_fio_metrics(_result)
+                    if (_steady and
+                            _steady.add(bench_stats.fio_totals(_result))):
+                        logging.info(
+                            "fio steady state reached after {} warm-up "
+                            "iterations".format(_steady.warmup))
+                        break
+                if _steady:
+                    _summary = _steady.summary()
+                    self.add_benchmark_metric(
+                        'fio_steady_state',
+                        'FIO steady state reached',
+                        int(_summary["steady"]))
+                    # Only report the statistics of the steady window
+                    return (
+                        json.dumps({"steady-state": _summary}),
+                        {key: value["mean"] for key, value
+                         in _summary["metrics"].items()})
+            if len(event.params.get("rbd_images", [])) > 1:
+                return _result, self.fio_image_totals(_result)
+            return _result, bench_stats.fio_totals(_result)
+
+        def _trial():
+            if _rbd_path != "compare":
+                return _run(_fio_conf)
+            logging.info("Running fio through librbd")
+            _librbd, _librbd_sample = _run(str(self.RBD_FIO_CONF))
+            logging.info("Running fio through krbd")
+            _krbd, _krbd_sample = _run(str(self.DISK_FIO_CONF))
+            return (
+                {"librbd": _librbd, "krbd": _krbd},
+                bench_stats.flatten({
+                    "librbd": _librbd_sample,
+                    "krbd": _krbd_sample,
+                    "delta-percent": bench_stats.delta_percent(
+                        _librbd_sample, _krbd_sample)}))
+
+        _measured_trial = _trial
+        if event.params.get("pool-usage") and not _disk_devices:
+            # The image data lands in the erasure coded pool when set
+            _measured_trial = self.with_pool_usage(
+                lambda: (event.params.get("ec-pool-name") or
+                         self.get_pool_name(event)),
+                _trial)
+
+        def _pool_trial():
+            # The same workload on the replicated pool, then with the image
+            # data on each erasure coded pool
+            _results = {}
+            _samples = {}
+            for label, data_pool in _pools:
+                logging.info("Running fio on the {} pool".format(label))
+                event.params["ec-pool-name"] = data_pool
+                self.prepare_rbd_images(event, _images)
+                _results[label], _samples[label] = _measured_trial()
+            return (
+                _results,
+                bench_stats.flatten(dict(_samples, **{
+                    "delta-percent": {
+                        label: bench_stats.delta_percent(
+                            _samples["replicated"], sample)
+                        for label, sample in _samples.items()
+                        if label != "replicated"}})))
 
-        logging.info(
-            "Running fio {}".format(event.params["operation"]))
         try:
-            test_end = (
-                datetime.datetime.now() +
-                datetime.timedelta(seconds=runtime)
-            )
-            while (datetime.datetime.now() < test_end):
-                _result = json.loads(_bench.fio(_fio_conf))
-                for job in _result["jobs"]:
-                    for metric in ('read', 'write'):
-                        bandwidth = job[metric]["bw"]
-                        iops = job[metric]["iops"]
-                        # lat_ns is broadly slat + clat so
-                        # represents what the calling application
-                        # would actually see in terms of latency
-                        latency = job[metric]["lat_ns"]["mean"]
-                        if all((bandwidth, iops, latency)):
-                            self.add_benchmark_metric(
-                                'fio_{}_bandwidth'.format(metric),
-                                'FIO {} bandwidth (B/s)'.format(metric),
-                                bandwidth
-                            )
-                            self.add_benchmark_metric(
-                                'fio_{}_iops'.format(metric),
-                                'FIO {} IOPS'.format(metric),
-                                iops
-                            )
-                            self.add_benchmark_metric(
-                                'fio_{}_latency'.format(metric),
-                                'FIO {} latency (ns)'.format(metric),
-                                latency
-                            )
-                        # But add some more detailed latency reporting anyway
-                        _keys = ('min', 'max', 'mean', 'stddev')
-                        for _key in _keys:
-                            self.add_benchmark_metric(
-                                'fio_{}_{}_{}'.format(metric,
-                                                      'clat',
-                                                      _key),
-                                'FIO {} {} {} (ns)'.format(metric,
-                                                           'clat',
-                                                           _key),
-                                job[metric]["clat_ns"][_key]
-                            )
-                        percentiles = job[metric]["clat_ns"]["percentile"]
-                        for percentile, latency in percentiles.items():
-                            self.add_benchmark_metric(
-                                'fio_{}_{}_{}'.format(
-                                    metric,
-                                    'clat',
-                                    percentile.replace('.', '_')),
-                                'FIO {} {} {} (ns)'.format(metric,
-                                                           'clat',
-                                                           percentile),
-                                latency
-                            )
-            event.set_results({self.action_output_key: _result})
+            event.set_results(self.run_trials(
+                event, _pool_trial if _pools else _measured_trial))
         except subprocess.CalledProcessError as e:
             _msg = ("fio failed: {}"
                     .format(e.stderr.decode("UTF-8")))
@@ -998,6 +3046,525 @@ class WoodpeckerCharmBase(ops_openstack.core.OSBaseCharm):
                 "stderr": _msg,
                 "code": "1"})
 
+    def on_distributed_fio_action(self, event):
+        """Event handler on distributed fio action.
+
+        Run one fio job file on the fio server of every unit at the same
+        time, each unit against its own rbd image. fio runs here as the
+        client of the servers and sums their results.
+
+        :param event: Event
+        :type event: Operator framework event object
+        :returns: This method is called for its side effect of setting event
+                  results.
+        :rtype: None
+        """
+        _msg = None
+        _port = self.model.config["fio-server-port"]
+        if not self.unit.is_leader():
+            _msg = "distributed-fio must run on the leader unit"
+        elif not _port:
+            _msg = "distributed-fio requires the fio-server-port option"
+        elif not self.ceph_client.pools_available:
+            _msg = "distributed-fio requires the ceph-client relation"
+        elif not self.peers.is_joined:
+            _msg = "distributed-fio requires the peers relation"
+        if _msg:
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+            return
+
+        # This unit takes part in the run too
+        self.ensure_fio_server(event)
+        _hosts = self.peers.peer_addresses
+        _waiting = set(_hosts)
+        _deadline = time.monotonic() + event.params["wait-timeout"]
+        while True:
+            for host in sorted(_waiting):
+                try:
+                    socket.create_connection((host, _port), timeout=1).close()
+                    _waiting.discard(host)
+                except OSError:
+                    pass
+            if not _waiting or time.monotonic() >= _deadline:
+                break
+            time.sleep(1)
+        if _waiting:
+            _msg = "fio server not reachable on port {} of {}".format(
+                _port, ", ".join(sorted(_waiting)))
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+            return
+
+        # The servers read the name of their image from their environment,
+        # see start_fio_server. The images are not mapped here.
+        try:
+            self.prepare_rbd_images(
+                event,
+                [self.unit_rbd_image(unit)
+                 for unit in self.peers.ready_peer_details],
+                map_images=False)
+        except subprocess.CalledProcessError:
+            return
+
+        event.params["client"] = self.CLIENT_NAME
+        # Add action_parms to adapters
+        self.set_action_params(event)
+        _fio_conf = str(self.DISTRIBUTED_FIO_CONF)
+        self.add_config_for_rendering(_fio_conf)
+        self.render_config(event)
+        self.write_if_changed(
+            str(self.FIO_CLIENTS),
+            "".join(
+                "{}{},{}\n".format("ip6:" if ":" in host else "", host, _port)
+                for host in _hosts).encode("UTF-8"))
+
+        _bench = bench_tools.BenchTools(self)
+
+        # Prometheus target for scraping of collected FIO metrics
+        if not self.start_metrics_server(event):
+            return
+
+        def _trial():
+            logging.info("Running fio on {} units".format(len(_hosts)))
+            _output = _bench.fio_clients(str(self.FIO_CLIENTS), _fio_conf)
+            _sum, _results = bench_stats.fio_client_results(_output)
+            self.add_fio_metrics(_sum)
+            return (
+                _output,
+                bench_stats.flatten({
+                    "aggregate": bench_stats.fio_totals(_sum),
+                    "hosts": {
+                        host: bench_stats.fio_totals(result)
+                        for host, result in _results.items()}}))
+
+        try:
+            event.set_results(self.run_trials(event, _trial))
+        except subprocess.CalledProcessError as e:
+            _msg = ("distributed fio failed: {}"
+                    .format(e.stderr.decode("UTF-8")))
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+        except ValueError as e:
+            _msg = "Unexpected fio client output: {}".format(e)
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+
+    def recovery_throttles(self):
+        """Recovery and backfill throttles of the OSDs.
+
+        :returns: Option name to value, options unknown to the cluster
+                  release are left out
+        :rtype: Dict[str, str]
+        """
+        import degraded_bench
+        _bench = bench_tools.BenchTools(self)
+        _throttles = {}
+        for option in degraded_bench.RECOVERY_OPTIONS:
+            try:
+                _throttles[option] = _bench.ceph_config_get("osd", option)
+            except subprocess.CalledProcessError as e:
+                logging.debug("Cannot get {}: {}".format(
+                    option, e.stderr.decode("UTF-8")))
+        return _throttles
+
+    def on_degraded_bench_action(self, event):
+        """Event handler on degraded bench action.
+
+        Run fio probes while the cluster recovers, from OSDs marked out by
+        the action or from a recovery already in progress, and report the
+        client performance and the recovery rate as paired time series. The
+        OSDs are marked back in when the run ends.
+
+        :param event: Event
+        :type event: Operator framework event object
+        :returns: This method is called for its side effect of setting event
+                  results.
+        :rtype: None
+        """
+        import degraded_bench
+        _msg = None
+        try:
+            _osds = degraded_bench.parse_osds(event.params.get("osds"))
+        except ValueError as e:
+            _osds = []
+            _msg = str(e)
+        if not self.ceph_client.pools_available:
+            _msg = "degraded-bench requires the ceph-client relation"
+        elif _osds and not event.params["i-really-mean-it"]:
+            _msg = ("Marking OSDs out degrades the cluster and moves data, "
+                    "set i-really-mean-it to confirm")
+        elif not _osds and (event.params["trials"] > 1 or
+                            event.params.get("ceph-config-matrix")):
+            _msg = ("A recovery already in progress can only be measured "
+                    "once, set osds to run more than one trial")
+        if _msg:
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+            return
+
+        _bench = bench_tools.BenchTools(self)
+        try:
+            if _osds and degraded_bench.in_recovery(
+                    degraded_bench.recovery_sample(_bench.ceph_status())):
+                _msg = ("A recovery is already in progress, run without "
+                        "osds to measure it")
+        except subprocess.CalledProcessError as e:
+            _msg = "ceph status failed: {}".format(e.stderr.decode("UTF-8"))
+        if _msg:
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+            return
+
+        try:
+            self.prepare_rbd_images(event, [self.RBD_IMAGE], map_images=False)
+        except subprocess.CalledProcessError:
+            return
+        # Add context for the render of rbd.fio
+        event.params["client"] = self.CLIENT_NAME
+        event.params["rbd_images"] = [self.RBD_IMAGE]
+        # Add action_parms to adapters
+        self.set_action_params(event)
+        _fio_conf = str(self.RBD_FIO_CONF)
+        self.add_config_for_rendering(_fio_conf)
+        self.render_config(event)
+
+        # Prometheus target for scraping of collected metrics
+        if not self.start_metrics_server(event):
+            return
+
+        def _probe():
+            _result = json.loads(_bench.fio(_fio_conf))
+            self.add_fio_metrics(_result)
+            return bench_stats.fio_totals(_result)
+
+        def _trial():
+            # Marking the OSDs back in moves data back, a new trial waits
+            # for the cluster to settle
+            if _osds and not degraded_bench.wait_for_clean(
+                    _bench.ceph_status, event.params["max-duration"],
+                    event.params["sample-interval"]):
+                raise degraded_bench.NotCleanError(
+                    "The cluster did not recover within {}s".format(
+                        event.params["max-duration"]))
+            _healthy = []
+            if _osds:
+                logging.info("Probing the healthy cluster")
+            _deadline = time.monotonic() + event.params["baseline-seconds"]
+            while _osds and time.monotonic() < _deadline:
+                _healthy.append(_probe())
+            _throttles = self.recovery_throttles()
+            _monitor = degraded_bench.RecoveryMonitor(
+                _bench.ceph_status, event.params["sample-interval"])
+            _keys = []
+            _series = []
+            _recovered = None
+            _monitor.start()
+            try:
+                if _osds:
+                    # The cleanup action marks them in if this run is killed
+                    _keys = [self.cleanup.register("osd", None, str(osd))
+                             for osd in _osds]
+                    logging.info("Marking OSDs {} out".format(
+                        " ".join(str(osd) for osd in _osds)))
+                    _bench.ceph_osd_out(_osds)
+                _start = time.time()
+                if not _monitor.wait_for_recovery(
+                        event.params["wait-timeout"]):
+                    raise degraded_bench.NoRecoveryError(
+                        "No recovery in progress within {}s".format(
+                            event.params["wait-timeout"]))
+                _deadline = time.monotonic() + event.params["max-duration"]
+                while time.monotonic() < _deadline:
+                    _probe_start = time.time()
+                    _client = _probe()
+                    _recovery = _monitor.window(_probe_start, time.time())
+                    for field, value in _recovery.items():
+                        self.add_benchmark_metric(
+                            "ceph_{}".format(field),
+                            "Ceph {}".format(field.replace("_", " ")),
+                            value)
+                    _series.append({
+                        "seconds": _probe_start - _start,
+                        "client": _client,
+                        "recovery": _recovery})
+                    if not degraded_bench.in_recovery(_monitor.latest):
+                        _recovered = time.time() - _start
+                        logging.info("Recovery completed in {:.0f}s".format(
+                            _recovered))
+                        break
+            finally:
+                _monitor.stop()
+                if _keys:
+                    logging.info("Marking OSDs back in")
+                    self.start_cleanup(wait=True, keys=_keys)
+                    _items = self.cleanup.items()
+                    _out = [_items[key]["name"] for key in _keys
+                            if _items[key]["state"] != "done"]
+                    if _out:
+                        logging.error(
+                            "OSDs {} are still out, run the cleanup action "
+                            "to mark them in".format(" ".join(_out)))
+                        event.set_results({"osds-still-out": " ".join(_out)})
+            _summary = degraded_bench.summarize(
+                _series, _healthy, _recovered)
+            return (
+                {"throttles": _throttles,
+                 "healthy": _healthy,
+                 "series": _series,
+                 "summary": _summary},
+                bench_stats.flatten(_summary))
+
+        try:
+            event.set_results(self.run_trials(event, _trial))
+        except subprocess.CalledProcessError as e:
+            _msg = ("degraded bench failed: {}"
+                    .format(e.stderr.decode("UTF-8")))
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+        except (degraded_bench.NoRecoveryError,
+                degraded_bench.NotCleanError) as e:
+            _msg = str(e)
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+
+    def on_fill_bench_action(self, event):
+        """Event handler on fill bench action.
+
+        Fill the pool in stages up to a fill level of the pool or of the
+        cluster, and run a short fio probe at each stage. The progress is
+        saved after every stage and batch of writes, a new run with the same
+        parameters resumes an interrupted one. The data written is removed
+        in the background once the run completes.
+
+        :param event: Event
+        :type event: Operator framework event object
+        :returns: This method is called for its side effect of setting event
+                  results.
+        :rtype: None
+        """
+        import fill_bench
+        import mixed_bench
+        _msg = None
+        _target = event.params["target-fill"]
+        if not self.ceph_client.pools_available:
+            _msg = "fill-bench requires the ceph-client relation"
+        elif mixed_bench.rados is None:
+            _msg = "fill-bench requires python3-rados"
+        elif event.params["fill-of"] not in fill_bench.FILL_OF:
+            _msg = "fill-of must be one of {}".format(
+                ", ".join(fill_bench.FILL_OF))
+        elif not 0 < _target <= 0.85:
+            # Above the default nearfull ratio
+            _msg = "target-fill must be greater than 0 and at most 0.85"
+        elif event.params["stages"] < 1:
+            _msg = "stages must be at least 1"
+        if _msg:
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+            return
+
+        _pool_name = self.get_pool_name(event)
+        _params = {
+            "pool-name": _pool_name,
+            "fill-of": event.params["fill-of"],
+            "target-fill": _target,
+            "stages": event.params["stages"],
+            "object-size": event.params["object-size"]}
+        _store = fill_bench.FillState(str(self.FILL_STATE))
+        _state = _store.load()
+        if _state and not event.params["resume"]:
+            logging.info("Removing the data of the previous fill run")
+            self.start_cleanup(wait=True, keys=[_state["cleanup-key"]])
+            _store.remove()
+            _state = None
+        elif _state and self.cleanup.items().get(
+                _state["cleanup-key"], {}).get("state") != "pending":
+            # The cleanup action removed the data of the previous run
+            _store.remove()
+            _state = None
+        if _state and _state["params"] != _params:
+            _msg = ("A fill run with other parameters was interrupted, "
+                    "run with resume=false to discard it: {}".format(
+                        json.dumps(_state["params"])))
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+            return
+
+        def _new_state():
+            _prefix = "woodpecker_fill_{}_{}_".format(
+                self.RBD_IMAGE, time.time_ns())
+            _new = {
+                "params": _params,
+                "prefix": _prefix,
+                "next-index": 0,
+                "stages": [],
+                "cleanup-key": self.cleanup.register(
+                    "rados", _pool_name, _prefix)}
+            _store.save(_new)
+            return _new
+
+        if _state:
+            logging.info("Resuming the fill run after {} stages".format(
+                len(_state["stages"])))
+        else:
+            _state = _new_state()
+
+        try:
+            self.prepare_rbd_images(event, [self.RBD_IMAGE], map_images=False)
+        except subprocess.CalledProcessError:
+            return
+        # Add context for the render of rbd.fio
+        event.params["client"] = self.CLIENT_NAME
+        event.params["rbd_images"] = [self.RBD_IMAGE]
+        # Add action_parms to adapters
+        self.set_action_params(event)
+        _fio_conf = str(self.RBD_FIO_CONF)
+        self.add_config_for_rendering(_fio_conf)
+        self.render_config(event)
+
+        _bench = bench_tools.BenchTools(self)
+
+        # Prometheus target for scraping of collected metrics
+        if not self.start_metrics_server(event):
+            return
+
+        def _fill(writer, target):
+            _df = _bench.ceph_df()
+            # The estimate of the data to write is refined after each round
+            for _ in range(fill_bench.FILL_ROUNDS):
+                _bytes = fill_bench.bytes_to_fill(
+                    _df, _pool_name, _params["fill-of"], target)
+                if not _bytes or fill_bench.fill_level(
+                        _df, _pool_name, _params["fill-of"]) >= target:
+                    break
+                _end = _state["next-index"] + -(-_bytes // writer.size)
+                logging.info("Writing {} bytes to reach {:.1%} fill".format(
+                    _bytes, target))
+                while _state["next-index"] < _end:
+                    _start = _state["next-index"]
+                    _stop = min(_end, _start + fill_bench.CHUNK_OBJECTS)
+                    writer.write(_start, _stop)
+                    _state["next-index"] = _stop
+                    _store.save(_state)
+                # The OSDs report their usage to the mgr periodically
+                time.sleep(self.POOL_USAGE_SETTLE)
+                _df = _bench.ceph_df()
+            return fill_bench.fill_level(_df, _pool_name, _params["fill-of"])
+
+        # Trials run in this action, every trial after the first fills the
+        # pool again from empty
+        _trials = [0]
+
+        def _trial():
+            nonlocal _state
+            if _trials[0]:
+                logging.info("Removing the data of the previous trial")
+                self.start_cleanup(wait=True, keys=[_state["cleanup-key"]])
+                if self.cleanup.items()[_state["cleanup-key"]][
+                        "state"] != "done":
+                    raise mixed_bench.StreamError(
+                        "the data of the previous trial was not removed, "
+                        "run the cleanup action")
+                _state = _new_state()
+            _trials[0] += 1
+            _stream = mixed_bench.RadosStream(
+                self.ceph_conf, self.CEPH_CLIENT_NAME, _pool_name,
+                _state["prefix"], objects=0)
+            _stream.setup()
+            try:
+                _writer = fill_bench.FillWriter(
+                    _stream.ioctx, _state["prefix"],
+                    size=_params["object-size"],
+                    concurrency=event.params["concurrency"])
+                for index, target in enumerate(fill_bench.stage_targets(
+                        _target, _params["stages"])):
+                    if index < len(_state["stages"]):
+                        # Completed before the run was interrupted
+                        continue
+                    _writer.reset()
+                    _level = _fill(_writer, target)
+                    self.add_benchmark_metric(
+                        "fill_level",
+                        "Fill level of the {}".format(_params["fill-of"]),
+                        _level)
+                    logging.info("Probing at {:.1%} fill".format(_level))
+                    _result = json.loads(_bench.fio(_fio_conf))
+                    self.add_fio_metrics(_result)
+                    _state["stages"].append({
+                        "target": target,
+                        "fill": _level,
+                        "write": _writer.summary(),
+                        "probe": bench_stats.fio_totals(_result)})
+                    _store.save(_state)
+            finally:
+                _stream.close()
+            _stages = _state["stages"]
+            _summary = {
+                "stages": {
+                    str(index + 1): stage
+                    for index, stage in enumerate(_stages)}}
+            _degradation = fill_bench.degradation_fill(
+                _stages, event.params["degradation-threshold"])
+            if _degradation is not None:
+                _summary["degradation-fill"] = _degradation
+            return (
+                {"params": _params, "stages": _stages},
+                bench_stats.flatten(_summary))
+
+        try:
+            event.set_results(self.run_trials(event, _trial))
+        except subprocess.CalledProcessError as e:
+            _msg = ("fill bench failed, run it again to resume: {}"
+                    .format(e.stderr.decode("UTF-8")))
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+            return
+        except (mixed_bench.StreamError, mixed_bench.rados.Error) as e:
+            _msg = "fill bench failed, run it again to resume: {}".format(e)
+            logging.error(_msg)
+            event.fail(_msg)
+            event.set_results({
+                "stderr": _msg,
+                "code": "1"})
+            return
+        _store.remove()
+        if not event.params["keep-data"]:
+            self.start_cleanup(keys=[_state["cleanup-key"]])
+
     def _defer_once(self, event):
         """Defer the given event, but only once."""
         notice_count = 0
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""Background removal of the data left behind by benchmarks.
+
+Benchmarks register what they create in a registry shared with a detached
+worker process, started by the cleanup action, which removes it with high
+concurrency and records its progress in the registry.
+
+    python3 cleanup.py /var/lib/woodpecker/cleanup.json -n client.woodpecker
+"""
+
+import argparse
+import concurrent.futures
+import contextlib
+import datetime
+import errno
+import fcntl
+import json
+import logging
+import os
+import subprocess
+import threading
+import time
+
+try:
+    # Provided by python3-rados, not installable from PyPI
+    import rados
+except ImportError:
+    rados = None
+
+logger = logging.getLogger()
+
+# rados objects matching a prefix, rbd images in the trash by ID, rgw buckets,
+# OSDs marked out by degraded-bench, which are marked back in
+KINDS = ("rados", "rbd", "bucket", "osd")
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class CleanupRegistry():
+    """Benchmark data awaiting removal.
+
+    The registry is a JSON file locked for every access, as the charm
+    registers data while the worker removes it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    @contextlib.contextmanager
+    def _locked(self, write=True):
+        os.makedirs(os.path.dirname(self.path), mode=0o750, exist_ok=True)
+        with open(self.path + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(self.path) as fh:
+                    _data = json.load(fh)
+            except FileNotFoundError:
+                _data = {"workers": [], "items": {}}
+            yield _data
+            if write:
+                with open(self.path + ".tmp", "w") as fh:
+                    json.dump(_data, fh)
+                os.replace(self.path + ".tmp", self.path)
+
+    def register(self, kind, pool, name, **extra):
+        """Register data to remove.
+
+        Data already awaiting removal is registered once. Data registered
+        while a worker removes data of the same name gets a new item.
+
+        :param kind: One of KINDS
+        :type kind: str
+        :param pool: Pool holding the data, None for buckets and OSDs
+        :type pool: Union[str, None]
+        :param name: Object prefix, trashed image ID, bucket name or OSD ID
+        :type name: str
+        :param extra: Additional details, e.g. objects to remove with a prefix
+        :type extra: dict
+        :returns: Item key
+        :rtype: str
+        """
+        if kind not in KINDS:
+            raise ValueError("Unknown cleanup kind {}".format(kind))
+        _base = "{}:{}:{}".format(kind, pool or "", name)
+        _key = _base
+        with self._locked() as data:
+            _index = 1
+            # Data created again while a worker removes the previous data of
+            # the same name gets its own entry
+            while data["items"].get(_key, {}).get("state") == RUNNING:
+                _index += 1
+                _key = "{}#{}".format(_base, _index)
+            if data["items"].get(_key, {}).get("state") == PENDING:
+                return _key
+            data["items"][_key] = dict(
+                extra,
+                kind=kind,
+                pool=pool,
+                name=name,
+                state=PENDING,
+                removed=0,
+                registered=datetime.datetime.utcnow().isoformat())
+        logger.info("Registered {} for cleanup".format(_key))
+        return _key
+
+    def items(self):
+        """Registered items by key.
+
+        :rtype: Dict[str, dict]
+        """
+        with self._locked(write=False) as data:
+            return data["items"]
+
+    def update(self, key, **fields):
+        with self._locked() as data:
+            data["items"][key].update(fields)
+
+    def retry_failed(self):
+        """Mark the items which failed to be removed as pending again."""
+        with self._locked() as data:
+            for item in data["items"].values():
+                if item["state"] == FAILED:
+                    item["state"] = PENDING
+
+    def forget_done(self):
+        """Drop the items removed successfully.
+
+        :returns: Number of items dropped
+        :rtype: int
+        """
+        with self._locked() as data:
+            _done = [k for k, v in data["items"].items()
+                     if v["state"] == DONE]
+            for key in _done:
+                del data["items"][key]
+        return len(_done)
+
+    def claim(self, keys=None):
+        """Claim pending items for removal.
+
+        Several workers may run at once, each item is only claimed once.
+
+        :param keys: Only claim these items, all pending items if None
+        :type keys: Union[List[str], None]
+        :returns: Claimed items by key
+        :rtype: Dict[str, dict]
+        """
+        with self._locked() as data:
+            _claimed = {
+                k: v for k, v in data["items"].items()
+                if v["state"] == PENDING and (keys is None or k in keys)}
+            for item in _claimed.values():
+                item["state"] = RUNNING
+        return _claimed
+
+    @staticmethod
+    def _alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def add_worker(self, pid):
+        with self._locked() as data:
+            data["workers"] = [
+                w for w in data["workers"] if self._alive(w["pid"])]
+            data["workers"].append({
+                "pid": pid,
+                "started": datetime.datetime.utcnow().isoformat()})
+
+    @property
+    def workers_running(self):
+        """Number of workers removing data."""
+        with self._locked(write=False) as data:
+            return len([w for w in data["workers"] if self._alive(w["pid"])])
+
+    def progress(self):
+        """Summary of the registry.
+
+        :returns: Worker state, item count per state and the items
+        :rtype: dict
+        """
+        _items = self.items()
+        _states = {}
+        for item in _items.values():
+            _states[item["state"]] = _states.get(item["state"], 0) + 1
+        return {
+            "workers": self.workers_running,
+            "states": _states,
+            "removed-objects": sum(i["removed"] for i in _items.values()),
+            "items": _items}
+
+
+class CleanupWorker():
+    """Remove the pending items of a registry concurrently."""
+
+    # Persist the object count of a prefix at most this often (s)
+    PROGRESS_INTERVAL = 2
+
+    def __init__(self, registry, client_name, conffile="/etc/ceph/ceph.conf",
+                 concurrency=64):
+        self.registry = registry
+        self.client_name = client_name
+        self.conffile = conffile
+        self.concurrency = concurrency
+        self._cluster = None
+
+    def _check_output(self, cmd):
+        return subprocess.check_output(
+            cmd, stderr=subprocess.PIPE).decode("UTF-8")
+
+    def _remove_rados(self, key, item):
+        if rados is None:
+            # rados cleanup removes the objects concurrently as well, but
+            # without progress
+            self._check_output([
+                "rados", "-n", self.client_name, "-p", item["pool"],
+                "cleanup", "-t", str(self.concurrency),
+                "--prefix", item["name"]])
+        else:
+            self._remove_rados_aio(key, item)
+        if item.get("objects"):
+            self._check_output(
+                ["rados", "-n", self.client_name, "-p", item["pool"], "rm"] +
+                list(item["objects"]))
+
+    def _remove_rados_aio(self, key, item):
+        _slots = threading.Semaphore(self.concurrency)
+        _lock = threading.Lock()
+        _removed = [0]
+        _saved = time.monotonic()
+
+        def _done(completion):
+            with _lock:
+                _removed[0] += 1
+            _slots.release()
+
+        with self._cluster.open_ioctx(item["pool"]) as ioctx:
+            for obj in ioctx.list_objects():
+                if not obj.key.startswith(item["name"]):
+                    continue
+                _slots.acquire()
+                ioctx.aio_remove(obj.key, oncomplete=_done)
+                if time.monotonic() - _saved > self.PROGRESS_INTERVAL:
+                    self.registry.update(key, removed=_removed[0])
+                    _saved = time.monotonic()
+            for _ in range(self.concurrency):
+                _slots.acquire()
+        self.registry.update(key, removed=_removed[0])
+
+    def _remove_rbd(self, key, item):
+        # Only images already moved to the trash are registered, by ID, as
+        # their name may refer to a new image by now
+        try:
+            self._check_output([
+                "rbd", "trash", "rm", "-p", item["pool"],
+                "-n", self.client_name,
+                "--rbd-concurrent-management-ops", str(self.concurrency),
+                item["name"]])
+        except subprocess.CalledProcessError as e:
+            if e.returncode != errno.ENOENT:
+                raise
+        else:
+            self.registry.update(key, removed=1)
+
+    def _remove_bucket(self, key, item):
+        try:
+            self._check_output([
+                "radosgw-admin", "bucket", "rm", "--bucket", item["name"],
+                "--purge-objects", "--bypass-gc", "-n", self.client_name])
+        except subprocess.CalledProcessError as e:
+            # Nothing to do for a bucket which was never created
+            if b"No such file or directory" not in e.stderr:
+                raise
+
+    def _remove_osd(self, key, item):
+        self._check_output([
+            "ceph", "osd", "in", item["name"], "-n", self.client_name])
+
+    def _remove(self, key, item):
+        logger.info("Removing {}".format(key))
+        try:
+            getattr(self, "_remove_{}".format(item["kind"]))(key, item)
+        except Exception as e:
+            _error = getattr(e, "stderr", None) or str(e)
+            if isinstance(_error, bytes):
+                _error = _error.decode("UTF-8", errors="replace")
+            logger.error("Removing {} failed: {}".format(key, _error))
+            self.registry.update(key, state=FAILED, error=_error[-1024:])
+        else:
+            self.registry.update(key, state=DONE)
+
+    def run(self, keys=None):
+        """Remove the pending items.
+
+        :param keys: Only remove these items, all pending items if None
+        :type keys: Union[List[str], None]
+        :returns: Number of items processed
+        :rtype: int
+        """
+        _items = self.registry.claim(keys)
+        if not _items:
+            return 0
+        if rados is not None and any(
+                i["kind"] == "rados" for i in _items.values()):
+            self._cluster = rados.Rados(
+                conffile=self.conffile, name=self.client_name)
+            self._cluster.connect()
+        try:
+            with concurrent.futures.ThreadPoolExecutor(
+                    max_workers=min(16, len(_items))) as executor:
+                for key, item in _items.items():
+                    executor.submit(self._remove, key, item)
+        finally:
+            if self._cluster:
+                self._cluster.shutdown()
+        return len(_items)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("registry")
+    parser.add_argument("-n", "--client-name", required=True)
+    parser.add_argument("-c", "--conf", default="/etc/ceph/ceph.conf")
+    parser.add_argument("-t", "--concurrency", type=int, default=64)
+    parser.add_argument("-k", "--key", action="append", dest="keys",
+                        help="Only remove this item, may be repeated")
+    args = parser.parse_args()
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    _registry = CleanupRegistry(args.registry)
+    _registry.add_worker(os.getpid())
+    _worker = CleanupWorker(
+        _registry, args.client_name, args.conf, args.concurrency)
+    # Pick up data registered while removing
+    while _worker.run(args.keys):
+        pass
+
+
+if __name__ == "__main__":
+    main()
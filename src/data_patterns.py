@@ -0,0 +1,126 @@
+import collections
+import os
+import random
+import threading
+
+PATTERNS = ("random", "zero", "sample")
+# Granularity of compressible and incompressible data within a buffer,
+# below the smallest BlueStore compression blob
+CHUNK_SIZE = 4096
+# Buffers a duplicate may be a copy of
+DEDUPE_HISTORY = 16
+
+
+class BufferGenerator():
+    """Write buffers with a given content.
+
+    "random" buffers are incompressible except for compress_percentage of
+    each chunk, which is zero filled, and dedupe_percentage of the buffers
+    repeat a recent buffer, as fio's buffer_compress_percentage and
+    dedupe_percentage do. "zero" buffers are zero filled and "sample"
+    buffers are consecutive slices of a sample file, wrapping around.
+    Workers of a stream may share a generator.
+    """
+
+    def __init__(self, size, pattern="random", compress_percentage=0,
+                 dedupe_percentage=0, sample_file=None, max_sample=1 << 26):
+        if pattern not in PATTERNS:
+            raise ValueError("Unknown data pattern {}".format(pattern))
+        self.size = size
+        self.pattern = pattern
+        self.compress_percentage = min(100, max(0, compress_percentage))
+        self.dedupe_percentage = min(100, max(0, dedupe_percentage))
+        self._recent = collections.deque(maxlen=DEDUPE_HISTORY)
+        self._offset = 0
+        self._lock = threading.Lock()
+        self._sample = None
+        if pattern == "sample":
+            with open(sample_file, "rb") as fh:
+                self._sample = fh.read(max_sample)
+            if not self._sample:
+                raise ValueError("Sample file {} is empty".format(
+                    sample_file))
+
+    def _random(self):
+        _random = CHUNK_SIZE * (100 - self.compress_percentage) // 100
+        _chunk = b"\0" * (CHUNK_SIZE - _random)
+        _buffer = b"".join(
+            os.urandom(_random) + _chunk
+            for _ in range(-(-self.size // CHUNK_SIZE)))
+        return _buffer[:self.size]
+
+    def _sample_slice(self):
+        _buffer = b""
+        while len(_buffer) < self.size:
+            _take = self._sample[self._offset:
+                                 self._offset + self.size - len(_buffer)]
+            _buffer += _take
+            self._offset = (self._offset + len(_take)) % len(self._sample)
+        return _buffer
+
+    def next(self):
+        """Next buffer to write.
+
+        :rtype: bytes
+        """
+        if self.pattern == "zero":
+            return b"\0" * self.size
+        if self.pattern == "sample":
+            with self._lock:
+                return self._sample_slice()
+        with self._lock:
+            if (self._recent and
+                    random.randrange(100) < self.dedupe_percentage):
+                return random.choice(self._recent)
+        _buffer = self._random()
+        with self._lock:
+            self._recent.append(_buffer)
+        return _buffer
+
+
+def pool_usage(df, pool_name):
+    """Usage statistics of a pool.
+
+    :param df: Decoded ``ceph df detail --format json`` output
+    :type df: dict
+    :param pool_name: Pool name
+    :type pool_name: str
+    :returns: Stored, used and compression counters in bytes
+    :rtype: dict
+    """
+    for pool in df.get("pools", []):
+        if pool["name"] != pool_name:
+            continue
+        _stats = pool["stats"]
+        return {
+            "stored": _stats.get("stored", _stats.get("bytes_used", 0)),
+            "used": _stats.get("bytes_used", 0),
+            "compress_under_bytes": _stats.get("compress_under_bytes", 0),
+            "compress_bytes_used": _stats.get("compress_bytes_used", 0)}
+    raise KeyError("Pool {} not found".format(pool_name))
+
+
+def compression_report(before, after, elapsed):
+    """Effective against logical throughput of a run.
+
+    :param before: Pool usage before the run
+    :type before: dict
+    :param after: Pool usage after the run
+    :type after: dict
+    :param elapsed: Duration of the run (s)
+    :type elapsed: float
+    :returns: Logical and raw bytes written, compression ratio and the
+              logical and effective throughput (B/s)
+    :rtype: dict
+    """
+    _delta = {key: after[key] - before[key] for key in after}
+    _under = _delta["compress_under_bytes"]
+    _compressed = _delta["compress_bytes_used"]
+    return {
+        "logical_bytes": _delta["stored"],
+        "raw_bytes": _delta["used"],
+        "compress_under_bytes": _under,
+        "compress_bytes_used": _compressed,
+        "compression_ratio": _under / _compressed if _compressed else 1.0,
+        "logical_bandwidth": _delta["stored"] / elapsed if elapsed else 0.0,
+        "effective_bandwidth": _delta["used"] / elapsed if elapsed else 0.0}
@@ -0,0 +1,219 @@
+import logging
+import statistics
+import subprocess
+import threading
+import time
+
+import bench_stats
+
+logger = logging.getLogger()
+
+# Recovery rates and progress sampled from the pgmap of ceph status
+RECOVERY_FIELDS = (
+    "recovering_bytes_per_sec", "recovering_objects_per_sec",
+    "degraded_ratio", "misplaced_ratio", "pgs_unclean")
+# Recovery and backfill throttles reported with the results
+RECOVERY_OPTIONS = (
+    "osd_max_backfills", "osd_recovery_max_active", "osd_recovery_sleep",
+    "osd_recovery_op_priority", "osd_mclock_profile")
+# PG states which do not hold back client I/O or data redundancy
+CLEAN_PG_STATES = {
+    "active", "clean", "scrubbing", "deep", "snaptrim", "snaptrim_wait"}
+
+
+class NoRecoveryError(Exception):
+    """Raised when no recovery is in progress to measure."""
+    pass
+
+
+class NotCleanError(Exception):
+    """Raised when the cluster did not recover from the previous trial."""
+    pass
+
+
+def parse_osds(value):
+    """Parse the OSDs to mark out.
+
+    :param value: Space delimited OSD IDs, e.g. "3 osd.7"
+    :type value: str
+    :returns: OSD IDs
+    :rtype: List[int]
+    :raises: ValueError
+    """
+    _osds = []
+    for osd in (value or "").split():
+        _id = osd[len("osd."):] if osd.startswith("osd.") else osd
+        if not _id.isdigit():
+            raise ValueError("Invalid OSD {}".format(osd))
+        _osds.append(int(_id))
+    return sorted(set(_osds))
+
+
+def recovery_sample(status):
+    """Recovery state of a ceph status.
+
+    :param status: Decoded ceph status --format json
+    :type status: dict
+    :returns: RECOVERY_FIELDS values, absent rates and ratios being 0
+    :rtype: Dict[str, float]
+    """
+    _pgmap = status.get("pgmap", {})
+    _sample = {field: float(_pgmap.get(field, 0))
+               for field in RECOVERY_FIELDS}
+    _sample["pgs_unclean"] = float(sum(
+        state["count"] for state in _pgmap.get("pgs_by_state", [])
+        if set(state["state_name"].split("+")) - CLEAN_PG_STATES))
+    return _sample
+
+
+def in_recovery(sample):
+    """Whether data is degraded, misplaced or being recovered.
+
+    :param sample: See recovery_sample
+    :type sample: dict
+    :rtype: bool
+    """
+    return any(sample[field] for field in RECOVERY_FIELDS)
+
+
+def wait_for_clean(status, timeout, interval=5):
+    """Wait for the cluster to complete its recovery.
+
+    :param status: Returns the decoded ceph status
+    :type status: Callable[[], dict]
+    :param timeout: Maximum wait (s)
+    :type timeout: float
+    :param interval: Time between two checks (s)
+    :type interval: float
+    :returns: Whether no recovery is in progress
+    :rtype: bool
+    :raises: subprocess.CalledProcessError
+    """
+    _deadline = time.monotonic() + timeout
+    while in_recovery(recovery_sample(status())):
+        if time.monotonic() >= _deadline:
+            return False
+        time.sleep(interval)
+    return True
+
+
+class RecoveryMonitor():
+    """Sample the recovery state of the cluster in the background.
+
+    status returns the decoded ceph status, sampled every interval seconds.
+    Samples are consumed window by window, so memory stays flat however
+    long the recovery takes.
+    """
+
+    def __init__(self, status, interval=5):
+        self.status = status
+        self.interval = interval
+        self.latest = None
+        self._samples = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                _sample = recovery_sample(self.status())
+            except (OSError, ValueError, subprocess.CalledProcessError) as e:
+                logger.warning("ceph status failed: {}".format(e))
+            else:
+                with self._lock:
+                    self._samples.append((time.time(), _sample))
+                    self.latest = _sample
+            self._stop.wait(self.interval)
+
+    def wait_for_recovery(self, timeout):
+        """Wait for a recovery to be in progress.
+
+        :param timeout: Maximum wait (s)
+        :type timeout: float
+        :returns: Whether a recovery is in progress
+        :rtype: bool
+        """
+        _deadline = time.monotonic() + timeout
+        while True:
+            if self.latest and in_recovery(self.latest):
+                return True
+            if time.monotonic() >= _deadline:
+                return False
+            time.sleep(min(1, self.interval))
+
+    def window(self, start, end):
+        """Mean recovery state between two times, the samples before end
+        are discarded.
+
+        :param start: Unix time
+        :type start: float
+        :param end: Unix time
+        :type end: float
+        :returns: See recovery_sample, the latest sample when the window
+                  holds none
+        :rtype: Dict[str, float]
+        """
+        with self._lock:
+            _window = [sample for timestamp, sample in self._samples
+                       if start <= timestamp <= end]
+            self._samples = [(timestamp, sample)
+                             for timestamp, sample in self._samples
+                             if timestamp > end]
+            _latest = self.latest
+        if not _window:
+            return dict(_latest or {field: 0.0 for field in RECOVERY_FIELDS})
+        return {field: statistics.mean(sample[field] for sample in _window)
+                for field in RECOVERY_FIELDS}
+
+
+def summarize(series, healthy=None, recovered=None):
+    """Client performance and recovery throughput of a degraded run.
+
+    :param series: Paired client and recovery samples, dicts with the
+                   time since the start of the recovery, client fio totals
+                   and recovery window
+    :type series: List[dict]
+    :param healthy: fio totals of the probes before the recovery
+    :type healthy: List[dict]
+    :param recovered: Time the recovery took (s), None if it did not end
+    :type recovered: Union[float, None]
+    :returns: Nested summary
+    :rtype: dict
+    """
+    _summary = {}
+    if series:
+        _summary["degraded"] = {
+            key: statistics.mean(sample["client"][key] for sample in series)
+            for key in series[0]["client"]}
+        _summary["recovery"] = {
+            "bytes_per_sec_mean": statistics.mean(
+                s["recovery"]["recovering_bytes_per_sec"] for s in series),
+            "bytes_per_sec_max": max(
+                s["recovery"]["recovering_bytes_per_sec"] for s in series),
+            "objects_per_sec_mean": statistics.mean(
+                s["recovery"]["recovering_objects_per_sec"] for s in series),
+            "degraded_ratio_max": max(
+                s["recovery"]["degraded_ratio"] for s in series),
+            "completed": int(recovered is not None)}
+        if recovered is not None:
+            _summary["recovery"]["seconds"] = recovered
+    if healthy:
+        _summary["healthy"] = {
+            key: statistics.mean(sample[key] for sample in healthy)
+            for key in healthy[0]}
+        if series:
+            _summary["delta-percent"] = bench_stats.delta_percent(
+                _summary["healthy"], _summary["degraded"])
+    return _summary
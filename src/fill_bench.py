@@ -0,0 +1,232 @@
+import concurrent.futures
+import json
+import logging
+import os
+import threading
+import time
+
+from bucket_index_bench import LatencySample
+
+logger = logging.getLogger()
+
+FILL_OF = ("pool", "cluster")
+# Objects written between two saves of the progress of a run
+CHUNK_OBJECTS = 1024
+# Rounds of writes and usage checks to reach the fill level of a stage
+FILL_ROUNDS = 5
+# Distinct random buffers the objects are written from, Ceph does not
+# deduplicate them and they do not compress
+BUFFERS = 16
+
+
+def stage_targets(target, stages):
+    """Fill levels of evenly spaced stages.
+
+    :param target: Fill level of the last stage, from 0 to 1
+    :type target: float
+    :param stages: Number of stages
+    :type stages: int
+    :rtype: List[float]
+    """
+    return [target * (stage + 1) / stages for stage in range(stages)]
+
+
+def used_raw_bytes(stats):
+    """Raw capacity used in the cluster.
+
+    :param stats: stats of ``ceph df detail --format json``
+    :type stats: dict
+    :rtype: int
+    :raises: KeyError
+    """
+    if "total_used_raw_bytes" in stats:
+        return stats["total_used_raw_bytes"]
+    # Releases before Nautilus only report the used bytes
+    return stats["total_used_bytes"]
+
+
+def fill_level(df, pool_name, fill_of="pool"):
+    """Fill level of a pool or of the cluster.
+
+    The fill level of a pool is the data it stores over the data it can
+    store, given its replication and the space left on its OSDs.
+
+    :param df: Decoded ``ceph df detail --format json`` output
+    :type df: dict
+    :param pool_name: Pool name
+    :type pool_name: str
+    :param fill_of: "pool" or "cluster"
+    :type fill_of: str
+    :returns: Fill level, from 0 to 1
+    :rtype: float
+    :raises: KeyError
+    """
+    if fill_of == "cluster":
+        _stats = df["stats"]
+        _used = used_raw_bytes(_stats)
+        return _used / _stats["total_bytes"] if _stats["total_bytes"] else 0.0
+    for pool in df.get("pools", []):
+        if pool["name"] != pool_name:
+            continue
+        _stats = pool["stats"]
+        _stored = _stats.get("stored", _stats.get("bytes_used", 0))
+        _capacity = _stored + _stats["max_avail"]
+        return _stored / _capacity if _capacity else 0.0
+    raise KeyError("Pool {} not found".format(pool_name))
+
+
+def bytes_to_fill(df, pool_name, fill_of, target):
+    """Estimate the data to write to the pool to reach a fill level.
+
+    The raw space taken by the data written to the pool is estimated from
+    its current usage, or from its maximum available space when empty.
+
+    :returns: Bytes to write, 0 when the fill level is reached
+    :rtype: int
+    :raises: KeyError
+    """
+    _pool = None
+    for pool in df.get("pools", []):
+        if pool["name"] == pool_name:
+            _pool = pool["stats"]
+    if _pool is None:
+        raise KeyError("Pool {} not found".format(pool_name))
+    _stored = _pool.get("stored", _pool.get("bytes_used", 0))
+    if fill_of == "pool":
+        _missing = target * (_stored + _pool["max_avail"]) - _stored
+        return max(0, int(_missing))
+    _stats = df["stats"]
+    _used = used_raw_bytes(_stats)
+    if _stored and _pool.get("bytes_used"):
+        _raw_per_byte = _pool["bytes_used"] / _stored
+    elif _pool["max_avail"]:
+        _raw_per_byte = _stats["total_avail_bytes"] / _pool["max_avail"]
+    else:
+        return 0
+    _missing = target * _stats["total_bytes"] - _used
+    return max(0, int(_missing / _raw_per_byte))
+
+
+def degradation_fill(stages, threshold, key="iops"):
+    """Fill level from which the probe falls behind the first stage.
+
+    :param stages: Stage results, with their fill level and probe totals
+    :type stages: List[dict]
+    :param threshold: Tolerated drop of the metric (%)
+    :type threshold: float
+    :param key: Probe metric, higher is better
+    :type key: str
+    :returns: Fill level of the first stage below the threshold, None if
+              there is none
+    :rtype: Union[float, None]
+    """
+    if not stages or not stages[0]["probe"].get(key):
+        return None
+    _reference = stages[0]["probe"][key]
+    for stage in stages[1:]:
+        if (_reference - stage["probe"][key]) * 100.0 / _reference > \
+                threshold:
+            return stage["fill"]
+    return None
+
+
+class FillState():
+    """Progress of a fill run, saved so that an interrupted run resumes
+    where it stopped.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        """Progress of the run, None when there is none.
+
+        :rtype: Union[dict, None]
+        """
+        try:
+            with open(self.path) as fh:
+                return json.load(fh)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def save(self, state):
+        os.makedirs(os.path.dirname(self.path), mode=0o750, exist_ok=True)
+        with open(self.path + ".tmp", "w") as fh:
+            json.dump(state, fh)
+        os.replace(self.path + ".tmp", self.path)
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class FillWriter():
+    """Write numbered objects through librados.
+
+    Write latencies are kept in a bounded sample, so memory stays flat
+    however many objects a stage writes.
+    """
+
+    def __init__(self, ioctx, prefix, size=4194304, concurrency=32):
+        self.ioctx = ioctx
+        self.prefix = prefix
+        self.size = size
+        self.concurrency = concurrency
+        self._buffers = [os.urandom(size) for _ in range(BUFFERS)]
+        self.reset()
+
+    def object_name(self, index):
+        return "{}{:012d}".format(self.prefix, index)
+
+    def reset(self):
+        """Start the statistics of a new stage."""
+        self._latencies = LatencySample()
+        self._elapsed = 0.0
+
+    def write(self, start, end):
+        """Write objects start to end - 1.
+
+        :param start: First object index
+        :type start: int
+        :param end: Object index to stop at
+        :type end: int
+        :raises: rados.Error
+        """
+        _lock = threading.Lock()
+        _next = [start]
+
+        def _worker():
+            while True:
+                with _lock:
+                    _index = _next[0]
+                    if _index >= end:
+                        return
+                    _next[0] += 1
+                _start = time.perf_counter_ns()
+                self.ioctx.write_full(
+                    self.object_name(_index),
+                    self._buffers[_index % len(self._buffers)])
+                self._latencies.add(time.perf_counter_ns() - _start)
+
+        _start = time.monotonic()
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.concurrency) as executor:
+            _futures = [executor.submit(_worker)
+                        for _ in range(self.concurrency)]
+        self._elapsed += time.monotonic() - _start
+        for future in _futures:
+            future.result()
+
+    def summary(self):
+        """Writes of the stage.
+
+        :returns: ops/s, bandwidth (B/s) and latency
+        :rtype: dict
+        """
+        _summary = self._latencies.summary(self._elapsed)
+        _summary["bandwidth"] = (
+            self._latencies.count * self.size / self._elapsed
+            if self._elapsed else 0.0)
+        return _summary
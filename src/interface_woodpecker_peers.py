@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 
+import json
 import logging
 
 from ops.framework import (
@@ -30,6 +31,7 @@ class WoodpeckerPeers(Object):
     state = StoredState()
     SWIFT_KEY = "swift_key"
     SWIFT_USER_CREATED = "swift_user_created"
+    S3_CREDENTIALS = "s3_credentials"
 
     def __init__(self, charm, relation_name):
         super().__init__(charm, relation_name)
@@ -53,6 +55,27 @@ class WoodpeckerPeers(Object):
         logging.info("Setting swift user created")
         self.peers_rel.data[self.peers_rel.app][self.SWIFT_USER_CREATED] = user
 
+    def set_s3_credentials(self, credentials):
+        logging.info("Setting S3 credentials")
+        self.peers_rel.data[self.peers_rel.app][self.S3_CREDENTIALS] = (
+            json.dumps(credentials, sort_keys=True))
+
+    def set_unit_addresses(self, addresses):
+        logging.info("Publishing unit addresses")
+        self.peers_rel.data[self.this_unit].update({
+            "{}-address".format(binding): str(address)
+            for binding, address in addresses.items()})
+
+    def unit_addresses(self, binding):
+        """Address of each peer unit on a binding they published."""
+        addresses = {}
+        for u in self.peers_rel.units:
+            address = self.peers_rel.data[u].get(
+                "{}-address".format(binding))
+            if address:
+                addresses[u.name] = address
+        return addresses
+
     @property
     def ready_peer_details(self):
         peers = {
@@ -92,6 +115,13 @@ class WoodpeckerPeers(Object):
         return self.peers_rel.data[
             self.peers_rel.app].get(self.SWIFT_USER_CREATED)
 
+    @property
+    def s3_credentials(self):
+        if not self.peers_rel:
+            return {}
+        return json.loads(self.peers_rel.data[
+            self.peers_rel.app].get(self.S3_CREDENTIALS) or "{}")
+
     @property
     def peer_addresses(self):
         addresses = [self.peers_bind_address]
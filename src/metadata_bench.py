@@ -0,0 +1,137 @@
+import concurrent.futures
+import logging
+import os
+import shutil
+import time
+
+logger = logging.getLogger()
+
+
+def summarize(latencies, elapsed):
+    """Summarize per operation latencies in nanoseconds.
+
+    :param latencies: Latency of each operation (ns)
+    :type latencies: List[int]
+    :param elapsed: Wall clock duration of the phase (s)
+    :type elapsed: float
+    :returns: ops/s and latency statistics
+    :rtype: dict
+    """
+    _sorted = sorted(latencies)
+    _count = len(_sorted)
+    if not _count:
+        return {"ops": 0, "iops": 0.0}
+    return {
+        "ops": _count,
+        "iops": _count / elapsed if elapsed else 0.0,
+        "lat_ns": {
+            "min": _sorted[0],
+            "max": _sorted[-1],
+            "mean": sum(_sorted) / _count,
+            "p50": _sorted[int(_count * 0.50)],
+            "p99": _sorted[min(_count - 1, int(_count * 0.99))]}}
+
+
+class MetadataBench():
+    """Parallel file system metadata workload.
+
+    Each worker thread owns a private tree so that the measured cost is the
+    metadata server's and not lock contention between workers. Two tree
+    shapes are exercised: "wide" puts every file of a worker in a single
+    directory, "deep" spreads them across a chain of nested directories.
+    """
+
+    OPERATIONS = ("create", "stat", "rename", "unlink")
+    SHAPES = ("wide", "deep")
+
+    def __init__(self, root, threads=16, files=1000, depth=8):
+        self.root = root
+        self.threads = threads
+        self.files = files
+        self.depth = depth
+
+    def _worker_dirs(self, shape, worker):
+        _base = os.path.join(self.root, shape, "worker{}".format(worker))
+        if shape == "wide":
+            return [_base]
+        _dirs = []
+        for level in range(self.depth):
+            _base = os.path.join(_base, "d{}".format(level))
+            _dirs.append(_base)
+        return _dirs
+
+    def _worker_files(self, shape, worker):
+        _dirs = self._worker_dirs(shape, worker)
+        return [
+            os.path.join(_dirs[i % len(_dirs)], "f{}".format(i))
+            for i in range(self.files)]
+
+    @staticmethod
+    def _create(path):
+        os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+
+    @staticmethod
+    def _rename(path):
+        os.rename(path, path + ".r")
+
+    @staticmethod
+    def _unlink(path):
+        os.unlink(path + ".r")
+
+    def _run_worker(self, operation, files):
+        _op = {
+            "create": self._create,
+            "stat": os.stat,
+            "rename": self._rename,
+            "unlink": self._unlink}[operation]
+        _latencies = []
+        for path in files:
+            _start = time.perf_counter()
+            _op(path)
+            _latencies.append(int((time.perf_counter() - _start) * 1e9))
+        return _latencies
+
+    def run_shape(self, shape):
+        """Run every operation phase against one tree shape.
+
+        :param shape: wide or deep
+        :type shape: str
+        :returns: Summary per operation
+        :rtype: dict
+        """
+        _root = os.path.join(self.root, shape)
+        # The tree of a failed or killed run would make every create fail
+        shutil.rmtree(_root, ignore_errors=True)
+        try:
+            _files = {}
+            for worker in range(self.threads):
+                for _dir in self._worker_dirs(shape, worker):
+                    os.makedirs(_dir, exist_ok=True)
+                _files[worker] = self._worker_files(shape, worker)
+
+            _results = {}
+            with concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.threads) as executor:
+                for operation in self.OPERATIONS:
+                    logger.info("Running {} {} metadata phase".format(
+                        shape, operation))
+                    _start = time.perf_counter()
+                    _futures = [
+                        executor.submit(self._run_worker, operation, files)
+                        for files in _files.values()]
+                    _latencies = []
+                    for future in _futures:
+                        _latencies += future.result()
+                    _results[operation] = summarize(
+                        _latencies, time.perf_counter() - _start)
+        finally:
+            shutil.rmtree(_root, ignore_errors=True)
+        return _results
+
+    def run(self):
+        """Run the metadata workload for every tree shape.
+
+        :returns: Summary per shape and operation
+        :rtype: dict
+        """
+        return {shape: self.run_shape(shape) for shape in self.SHAPES}
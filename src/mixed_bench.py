@@ -0,0 +1,341 @@
+import concurrent.futures
+import http.client
+import json
+import logging
+import threading
+import time
+import urllib.parse
+
+from metadata_bench import summarize
+
+try:
+    # Provided by python3-rados, not installable from PyPI
+    import rados
+except ImportError:
+    rados = None
+
+logger = logging.getLogger()
+
+
+class StreamError(Exception):
+    """Raised when a stream cannot be set up."""
+    pass
+
+
+def split_concurrency(total, weights):
+    """Split an in-flight operation budget by weight.
+
+    :param total: Total concurrency
+    :type total: int
+    :param weights: Stream name to weight
+    :type weights: Dict[str, int]
+    :returns: Stream name to concurrency, at least one per stream
+    :rtype: Dict[str, int]
+    """
+    _sum = sum(weights.values())
+    return {name: max(1, round(total * weight / _sum))
+            for name, weight in weights.items()}
+
+
+class RateLimiter():
+    """Token bucket shared by the workers of a stream."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Wait for the next operation slot."""
+        if not self.interval:
+            return
+        with self._lock:
+            _now = time.monotonic()
+            # Unused slots are not banked, idle time does not allow bursts
+            _slot = max(self._next, _now)
+            self._next = _slot + self.interval
+        if _slot > _now:
+            time.sleep(_slot - _now)
+
+
+class Stream():
+    """Closed loop workload of a storage client.
+
+    ``concurrency`` workers issue operations back to back, throttled to
+    ``rate`` operations per second over all workers when set.
+    """
+
+    name = None
+
+    def __init__(self, concurrency=1, rate=0, size=4096):
+        self.concurrency = concurrency
+        self.rate = rate
+        self.size = size
+
+    def setup(self):
+        """Prepare the stream before it is measured.
+
+        :raises: StreamError
+        """
+        pass
+
+    def close(self):
+        """Release the resources of the stream."""
+        pass
+
+    def operation(self, worker, index):
+        """Issue a single operation.
+
+        :param worker: Worker number
+        :type worker: int
+        :param index: Operation number of the worker
+        :type index: int
+        """
+        raise NotImplementedError
+
+    def run(self, duration):
+        """Run the workload.
+
+        :param duration: Duration (s)
+        :type duration: float
+        :returns: Operations, ops/s, bandwidth (B/s), latency and errors
+        :rtype: dict
+        """
+        _limiter = RateLimiter(self.rate)
+        _lock = threading.Lock()
+        _latencies = []
+        _errors = [0]
+        _end = time.monotonic() + duration
+
+        def _worker(worker):
+            _index = 0
+            while time.monotonic() < _end:
+                _limiter.acquire()
+                _start = time.perf_counter_ns()
+                try:
+                    self.operation(worker, _index)
+                except Exception as e:
+                    logger.debug("{} operation failed: {}".format(
+                        self.name, e))
+                    with _lock:
+                        _errors[0] += 1
+                    continue
+                finally:
+                    _index += 1
+                with _lock:
+                    _latencies.append(time.perf_counter_ns() - _start)
+
+        _start = time.monotonic()
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.concurrency) as executor:
+            for future in [executor.submit(_worker, w)
+                           for w in range(self.concurrency)]:
+                future.result()
+        _elapsed = time.monotonic() - _start
+        _summary = summarize(_latencies, _elapsed)
+        _summary["bandwidth"] = (
+            len(_latencies) * self.size / _elapsed if _elapsed else 0.0)
+        _summary["errors"] = _errors[0]
+        return _summary
+
+
+class RadosStream(Stream):
+    """Object writes through librados, overwriting a bounded object set.
+
+    With no bound every operation writes a new object. The content written
+    comes from ``buffers``, a data_patterns.BufferGenerator, when set.
+    """
+
+    name = "rados"
+
+    def __init__(self, conffile, client_name, pool_name, prefix, objects=64,
+                 buffers=None, **kwargs):
+        super().__init__(**kwargs)
+        self.conffile = conffile
+        self.client_name = client_name
+        self.pool_name = pool_name
+        self.prefix = prefix
+        self.objects = objects
+        self.buffers = buffers
+        self._data = b"\0" * self.size
+        self._cluster = None
+        self.ioctx = None
+
+    def setup(self):
+        try:
+            self._cluster = rados.Rados(
+                conffile=self.conffile, name=self.client_name)
+            self._cluster.connect()
+            self.ioctx = self._cluster.open_ioctx(self.pool_name)
+        except rados.Error as e:
+            raise StreamError("rados: {}".format(e))
+
+    def close(self):
+        if self.ioctx:
+            self.ioctx.close()
+        if self._cluster:
+            self._cluster.shutdown()
+
+    def operation(self, worker, index):
+        self.ioctx.write_full(
+            "{}_{}_{}".format(
+                self.prefix, worker,
+                index % self.objects if self.objects else index),
+            self.buffers.next() if self.buffers else self._data)
+
+
+class SwiftStream(Stream):
+    """Object PUTs through the Swift API of radosgw.
+
+    Each worker keeps its own persistent connection.
+    """
+
+    name = "swift"
+
+    def __init__(self, auth_url, user, key, container, objects=64,
+                 **kwargs):
+        super().__init__(**kwargs)
+        self.auth_url = auth_url
+        self.user = user
+        self.key = key
+        self.container = container
+        self.objects = objects
+        self._data = b"\0" * self.size
+        self._local = threading.local()
+        self.storage_url = None
+        self.token = None
+
+    @staticmethod
+    def _connection(url):
+        _url = urllib.parse.urlsplit(url)
+        if _url.scheme == "https":
+            return http.client.HTTPSConnection(_url.netloc, timeout=60)
+        return http.client.HTTPConnection(_url.netloc, timeout=60)
+
+    def _request(self, method, url, body=None, headers=None):
+        if not getattr(self._local, "connection", None):
+            self._local.connection = self._connection(url)
+        _connection = self._local.connection
+        _url = urllib.parse.urlsplit(url)
+        try:
+            _connection.request(
+                method,
+                _url.path + ("?" + _url.query if _url.query else ""),
+                body=body,
+                headers=headers or {})
+            _response = _connection.getresponse()
+            _body = _response.read()
+        except (OSError, http.client.HTTPException):
+            # Reconnect on the next request
+            _connection.close()
+            self._local.connection = None
+            raise
+        if _response.status >= 300:
+            raise http.client.HTTPException(
+                "{} {}: {}".format(method, url, _response.status))
+        return _response, _body
+
+    def setup(self):
+        try:
+            _response, _ = self._request("GET", self.auth_url, headers={
+                "X-Auth-User": self.user, "X-Auth-Key": self.key})
+            self.storage_url = _response.getheader("X-Storage-Url")
+            self.token = _response.getheader("X-Auth-Token")
+            self._request("PUT", self._url(), headers={
+                "X-Auth-Token": self.token})
+        except (OSError, http.client.HTTPException) as e:
+            raise StreamError("swift: {}".format(e))
+
+    def _url(self, obj=None):
+        _url = "{}/{}".format(self.storage_url, self.container)
+        if obj:
+            _url += "/{}".format(obj)
+        return _url
+
+    def put(self, name):
+        """PUT an object of the stream's size.
+
+        :param name: Object name
+        :type name: str
+        """
+        self._request(
+            "PUT",
+            self._url(name),
+            body=self._data,
+            headers={"X-Auth-Token": self.token,
+                     "Content-Length": str(self.size)})
+
+    def list(self, marker="", limit=1000):
+        """List a page of the container.
+
+        :param marker: List the objects after this name
+        :type marker: str
+        :param limit: Page size
+        :type limit: int
+        :returns: Object names, in order
+        :rtype: List[str]
+        """
+        _, _body = self._request(
+            "GET",
+            "{}?{}".format(self._url(), urllib.parse.urlencode({
+                "format": "json", "limit": limit, "marker": marker})),
+            headers={"X-Auth-Token": self.token})
+        return [obj["name"] for obj in json.loads(_body or b"[]")]
+
+    def operation(self, worker, index):
+        self.put("{}_{}".format(worker, index % self.objects))
+
+
+class FioStream():
+    """fio workload run as a separate process.
+
+    fio applies the concurrency (iodepth) and rate (rate_iops) through its
+    job file.
+    """
+
+    name = "rbd"
+
+    def __init__(self, run_fio, totals):
+        self.run_fio = run_fio
+        self.totals = totals
+
+    def setup(self):
+        pass
+
+    def close(self):
+        pass
+
+    def run(self, duration):
+        """Run fio, whose job file sets the duration.
+
+        :returns: ops/s, bandwidth (B/s) and latency of all directions
+        :rtype: dict
+        """
+        _totals = self.totals(self.run_fio())
+        _lat = [(_totals["{}_lat_ns".format(d)], _totals["{}_iops".format(d)])
+                for d in ("read", "write")]
+        return {
+            "iops": _totals["iops"],
+            "bandwidth": (_totals["read_bw"] + _totals["write_bw"]) * 1024,
+            "lat_ns": {
+                "mean": (sum(lat * iops for lat, iops in _lat) /
+                         _totals["iops"] if _totals["iops"] else 0.0),
+                "p99": max(_totals["read_clat_p99_ns"],
+                           _totals["write_clat_p99_ns"])}}
+
+
+def run_streams(streams, duration):
+    """Run streams at the same time.
+
+    :param streams: Streams
+    :type streams: List[Stream]
+    :param duration: Duration (s)
+    :type duration: float
+    :returns: Summary per stream name
+    :rtype: dict
+    """
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=len(streams)) as executor:
+        _futures = {stream.name: executor.submit(stream.run, duration)
+                    for stream in streams}
+        return {name: future.result() for name, future in _futures.items()}
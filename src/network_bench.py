@@ -0,0 +1,257 @@
+import collections
+import concurrent.futures
+import logging
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+from metadata_bench import summarize
+
+logger = logging.getLogger()
+
+STREAM = "stream"
+PING = "ping"
+PING_SIZE = 64
+
+
+def schedule(units, unit):
+    """Order in which a unit measures its peers.
+
+    In round ``r`` every unit measures the unit ``r`` positions after it,
+    so when all units run at once each of them receives a single stream
+    per round instead of every unit targeting the same peer first.
+
+    :param units: Names of all units, including unit
+    :type units: List[str]
+    :param unit: Name of the measuring unit
+    :type unit: str
+    :returns: Peer unit names in measuring order
+    :rtype: List[str]
+    """
+    _units = sorted(units)
+    _index = _units.index(unit)
+    return [_units[(_index + r) % len(_units)]
+            for r in range(1, len(_units))]
+
+
+def _recv_exact(sock, size):
+    _data = b""
+    while len(_data) < size:
+        _chunk = sock.recv(size - len(_data))
+        if not _chunk:
+            raise ConnectionError("Connection closed by peer")
+        _data += _chunk
+    return _data
+
+
+def _connect(host, port, mode, unit, timeout=30):
+    sock = socket.create_connection((host, port), timeout=timeout)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.sendall("{} {}\n".format(mode, unit).encode("UTF-8"))
+    return sock
+
+
+class _Handler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        _file = self.request.makefile("rb")
+        _mode, _, _unit = (
+            _file.readline().decode("UTF-8").strip().partition(" "))
+        if _mode == STREAM:
+            # Discard everything until the client shuts down its side, then
+            # report what actually arrived.
+            _received = 0
+            while True:
+                _chunk = _file.read1(1 << 20)
+                if not _chunk:
+                    break
+                _received += len(_chunk)
+            self.request.sendall(struct.pack("!Q", _received))
+            self.server.mark_completed(_unit)
+        elif _mode == PING:
+            while True:
+                _ping = _file.read(PING_SIZE)
+                if len(_ping) < PING_SIZE:
+                    break
+                self.request.sendall(_ping)
+
+
+class NetworkBenchServer(socketserver.ThreadingTCPServer):
+    """TCP sink and echo server peers measure against.
+
+    The server counts the streams each unit completed against it so a unit
+    can keep serving until all of its peers are done, trial after trial.
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, port):
+        super().__init__(("", port), _Handler)
+        self.completed = collections.Counter()
+        self._completed_changed = threading.Condition()
+
+    def start(self):
+        """Serve from a background thread."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def stop(self):
+        """Stop serving and close the listening socket."""
+        self.shutdown()
+        self.server_close()
+
+    def mark_completed(self, unit):
+        with self._completed_changed:
+            self.completed[unit] += 1
+            self._completed_changed.notify_all()
+
+    def pending(self, units, streams=1):
+        """Units which completed fewer streams against the server.
+
+        :param units: Unit names
+        :type units: List[str]
+        :param streams: Streams each unit is expected to complete
+        :type streams: int
+        :rtype: List[str]
+        """
+        return [unit for unit in units if self.completed[unit] < streams]
+
+    def wait_completed(self, units, timeout, streams=1):
+        """Wait until the units completed streams against the server.
+
+        :param units: Unit names
+        :type units: List[str]
+        :param timeout: Maximum wait (s)
+        :type timeout: float
+        :param streams: Streams each unit is expected to complete
+        :type streams: int
+        :returns: Whether all units completed
+        :rtype: bool
+        """
+        _deadline = time.monotonic() + timeout
+        with self._completed_changed:
+            while self.pending(units, streams):
+                _remaining = _deadline - time.monotonic()
+                if _remaining <= 0:
+                    return False
+                self._completed_changed.wait(_remaining)
+        return True
+
+
+class NetworkBenchClient():
+    """Measure TCP throughput and round trip time to peer servers."""
+
+    def __init__(self, unit, port, streams=4, duration=10,
+                 buffer_size=131072, ping_count=100):
+        self.unit = unit
+        self.port = port
+        self.streams = streams
+        self.duration = duration
+        self.buffer_size = buffer_size
+        self.ping_count = ping_count
+
+    def wait_for(self, host, timeout):
+        """Wait for the server of a peer to accept connections.
+
+        :param host: Peer address
+        :type host: str
+        :param timeout: Maximum wait (s)
+        :type timeout: float
+        :returns: Whether the server is reachable
+        :rtype: bool
+        """
+        _deadline = time.monotonic() + timeout
+        while True:
+            try:
+                socket.create_connection((host, self.port), timeout=5).close()
+                return True
+            except OSError:
+                if time.monotonic() >= _deadline:
+                    return False
+                time.sleep(1)
+
+    def _stream(self, host):
+        _payload = b"\0" * self.buffer_size
+        with _connect(host, self.port, STREAM, self.unit) as sock:
+            _start = time.perf_counter()
+            _end = _start + self.duration
+            while time.perf_counter() < _end:
+                sock.sendall(_payload)
+            sock.shutdown(socket.SHUT_WR)
+            # The reply only arrives once the server drained the stream
+            _received = struct.unpack("!Q", _recv_exact(sock, 8))[0]
+            return _received, time.perf_counter() - _start
+
+    def throughput(self, host):
+        """Measure throughput with parallel streams.
+
+        :param host: Peer address
+        :type host: str
+        :returns: Bytes received by the peer, duration and bandwidth
+        :rtype: dict
+        """
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.streams) as executor:
+            _futures = [executor.submit(self._stream, host)
+                        for _ in range(self.streams)]
+            _streams = [future.result() for future in _futures]
+        _bytes = sum(received for received, _ in _streams)
+        _elapsed = max(elapsed for _, elapsed in _streams)
+        _stream_bps = [received * 8 / elapsed
+                       for received, elapsed in _streams]
+        return {
+            "streams": self.streams,
+            "bytes": _bytes,
+            "seconds": _elapsed,
+            "bandwidth_bps": _bytes * 8 / _elapsed,
+            "stream_bandwidth_bps": {
+                "min": min(_stream_bps),
+                "max": max(_stream_bps)}}
+
+    def rtt(self, host):
+        """Measure the round trip time of small messages.
+
+        :param host: Peer address
+        :type host: str
+        :returns: Round trip latency statistics
+        :rtype: dict
+        """
+        _payload = b"p" * PING_SIZE
+        _latencies = []
+        with _connect(host, self.port, PING, self.unit) as sock:
+            _start = time.perf_counter()
+            for _ in range(self.ping_count):
+                _sent = time.perf_counter_ns()
+                sock.sendall(_payload)
+                _recv_exact(sock, PING_SIZE)
+                _latencies.append(time.perf_counter_ns() - _sent)
+            _elapsed = time.perf_counter() - _start
+            sock.shutdown(socket.SHUT_WR)
+        return {
+            "count": self.ping_count,
+            "rtt_ns": summarize(_latencies, _elapsed)["lat_ns"]}
+
+    def connect_rtt(self, host, port):
+        """Measure the TCP connect time to a service we cannot run a
+        server on, e.g. a Ceph monitor.
+
+        :param host: Service address
+        :type host: str
+        :param port: Service port
+        :type port: int
+        :returns: Connect latency statistics
+        :rtype: dict
+        """
+        _latencies = []
+        _start = time.perf_counter()
+        for _ in range(self.ping_count):
+            _sent = time.perf_counter_ns()
+            socket.create_connection((host, port), timeout=5).close()
+            _latencies.append(time.perf_counter_ns() - _sent)
+        return {
+            "count": self.ping_count,
+            "rtt_ns": summarize(
+                _latencies, time.perf_counter() - _start)["lat_ns"]}
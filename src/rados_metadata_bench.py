@@ -0,0 +1,192 @@
+import logging
+import threading
+import time
+
+from metadata_bench import summarize
+
+try:
+    # Provided by python3-rados, not installable from PyPI
+    import rados
+except ImportError:
+    rados = None
+
+logger = logging.getLogger()
+
+
+class RadosMetadataBench():
+    """Small object, omap and xattr benchmark over librados.
+
+    Operations are submitted asynchronously with up to ``concurrency``
+    operations in flight, which is how RGW drives bucket index objects.
+    """
+
+    OPERATIONS = (
+        "create", "stat", "xattr_set", "xattr_get", "omap_set", "omap_get",
+        "omap_list", "xattr_remove", "delete")
+
+    def __init__(self, ioctx, prefix, objects=1000, object_size=4096,
+                 omap_objects=8, omap_keys=10000, concurrency=16):
+        self.ioctx = ioctx
+        self.prefix = prefix
+        self.objects = objects
+        self.object_size = object_size
+        self.omap_objects = omap_objects
+        self.omap_keys = omap_keys
+        self.concurrency = concurrency
+
+    @property
+    def object_names(self):
+        return ["{}_obj_{}".format(self.prefix, i)
+                for i in range(self.objects)]
+
+    @property
+    def index_names(self):
+        return ["{}_index_{}".format(self.prefix, i)
+                for i in range(self.omap_objects)]
+
+    @property
+    def omap_entries(self):
+        _indexes = self.index_names
+        return [(_indexes[i % len(_indexes)], "key_{:010d}".format(i))
+                for i in range(self.omap_keys)]
+
+    def _run_aio(self, submit, items):
+        """Submit an asynchronous operation per item.
+
+        :param submit: Called with an item and a completion callback.
+        :type submit: Callable
+        :param items: Items to submit operations for
+        :type items: List
+        :returns: Summary of the phase
+        :rtype: dict
+        """
+        _slots = threading.Semaphore(self.concurrency)
+        _lock = threading.Lock()
+        _latencies = []
+        _errors = [0]
+
+        def _launch(item):
+            _slots.acquire()
+            _start = time.perf_counter()
+
+            def _done(completion, *args):
+                _latency = int((time.perf_counter() - _start) * 1e9)
+                with _lock:
+                    _latencies.append(_latency)
+                    if completion.get_return_value() < 0:
+                        _errors[0] += 1
+                _slots.release()
+
+            submit(item, _done)
+
+        _start = time.perf_counter()
+        for item in items:
+            _launch(item)
+        # Wait for all operations in flight
+        for _ in range(self.concurrency):
+            _slots.acquire()
+        _summary = summarize(_latencies, time.perf_counter() - _start)
+        _summary["errors"] = _errors[0]
+        return _summary
+
+    @staticmethod
+    def _releasing(op, oncomplete):
+        # The operation must outlive the asynchronous call
+        def _done(completion, *args):
+            oncomplete(completion, *args)
+            op.release()
+        return _done
+
+    def _omap_set(self, item, oncomplete):
+        _index, _key = item
+        op = self.ioctx.create_write_op()
+        self.ioctx.set_omap(op, (_key,), (b"v" * 64,))
+        self.ioctx.operate_aio_write_op(
+            op, _index, self._releasing(op, oncomplete))
+
+    def _omap_get(self, item, oncomplete):
+        _index, _key = item
+        op = self.ioctx.create_read_op()
+        self.ioctx.get_omap_vals_by_keys(op, (_key,))
+        self.ioctx.operate_aio_read_op(
+            op, _index, self._releasing(op, oncomplete))
+
+    def _omap_list(self, page_size=1000):
+        """List every index object by pages, as RGW bucket listing does.
+
+        Listing pages depend on each other so pages are fetched
+        synchronously, one index object per thread.
+        """
+        _lock = threading.Lock()
+        _latencies = []
+        _keys = [0]
+
+        def _list(index):
+            _after = ""
+            while True:
+                _start = time.perf_counter()
+                op = self.ioctx.create_read_op()
+                try:
+                    _iter, _ = self.ioctx.get_omap_vals(
+                        op, _after, "", page_size)
+                    self.ioctx.operate_read_op(op, index)
+                    _page = [k for k, _ in _iter]
+                finally:
+                    op.release()
+                _latency = int((time.perf_counter() - _start) * 1e9)
+                with _lock:
+                    _latencies.append(_latency)
+                    _keys[0] += len(_page)
+                if len(_page) < page_size:
+                    return
+                _after = _page[-1]
+
+        _start = time.perf_counter()
+        _threads = [threading.Thread(target=_list, args=(index,))
+                    for index in self.index_names]
+        for thread in _threads:
+            thread.start()
+        for thread in _threads:
+            thread.join()
+        _elapsed = time.perf_counter() - _start
+        _summary = summarize(_latencies, _elapsed)
+        _summary["keys"] = _keys[0]
+        _summary["keys_per_sec"] = _keys[0] / _elapsed if _elapsed else 0.0
+        return _summary
+
+    def run(self):
+        """Run every benchmark phase and remove the benchmark objects.
+
+        :returns: Summary per operation
+        :rtype: dict
+        """
+        _data = b"\0" * self.object_size
+        _objects = self.object_names
+        _phases = (
+            ("create", _objects,
+             lambda o, cb: self.ioctx.aio_write_full(o, _data, cb)),
+            ("stat", _objects,
+             lambda o, cb: self.ioctx.aio_stat(o, cb)),
+            ("xattr_set", _objects,
+             lambda o, cb: self.ioctx.aio_setxattr(
+                 o, "user.woodpecker", b"v" * 64, cb)),
+            ("xattr_get", _objects,
+             lambda o, cb: self.ioctx.aio_getxattr(
+                 o, "user.woodpecker", cb)),
+            ("omap_set", self.omap_entries, self._omap_set),
+            ("omap_get", self.omap_entries, self._omap_get),
+            ("omap_list", None, None),
+            ("xattr_remove", _objects,
+             lambda o, cb: self.ioctx.aio_rmxattr(
+                 o, "user.woodpecker", cb)),
+            ("delete", _objects + self.index_names,
+             lambda o, cb: self.ioctx.aio_remove(o, cb)),
+        )
+        _results = {}
+        for operation, items, submit in _phases:
+            logger.info("Running rados {} phase".format(operation))
+            if operation == "omap_list":
+                _results[operation] = self._omap_list()
+            else:
+                _results[operation] = self._run_aio(submit, items)
+        return _results
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""JSON API over the results of benchmark runs.
+
+The metrics endpoint serves it under /api next to the Prometheus gauges:
+
+    GET /api/runs?name=fio&limit=20      Runs, newest first
+    GET /api/runs/<run>                  Summary of a run
+    GET /api/runs/<run>/series?metric=fio_read_iops&points=200
+                                         Downsampled time series of a run
+
+Between benchmark runs the API is served by this script as a daemon:
+
+    python3 results_api.py /var/lib/woodpecker/results --port 8088
+"""
+
+import argparse
+import collections
+import datetime
+import json
+import logging
+import os
+import shutil
+import socketserver
+import threading
+import time
+import urllib.parse
+import wsgiref.simple_server
+
+logger = logging.getLogger()
+
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class RunNotFoundError(Exception):
+    """Raised when a run ID is unknown."""
+    pass
+
+
+def downsample(points, count):
+    """Reduce a time series to at most count points.
+
+    The series is split into count intervals of equal duration, each one
+    reduced to the mean time and value of its points.
+
+    :param points: (timestamp, value) pairs, iterated twice
+    :type points: Callable[[], Iterable[Tuple[float, float]]]
+    :param count: Maximum number of points
+    :type count: int
+    :returns: [timestamp, value] pairs in time order
+    :rtype: List[List[float]]
+    """
+    _total = 0
+    _start = _end = None
+    for timestamp, _ in points():
+        _total += 1
+        _start = timestamp if _start is None else min(_start, timestamp)
+        _end = timestamp if _end is None else max(_end, timestamp)
+    if _total <= count:
+        return sorted([timestamp, value] for timestamp, value in points())
+    _span = (_end - _start) or 1.0
+    _buckets = [[0.0, 0.0, 0] for _ in range(count)]
+    for timestamp, value in points():
+        _bucket = _buckets[min(count - 1,
+                               int((timestamp - _start) / _span * count))]
+        _bucket[0] += timestamp
+        _bucket[1] += value
+        _bucket[2] += 1
+    return [[timestamps / n, values / n]
+            for timestamps, values, n in _buckets if n]
+
+
+class ResultHistory():
+    """Summaries and time series of benchmark runs.
+
+    The points of the run in progress are kept in a fixed size ring buffer.
+    When it is full, its oldest half spills to the run's file on disk, so
+    memory stays flat however long the run is. Runs beyond the retention
+    count are removed, oldest first.
+    """
+
+    META = "meta.json"
+    POINTS = "points.jsonl"
+
+    def __init__(self, path, capacity=4096, retention=1000):
+        self.path = path
+        self.capacity = capacity
+        self.retention = retention
+        self.current = None
+        self._buffer = collections.deque()
+        self._lock = threading.Lock()
+
+    def _run_path(self, run_id, name=""):
+        # IDs are generated by start_run, refuse anything resembling a path
+        if os.path.basename(run_id) != run_id:
+            raise RunNotFoundError(run_id)
+        return os.path.join(self.path, run_id, name)
+
+    def _read_meta(self, run_id):
+        try:
+            with open(self._run_path(run_id, self.META)) as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            raise RunNotFoundError(run_id)
+
+    def _write_meta(self, meta):
+        _path = self._run_path(meta["id"], self.META)
+        with open(_path + ".tmp", "w") as fh:
+            json.dump(meta, fh)
+        os.replace(_path + ".tmp", _path)
+
+    def start_run(self, name, params=None):
+        """Start recording a run.
+
+        :param name: Benchmark name, e.g. the action name
+        :type name: str
+        :param params: Parameters of the run
+        :type params: dict
+        :returns: Run ID
+        :rtype: str
+        """
+        if self.current:
+            self.finish_run(state=FAILED)
+        _now = datetime.datetime.utcnow()
+        _run_id = "{}-{}-{}".format(
+            name, _now.strftime("%Y%m%dT%H%M%S"), os.urandom(4).hex())
+        os.makedirs(self._run_path(_run_id), mode=0o750)
+        self._write_meta({
+            "id": _run_id,
+            "name": name,
+            "params": params or {},
+            "state": RUNNING,
+            "started": _now.isoformat()})
+        self.current = _run_id
+        self._buffer.clear()
+        self.prune()
+        return _run_id
+
+    def record(self, metric, value, timestamp=None):
+        """Record a point of the run in progress.
+
+        Points recorded outside of a run are dropped.
+
+        :param metric: Metric name
+        :type metric: str
+        :param value: Value
+        :type value: float
+        :param timestamp: Unix time, now if None
+        :type timestamp: float
+        """
+        if not self.current:
+            return
+        with self._lock:
+            self._buffer.append(
+                (timestamp or time.time(), metric, float(value)))
+            if len(self._buffer) >= self.capacity:
+                self._spill(self.capacity // 2)
+
+    def _spill(self, count):
+        with open(self._run_path(self.current, self.POINTS), "a") as fh:
+            for _ in range(min(count, len(self._buffer))):
+                fh.write(json.dumps(self._buffer.popleft()) + "\n")
+
+    def finish_run(self, summary=None, state=DONE):
+        """Finish recording the run in progress.
+
+        :param summary: Summary of the run, e.g. its metrics and artifact
+        :type summary: dict
+        :param state: DONE or FAILED
+        :type state: str
+        """
+        if not self.current:
+            return
+        with self._lock:
+            self._spill(len(self._buffer))
+        _meta = self._read_meta(self.current)
+        _meta.update(
+            state=state,
+            summary=summary or {},
+            finished=datetime.datetime.utcnow().isoformat())
+        self._write_meta(_meta)
+        self.current = None
+
+    def _run_ids(self):
+        if not os.path.isdir(self.path):
+            return []
+        # IDs sort by start time within a benchmark, not across benchmarks
+        _ids = []
+        for run_id in os.listdir(self.path):
+            try:
+                _ids.append((self._read_meta(run_id)["started"], run_id))
+            except (RunNotFoundError, ValueError, KeyError):
+                continue
+        return [run_id for _, run_id in sorted(_ids)]
+
+    def prune(self):
+        """Remove the oldest runs beyond the retention count."""
+        _ids = [i for i in self._run_ids() if i != self.current]
+        for run_id in _ids[:max(0, len(_ids) + 1 - self.retention)]:
+            logger.info("Removing run {}".format(run_id))
+            shutil.rmtree(self._run_path(run_id), ignore_errors=True)
+
+    def runs(self, name=None, limit=100):
+        """Runs, newest first, without their summary.
+
+        :param name: Only list runs of this benchmark
+        :type name: str
+        :param limit: Maximum number of runs
+        :type limit: int
+        :rtype: List[dict]
+        """
+        _runs = []
+        for run_id in reversed(self._run_ids()):
+            if len(_runs) >= limit:
+                break
+            try:
+                _meta = self._read_meta(run_id)
+            except (RunNotFoundError, ValueError):
+                continue
+            if name and _meta["name"] != name:
+                continue
+            _meta.pop("summary", None)
+            _runs.append(_meta)
+        return _runs
+
+    def run(self, run_id):
+        """Summary of a run.
+
+        :rtype: dict
+        :raises: RunNotFoundError
+        """
+        return self._read_meta(run_id)
+
+    def _points(self, run_id):
+        try:
+            with open(self._run_path(run_id, self.POINTS)) as fh:
+                for line in fh:
+                    try:
+                        yield tuple(json.loads(line))
+                    except ValueError:
+                        # Line being appended by the run in progress
+                        continue
+        except FileNotFoundError:
+            pass
+        if run_id == self.current:
+            with self._lock:
+                _buffered = list(self._buffer)
+            yield from _buffered
+
+    def metrics(self, run_id):
+        """Names of the metrics recorded by a run.
+
+        :rtype: List[str]
+        """
+        return sorted({metric for _, metric, _ in self._points(run_id)})
+
+    def series(self, run_id, metric=None, points=500):
+        """Downsampled time series of a run.
+
+        :param run_id: Run ID
+        :type run_id: str
+        :param metric: Only return this metric
+        :type metric: str
+        :param points: Maximum number of points per metric
+        :type points: int
+        :returns: Metric name to [timestamp, value] pairs
+        :rtype: Dict[str, List[List[float]]]
+        :raises: RunNotFoundError, ValueError
+        """
+        if points < 1:
+            raise ValueError("points must be at least 1")
+        self._read_meta(run_id)
+        _metrics = [metric] if metric else self.metrics(run_id)
+        return {
+            name: downsample(
+                lambda name=name: (
+                    (timestamp, value)
+                    for timestamp, _metric, value in self._points(run_id)
+                    if _metric == name),
+                points)
+            for name in _metrics}
+
+
+def make_app(history, fallback=None):
+    """WSGI application of the JSON API.
+
+    :param history: Run history
+    :type history: ResultHistory
+    :param fallback: Application serving the paths outside of /api, e.g.
+                     the Prometheus exporter
+    :type fallback: Callable
+    :returns: WSGI application
+    :rtype: Callable
+    """
+
+    def _respond(start_response, status, body):
+        _body = json.dumps(body).encode("UTF-8")
+        start_response(status, [
+            ("Content-Type", "application/json"),
+            ("Content-Length", str(len(_body)))])
+        return [_body]
+
+    def _app(environ, start_response):
+        _path = environ.get("PATH_INFO", "").strip("/").split("/")
+        if _path[0] != "api":
+            if fallback:
+                return fallback(environ, start_response)
+            return _respond(start_response, "404 Not Found",
+                            {"error": "Not found"})
+        _query = urllib.parse.parse_qs(environ.get("QUERY_STRING", ""))
+
+        def _param(name, default=None):
+            return _query.get(name, [default])[0]
+
+        try:
+            if _path == ["api", "runs"]:
+                _body = {"runs": history.runs(
+                    _param("name"), int(_param("limit", 100)))}
+            elif _path[:2] == ["api", "runs"] and len(_path) == 3:
+                _body = history.run(_path[2])
+            elif _path[:2] == ["api", "runs"] and _path[3:] == ["series"]:
+                _body = {
+                    "id": _path[2],
+                    "series": history.series(
+                        _path[2], _param("metric"),
+                        int(_param("points", 500)))}
+            else:
+                return _respond(start_response, "404 Not Found",
+                                {"error": "Not found"})
+        except RunNotFoundError as e:
+            return _respond(start_response, "404 Not Found",
+                            {"error": "Run {} not found".format(e)})
+        except ValueError as e:
+            return _respond(start_response, "400 Bad Request",
+                            {"error": str(e)})
+        return _respond(start_response, "200 OK", _body)
+
+    return _app
+
+
+class _ThreadingWSGIServer(socketserver.ThreadingMixIn,
+                           wsgiref.simple_server.WSGIServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _QuietHandler(wsgiref.simple_server.WSGIRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(port, app):
+    """HTTP server of a WSGI application.
+
+    :param port: Port to listen on
+    :type port: int
+    :param app: WSGI application
+    :type app: Callable
+    :rtype: wsgiref.simple_server.WSGIServer
+    """
+    return wsgiref.simple_server.make_server(
+        "", port, app, _ThreadingWSGIServer, handler_class=_QuietHandler)
+
+
+def start_server(port, app):
+    """Serve a WSGI application from a background thread.
+
+    :returns: Server, see make_server
+    :rtype: wsgiref.simple_server.WSGIServer
+    """
+    _server = make_server(port, app)
+    threading.Thread(target=_server.serve_forever, daemon=True).start()
+    return _server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("path")
+    parser.add_argument("-p", "--port", type=int, default=8088)
+    parser.add_argument("--pid-file")
+    args = parser.parse_args()
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    try:
+        from prometheus_client import make_wsgi_app
+        _fallback = make_wsgi_app()
+    except ImportError:
+        _fallback = None
+    _server = make_server(
+        args.port, make_app(ResultHistory(args.path), _fallback))
+    if args.pid_file:
+        with open(args.pid_file, "w") as fh:
+            fh.write(str(os.getpid()))
+    logger.info("Serving results of {} on port {}".format(
+        args.path, args.port))
+    _server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
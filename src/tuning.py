@@ -0,0 +1,118 @@
+import itertools
+
+from baselines import is_relative, metric_kind
+
+# Throughput over all jobs, images or units, see bench_stats.fio_totals
+TOTAL_RANK_METRICS = ("iops", "total/iops", "aggregate/iops")
+
+
+def parse_overrides(value):
+    """Parse client configuration overrides.
+
+    :param value: Space delimited option=value pairs, e.g.
+                  "rbd_cache=false objecter_inflight_ops=4096"
+    :type value: str
+    :returns: Option to value
+    :rtype: Dict[str, str]
+    :raises: ValueError
+    """
+    _overrides = {}
+    for pair in (value or "").split():
+        _option, _, _value = pair.partition("=")
+        if not _option or not _value:
+            raise ValueError(
+                "Invalid ceph option {}, expected option=value".format(pair))
+        _overrides[_option] = _value
+    return _overrides
+
+
+def parse_matrix(value, base=None):
+    """Expand a tuning matrix into its combinations of overrides.
+
+    :param value: Space delimited option=value1,value2 entries, e.g.
+                  "rbd_cache=true,false rbd_cache_size=33554432,67108864"
+    :type value: str
+    :param base: Overrides shared by every combination
+    :type base: Dict[str, str]
+    :returns: Overrides of every combination
+    :rtype: List[Dict[str, str]]
+    :raises: ValueError
+    """
+    _options = parse_overrides(value)
+    _values = [v.split(",") for v in _options.values()]
+    return [dict(base or {}, **dict(zip(_options, combination)))
+            for combination in itertools.product(*_values)]
+
+
+def render_overrides(content, overrides):
+    """Append overrides to a ceph.conf as a client section.
+
+    :param content: ceph.conf content
+    :type content: str
+    :param overrides: Option to value
+    :type overrides: Dict[str, str]
+    :returns: ceph.conf content
+    :rtype: str
+    """
+    _lines = ["{} = {}".format(option, value)
+              for option, value in sorted(overrides.items())]
+    return "{}\n# Client overrides of this run\n[client]\n{}\n".format(
+        content.rstrip("\n"), "\n".join(_lines))
+
+
+def default_rank_metric(sample):
+    """Metric ranking combinations when none is requested.
+
+    Throughput over all jobs, images or units is preferred, relative
+    metrics such as delta-percent/iops never rank combinations.
+
+    :param sample: Flat metrics
+    :type sample: dict
+    :returns: The total iops metric, else the first iops metric, else the
+              first bandwidth metric
+    :rtype: Union[str, None]
+    """
+    for name in TOTAL_RANK_METRICS:
+        if name in sample:
+            return name
+    for kind in ("iops", "bandwidth"):
+        for name in sorted(sample):
+            if not is_relative(name) and metric_kind(name) == kind:
+                return name
+    return None
+
+
+def lower_is_better(name):
+    """Whether a lower value of a metric is better, i.e. a latency.
+
+    Unlike the baseline gate, which only checks p99 latencies, mean and
+    average latencies count as well, e.g. read_lat_ns or rados bench
+    Average Latency(s).
+
+    :param name: Flat metric name
+    :type name: str
+    :rtype: bool
+    """
+    return "lat" in name.lower().split("/")[-1]
+
+
+def rank(runs, metric=None):
+    """Rank the combinations of a tuning matrix.
+
+    :param runs: Overrides and flat metrics of every combination
+    :type runs: List[Tuple[Dict[str, str], dict]]
+    :param metric: Flat metric to rank by, lower is better for latencies
+    :type metric: str
+    :returns: Combinations from best to worst
+    :rtype: List[dict]
+    """
+    _metric = metric or default_rank_metric(runs[0][1])
+    _ranked = sorted(
+        (run for run in runs if _metric in run[1]),
+        key=lambda run: run[1][_metric],
+        reverse=not lower_is_better(_metric))
+    return [{"rank": index + 1,
+             "ceph-config": overrides,
+             "metric": _metric,
+             "value": sample[_metric]}
+            for index, (overrides, sample) in enumerate(_ranked)]
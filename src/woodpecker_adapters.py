@@ -0,0 +1,72 @@
+import ops_openstack.adapters
+
+
+class CephClientAdapter(ops_openstack.adapters.OpenStackOperRelationAdapter):
+    """Ceph Client Adapter."""
+
+    def __init__(self, relation):
+        super(CephClientAdapter, self).__init__(relation)
+
+    @property
+    def mon_hosts(self):
+        hosts = self.relation.get_relation_data()["mon_hosts"]
+        return " ".join(sorted(hosts))
+
+    @property
+    def auth_supported(self):
+        return self.relation.get_relation_data()["auth"]
+
+    @property
+    def key(self):
+        return self.relation.get_relation_data()["key"]
+
+    @property
+    def client_name(self):
+        return self.relation.model.app.name
+
+
+class PeerAdapter(ops_openstack.adapters.OpenStackOperRelationAdapter):
+    """Peer Adapter."""
+
+    def __init__(self, relation):
+        super(PeerAdapter, self).__init__(relation)
+
+
+class WoodpeckerPeerAdapter(PeerAdapter):
+    """Woodpecker Peer Adapter."""
+
+    def __init__(self, relation):
+        super(WoodpeckerPeerAdapter, self).__init__(relation)
+
+    @property
+    def hosts(self):
+        """woodpecker unit addresses."""
+        hosts = self.relation.peers_addresses
+        return " ".join(sorted(hosts))
+
+
+class TLSCertificatesAdapter(
+        ops_openstack.adapters.OpenStackOperRelationAdapter):
+    """TLS Certificates Adapter."""
+
+    def __init__(self, relation):
+        super(TLSCertificatesAdapter, self).__init__(relation)
+
+    @property
+    def enable_tls(self):
+        import interface_tls_certificates.ca_client as ca_client
+        try:
+            return bool(self.relation.application_certificate)
+        except ca_client.CAClientError:
+            return False
+
+
+class WoodpeckerAdapters(
+        ops_openstack.adapters.OpenStackRelationAdapters):
+    """Woodpecker Adapters."""
+
+    relation_adapters = {
+        "ceph-client": CephClientAdapter,
+        "peers": WoodpeckerPeerAdapter,
+        "certificates": TLSCertificatesAdapter,
+    }
@@ -15,5 +15,7 @@
 import sys
 import mock
 
+sys.path.append('src')
+
 # Mock out secrets to make py35 happy.
 sys.modules['secrets'] = mock.MagicMock()
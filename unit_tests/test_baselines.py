@@ -0,0 +1,110 @@
+# Copyright 2020 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import tempfile
+import unittest
+
+import baselines
+
+THRESHOLDS = {"iops": 10, "bandwidth": 10, "latency": 10}
+
+
+class TestSpecId(unittest.TestCase):
+
+    def test_ignored_params(self):
+        _spec = baselines.spec_id("fio", {"runtime": 60})
+        self.assertTrue(_spec.startswith("fio-"))
+        self.assertEqual(
+            baselines.spec_id("fio", {
+                "runtime": 60, "trials": 5, "save-baseline": True,
+                # Added by the charm for rendering
+                "rbd_images": ["image"]}),
+            _spec)
+
+    def test_params_change_spec(self):
+        self.assertNotEqual(
+            baselines.spec_id("fio", {"runtime": 60}),
+            baselines.spec_id("fio", {"runtime": 120}))
+        self.assertNotEqual(
+            baselines.spec_id("fio", {"runtime": 60}),
+            baselines.spec_id("rbd-bench", {"runtime": 60}))
+
+
+class TestMetricKind(unittest.TestCase):
+
+    def test_kinds(self):
+        self.assertEqual(baselines.metric_kind("read_iops"), "iops")
+        self.assertEqual(baselines.metric_kind("ops/sec"), "iops")
+        self.assertEqual(baselines.metric_kind("write_bw"), "bandwidth")
+        self.assertEqual(baselines.metric_kind("bytes/sec"), "bandwidth")
+        self.assertEqual(
+            baselines.metric_kind("Bandwidth (MB/sec)"), "bandwidth")
+        self.assertIsNone(baselines.metric_kind("Max bandwidth (MB/sec)"))
+        self.assertEqual(
+            baselines.metric_kind("read_clat_p99_ns"), "latency")
+        self.assertIsNone(baselines.metric_kind("iops_stddev"))
+        self.assertIsNone(baselines.metric_kind("seconds"))
+
+    def test_relative_metrics(self):
+        for name in ("delta-percent/iops", "change-percent/read_bw",
+                     "rbd/delta-percent/write_clat_p99_ns",
+                     "write/iops-percent"):
+            self.assertTrue(baselines.is_relative(name), name)
+            self.assertIsNone(baselines.metric_kind(name), name)
+        self.assertFalse(baselines.is_relative("iops"))
+
+
+class TestCompare(unittest.TestCase):
+
+    def test_regressions(self):
+        _regressions = baselines.compare(
+            {"iops": 100.0, "read_clat_p99_ns": 1000.0, "read_bw": 50.0,
+             "delta-percent/iops": 10.0},
+            {"iops": 80.0, "read_clat_p99_ns": 1200.0, "read_bw": 49.0,
+             "delta-percent/iops": -50.0},
+            THRESHOLDS)
+        self.assertEqual(
+            sorted(_regressions), ["iops", "read_clat_p99_ns"])
+        self.assertEqual(_regressions["iops"], {
+            "baseline": 100.0, "value": 80.0, "change-percent": -20.0})
+        self.assertEqual(
+            _regressions["read_clat_p99_ns"]["change-percent"], 20.0)
+
+    def test_improvements_pass(self):
+        self.assertEqual(
+            baselines.compare(
+                {"iops": 100.0, "read_clat_p99_ns": 1000.0},
+                {"iops": 150.0, "read_clat_p99_ns": 500.0},
+                THRESHOLDS),
+            {})
+
+    def test_missing_or_zero_baseline(self):
+        self.assertEqual(
+            baselines.compare(
+                {"read_iops": 0.0}, {"read_iops": 10.0, "iops": 1.0},
+                THRESHOLDS),
+            {})
+
+
+class TestBaselineStore(unittest.TestCase):
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as path:
+            _store = baselines.BaselineStore(path)
+            self.assertIsNone(_store.load("fio-0"))
+            _store.save("fio-0", {"iops": 1.0}, "artifact")
+            _baseline = _store.load("fio-0")
+            self.assertEqual(_baseline["metrics"], {"iops": 1.0})
+            self.assertEqual(_baseline["artifact-id"], "artifact")
+            self.assertEqual(_baseline["spec"], "fio-0")
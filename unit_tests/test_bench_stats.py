@@ -0,0 +1,165 @@
+# Copyright 2020 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+import unittest
+
+import bench_stats
+
+
+def _fio_job(read_iops, read_lat, read_p99, write_iops=0.0):
+    return {
+        "read": {
+            "iops": read_iops, "bw": read_iops * 4,
+            "lat_ns": {"mean": read_lat},
+            "clat_ns": {"percentile": {"99.000000": read_p99}}},
+        "write": {
+            "iops": write_iops, "bw": write_iops * 4,
+            "lat_ns": {"mean": 0.0},
+            "clat_ns": {}}}
+
+
+class TestTQuantile(unittest.TestCase):
+
+    def test_table_value(self):
+        self.assertEqual(bench_stats.t_95(1), 12.706)
+        self.assertEqual(bench_stats.t_95(10), 2.228)
+
+    def test_interpolates_between_table_entries(self):
+        # Exact quantiles: 2.074 and 2.040
+        self.assertAlmostEqual(bench_stats.t_95(22), 2.074, places=3)
+        self.assertAlmostEqual(bench_stats.t_95(31), 2.040, places=2)
+        self.assertEqual(bench_stats.t_95(60), 2.000)
+
+    def test_converges_to_normal_beyond_table(self):
+        # Exact quantile: 1.972
+        self.assertAlmostEqual(bench_stats.t_95(200), 1.972, places=3)
+        self.assertGreater(bench_stats.t_95(1000), bench_stats.Z_95)
+        self.assertAlmostEqual(
+            bench_stats.t_95(10 ** 6), bench_stats.Z_95, places=3)
+
+
+class TestRejectOutliers(unittest.TestCase):
+
+    def test_rejects_far_value(self):
+        _kept, _outliers = bench_stats.reject_outliers(
+            [10.0, 10.1, 9.9, 10.0, 50.0])
+        self.assertEqual(_kept, [10.0, 10.1, 9.9, 10.0])
+        self.assertEqual(_outliers, [50.0])
+
+    def test_keeps_too_few_values(self):
+        self.assertEqual(
+            bench_stats.reject_outliers([1.0, 100.0]), ([1.0, 100.0], []))
+
+    def test_keeps_all_when_deviation_is_zero(self):
+        self.assertEqual(
+            bench_stats.reject_outliers([5.0, 5.0, 5.0, 9.0]),
+            ([5.0, 5.0, 5.0, 9.0], []))
+
+
+class TestAggregateTrials(unittest.TestCase):
+
+    def test_statistics(self):
+        _stats = bench_stats.aggregate_trials(
+            [{"iops": 10.0, "lat": 1.0}, {"iops": 12.0, "lat": 2.0},
+             {"iops": 14.0}])
+        # Only the metrics present in every trial are aggregated
+        self.assertEqual(list(_stats), ["iops"])
+        _iops = _stats["iops"]
+        self.assertEqual(_iops["n"], 3)
+        self.assertEqual(_iops["mean"], 12.0)
+        self.assertEqual(_iops["median"], 12.0)
+        self.assertEqual(_iops["stddev"], 2.0)
+        _margin = 4.303 * 2.0 / math.sqrt(3)
+        self.assertAlmostEqual(_iops["ci95"][0], 12.0 - _margin)
+        self.assertAlmostEqual(_iops["ci95"][1], 12.0 + _margin)
+        self.assertAlmostEqual(_iops["cv"], 2.0 / 12.0)
+        self.assertEqual(_iops["outliers"], [])
+
+    def test_outliers_are_left_out(self):
+        _stats = bench_stats.aggregate_trials(
+            [{"iops": v} for v in (10.0, 10.1, 9.9, 10.0, 50.0)])
+        self.assertEqual(_stats["iops"]["n"], 4)
+        self.assertEqual(_stats["iops"]["outliers"], [50.0])
+        self.assertAlmostEqual(_stats["iops"]["mean"], 10.0)
+
+    def test_single_trial(self):
+        _stats = bench_stats.aggregate_trials([{"iops": 10.0}])
+        self.assertEqual(_stats["iops"]["stddev"], 0.0)
+        self.assertEqual(_stats["iops"]["ci95"], [10.0, 10.0])
+
+    def test_no_trials(self):
+        self.assertEqual(bench_stats.aggregate_trials([]), {})
+
+
+class TestSteadyStateDetector(unittest.TestCase):
+
+    def test_steady_after_warmup(self):
+        _detector = bench_stats.SteadyStateDetector(window=3)
+        self.assertFalse(_detector.add({"iops": 50.0}))
+        self.assertFalse(_detector.add({"iops": 100.0}))
+        self.assertFalse(_detector.add({"iops": 101.0}))
+        self.assertTrue(_detector.add({"iops": 100.0}))
+        self.assertEqual(_detector.warmup, 1)
+        _summary = _detector.summary()
+        self.assertTrue(_summary["steady"])
+        self.assertEqual(_summary["samples"], 3)
+        self.assertEqual(_summary["metrics"]["iops"]["min"], 100.0)
+        self.assertEqual(_summary["metrics"]["iops"]["max"], 101.0)
+
+    def test_drift_is_not_steady(self):
+        # Each step is within the tolerance, the trend over the window is not
+        _detector = bench_stats.SteadyStateDetector(window=3)
+        for iops in (100.0, 103.0, 106.0):
+            _detector.add({"iops": iops})
+        self.assertFalse(_detector.stable)
+
+    def test_minimum_window(self):
+        self.assertEqual(bench_stats.SteadyStateDetector(window=1).window, 2)
+
+
+class TestFioTotals(unittest.TestCase):
+
+    def test_totals(self):
+        _totals = bench_stats.fio_totals({"jobs": [
+            _fio_job(100.0, 1000.0, 5000),
+            _fio_job(300.0, 2000.0, 9000, write_iops=50.0)]})
+        self.assertEqual(_totals["read_iops"], 400.0)
+        self.assertEqual(_totals["read_bw"], 1600.0)
+        # Latencies are weighted by the I/Os of each job
+        self.assertEqual(_totals["read_lat_ns"], 1750.0)
+        self.assertEqual(_totals["read_clat_p99_ns"], 9000)
+        self.assertEqual(_totals["write_iops"], 50.0)
+        self.assertEqual(_totals["write_clat_p99_ns"], 0)
+        self.assertEqual(_totals["iops"], 450.0)
+
+    def test_idle_direction(self):
+        _totals = bench_stats.fio_totals(
+            {"jobs": [_fio_job(100.0, 1000.0, 5000)]})
+        self.assertEqual(_totals["write_lat_ns"], 0.0)
+
+
+class TestFlatten(unittest.TestCase):
+
+    def test_numeric_leaves(self):
+        self.assertEqual(
+            bench_stats.flatten(
+                {"a": {"b": 1, "c": "text", "d": True}, "e": 2.5}, "x/"),
+            {"x/a/b": 1, "x/e": 2.5})
+
+    def test_delta_percent(self):
+        self.assertEqual(
+            bench_stats.delta_percent(
+                {"iops": 100.0, "lat": 0.0, "bw": 10.0}, {"iops": 90.0}),
+            {"iops": -10.0})
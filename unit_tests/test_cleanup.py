@@ -0,0 +1,170 @@
+# Copyright 2020 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+import cleanup
+
+
+class TestCleanupRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        self.registry = cleanup.CleanupRegistry(
+            os.path.join(self._dir.name, "cleanup.json"))
+
+    def test_register(self):
+        _key = self.registry.register(
+            "rados", "pool", "prefix_", objects=["run"])
+        self.assertEqual(_key, "rados:pool:prefix_")
+        _item = self.registry.items()[_key]
+        self.assertEqual(_item["state"], cleanup.PENDING)
+        self.assertEqual(_item["objects"], ["run"])
+        self.assertEqual(
+            self.registry.register("bucket", None, "bucket"),
+            "bucket::bucket")
+
+    def test_register_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            self.registry.register("pool", None, "pool")
+
+    def test_register_pending_item_again(self):
+        _key = self.registry.register("rbd", "pool", "image")
+        self.registry.update(_key, removed=3)
+        self.assertEqual(self.registry.register("rbd", "pool", "image"), _key)
+        self.assertEqual(self.registry.items()[_key]["removed"], 3)
+
+    def test_register_running_item_again(self):
+        _key = self.registry.register("rados", "pool", "prefix_")
+        self.registry.claim()
+        _again = self.registry.register("rados", "pool", "prefix_")
+        self.assertEqual(_again, "rados:pool:prefix_#2")
+        self.assertEqual(
+            self.registry.items()[_key]["state"], cleanup.RUNNING)
+        self.assertEqual(
+            self.registry.items()[_again]["state"], cleanup.PENDING)
+        # Registered once while pending
+        self.assertEqual(
+            self.registry.register("rados", "pool", "prefix_"), _again)
+        self.assertEqual(list(self.registry.claim()), [_again])
+
+    def test_register_done_item_again(self):
+        _key = self.registry.register("rbd", "pool", "image")
+        self.registry.update(_key, state=cleanup.DONE)
+        self.registry.register("rbd", "pool", "image")
+        self.assertEqual(
+            self.registry.items()[_key]["state"], cleanup.PENDING)
+
+    def test_claim(self):
+        _first = self.registry.register("rbd", "pool", "first")
+        _second = self.registry.register("rbd", "pool", "second")
+        self.assertEqual(list(self.registry.claim([_first])), [_first])
+        # Claimed items are not claimed again
+        self.assertEqual(list(self.registry.claim()), [_second])
+        self.assertEqual(self.registry.claim(), {})
+        self.assertEqual(
+            self.registry.items()[_first]["state"], cleanup.RUNNING)
+
+    def test_retry_and_forget(self):
+        _failed = self.registry.register("rbd", "pool", "failed")
+        _done = self.registry.register("rbd", "pool", "done")
+        self.registry.update(_failed, state=cleanup.FAILED)
+        self.registry.update(_done, state=cleanup.DONE)
+        self.assertEqual(
+            self.registry.progress()["states"],
+            {cleanup.FAILED: 1, cleanup.DONE: 1})
+        self.registry.retry_failed()
+        self.assertEqual(self.registry.forget_done(), 1)
+        self.assertEqual(
+            self.registry.progress()["states"], {cleanup.PENDING: 1})
+
+
+class TestCleanupWorker(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        self.registry = cleanup.CleanupRegistry(
+            os.path.join(self._dir.name, "cleanup.json"))
+        self.worker = cleanup.CleanupWorker(
+            self.registry, "client.woodpecker")
+        _patcher = mock.patch.object(self.worker, "_check_output")
+        self.check_output = _patcher.start()
+        self.addCleanup(_patcher.stop)
+
+    def test_remove_bucket(self):
+        _key = self.registry.register("bucket", None, "bucket")
+        self.assertEqual(self.worker.run(), 1)
+        self.check_output.assert_called_once_with([
+            "radosgw-admin", "bucket", "rm", "--bucket", "bucket",
+            "--purge-objects", "--bypass-gc", "-n", "client.woodpecker"])
+        self.assertEqual(self.registry.items()[_key]["state"], cleanup.DONE)
+
+    def test_remove_missing_bucket(self):
+        _key = self.registry.register("bucket", None, "bucket")
+        self.check_output.side_effect = subprocess.CalledProcessError(
+            2, "radosgw-admin",
+            stderr=b"could not remove bucket: No such file or directory")
+        self.worker.run()
+        self.assertEqual(self.registry.items()[_key]["state"], cleanup.DONE)
+
+    def test_remove_trashed_image(self):
+        _key = self.registry.register("rbd", "pool", "10ab2c", image="image")
+        self.worker.run()
+        # The image is removed from the trash by ID, never by name
+        self.check_output.assert_called_once_with([
+            "rbd", "trash", "rm", "-p", "pool", "-n", "client.woodpecker",
+            "--rbd-concurrent-management-ops", "64", "10ab2c"])
+        _item = self.registry.items()[_key]
+        self.assertEqual(_item["state"], cleanup.DONE)
+        self.assertEqual(_item["removed"], 1)
+
+    def test_remove_image_gone_from_trash(self):
+        _key = self.registry.register("rbd", "pool", "10ab2c")
+        self.check_output.side_effect = subprocess.CalledProcessError(
+            2, "rbd", stderr=b"No such file or directory")
+        self.worker.run()
+        self.assertEqual(self.registry.items()[_key]["state"], cleanup.DONE)
+
+    def test_remove_osd(self):
+        _key = self.registry.register("osd", None, "3")
+        self.worker.run([_key])
+        self.check_output.assert_called_once_with(
+            ["ceph", "osd", "in", "3", "-n", "client.woodpecker"])
+
+    def test_failure(self):
+        _key = self.registry.register("osd", None, "3")
+        self.check_output.side_effect = subprocess.CalledProcessError(
+            1, "ceph", stderr=b"permission denied")
+        self.worker.run()
+        _item = self.registry.items()[_key]
+        self.assertEqual(_item["state"], cleanup.FAILED)
+        self.assertEqual(_item["error"], "permission denied")
+
+    @mock.patch.object(cleanup, "rados", None)
+    def test_remove_rados_without_bindings(self):
+        self.registry.register("rados", "pool", "prefix_", objects=["run"])
+        self.worker.run()
+        self.check_output.assert_has_calls([
+            mock.call([
+                "rados", "-n", "client.woodpecker", "-p", "pool", "cleanup",
+                "-t", "64", "--prefix", "prefix_"]),
+            mock.call([
+                "rados", "-n", "client.woodpecker", "-p", "pool", "rm",
+                "run"])])
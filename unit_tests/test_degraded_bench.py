@@ -0,0 +1,96 @@
+# Copyright 2020 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import degraded_bench
+
+CLEAN = {"pgmap": {"pgs_by_state": [
+    {"state_name": "active+clean", "count": 120},
+    {"state_name": "active+clean+scrubbing+deep", "count": 8}]}}
+RECOVERING = {"pgmap": {
+    "recovering_bytes_per_sec": 1048576,
+    "recovering_objects_per_sec": 4,
+    "degraded_ratio": 0.25,
+    "pgs_by_state": [
+        {"state_name": "active+clean", "count": 100},
+        {"state_name": "active+recovering+degraded", "count": 20},
+        {"state_name": "active+undersized+degraded", "count": 8}]}}
+
+
+class TestParseOsds(unittest.TestCase):
+
+    def test_parse(self):
+        self.assertEqual(degraded_bench.parse_osds("7 osd.3 3"), [3, 7])
+        self.assertEqual(degraded_bench.parse_osds(None), [])
+
+    def test_invalid(self):
+        for value in ("osd.a", "-1", "host1"):
+            with self.assertRaises(ValueError):
+                degraded_bench.parse_osds(value)
+
+
+class TestRecoverySample(unittest.TestCase):
+
+    def test_clean(self):
+        _sample = degraded_bench.recovery_sample(CLEAN)
+        self.assertEqual(
+            _sample, {field: 0.0 for field in degraded_bench.RECOVERY_FIELDS})
+        self.assertFalse(degraded_bench.in_recovery(_sample))
+
+    def test_recovering(self):
+        _sample = degraded_bench.recovery_sample(RECOVERING)
+        self.assertEqual(_sample["recovering_bytes_per_sec"], 1048576.0)
+        self.assertEqual(_sample["degraded_ratio"], 0.25)
+        self.assertEqual(_sample["misplaced_ratio"], 0.0)
+        self.assertEqual(_sample["pgs_unclean"], 28.0)
+        self.assertTrue(degraded_bench.in_recovery(_sample))
+
+    def test_wait_for_clean(self):
+        _statuses = [RECOVERING, RECOVERING, CLEAN]
+        self.assertTrue(degraded_bench.wait_for_clean(
+            lambda: _statuses.pop(0), 60, interval=0))
+        self.assertEqual(_statuses, [])
+        self.assertFalse(degraded_bench.wait_for_clean(
+            lambda: RECOVERING, 0, interval=0))
+
+
+class TestSummarize(unittest.TestCase):
+
+    def test_summary(self):
+        _recovery = degraded_bench.recovery_sample(RECOVERING)
+        _series = [
+            {"seconds": 0.0, "client": {"iops": 50.0},
+             "recovery": _recovery},
+            {"seconds": 10.0, "client": {"iops": 70.0},
+             "recovery": dict(_recovery, recovering_bytes_per_sec=0.0)}]
+        _summary = degraded_bench.summarize(
+            _series, [{"iops": 100.0}], recovered=20.0)
+        self.assertEqual(_summary["degraded"], {"iops": 60.0})
+        self.assertEqual(_summary["healthy"], {"iops": 100.0})
+        self.assertEqual(_summary["delta-percent"], {"iops": -40.0})
+        self.assertEqual(
+            _summary["recovery"]["bytes_per_sec_mean"], 524288.0)
+        self.assertEqual(
+            _summary["recovery"]["bytes_per_sec_max"], 1048576.0)
+        self.assertEqual(_summary["recovery"]["completed"], 1)
+        self.assertEqual(_summary["recovery"]["seconds"], 20.0)
+
+    def test_recovery_not_completed(self):
+        _summary = degraded_bench.summarize([{
+            "seconds": 0.0, "client": {"iops": 50.0},
+            "recovery": degraded_bench.recovery_sample(RECOVERING)}])
+        self.assertEqual(_summary["recovery"]["completed"], 0)
+        self.assertNotIn("seconds", _summary["recovery"])
+        self.assertNotIn("delta-percent", _summary)
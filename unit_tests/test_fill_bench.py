@@ -0,0 +1,112 @@
+# Copyright 2020 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import unittest
+
+import fill_bench
+
+GIB = 1 << 30
+
+
+def _df(stored, max_avail, bytes_used=None):
+    return {
+        "stats": {
+            "total_bytes": 1000 * GIB,
+            "total_used_raw_bytes": 300 * GIB,
+            "total_avail_bytes": 700 * GIB},
+        "pools": [
+            {"name": "other", "stats": {"stored": 0, "max_avail": 0}},
+            {"name": "pool", "stats": {
+                "stored": stored, "max_avail": max_avail,
+                "bytes_used": stored * 3 if bytes_used is None
+                else bytes_used}}]}
+
+
+class TestFillLevel(unittest.TestCase):
+
+    def test_stage_targets(self):
+        self.assertEqual(
+            [round(target, 6)
+             for target in fill_bench.stage_targets(0.8, 4)],
+            [0.2, 0.4, 0.6, 0.8])
+
+    def test_pool_fill_level(self):
+        self.assertAlmostEqual(
+            fill_bench.fill_level(_df(30 * GIB, 70 * GIB), "pool"), 0.3)
+
+    def test_cluster_fill_level(self):
+        self.assertAlmostEqual(
+            fill_bench.fill_level(
+                _df(30 * GIB, 70 * GIB), "pool", "cluster"), 0.3)
+
+    def test_unknown_pool(self):
+        with self.assertRaises(KeyError):
+            fill_bench.fill_level(_df(0, 0), "missing")
+        with self.assertRaises(KeyError):
+            fill_bench.bytes_to_fill(_df(0, 0), "missing", "pool", 0.5)
+
+    def test_bytes_to_fill_pool(self):
+        _df_pool = _df(30 * GIB, 70 * GIB)
+        self.assertEqual(
+            fill_bench.bytes_to_fill(_df_pool, "pool", "pool", 0.5),
+            20 * GIB)
+        self.assertEqual(
+            fill_bench.bytes_to_fill(_df_pool, "pool", "pool", 0.2), 0)
+
+    def test_bytes_to_fill_cluster(self):
+        # Every byte stored takes 3 raw bytes
+        self.assertEqual(
+            fill_bench.bytes_to_fill(
+                _df(30 * GIB, 70 * GIB), "pool", "cluster", 0.6),
+            100 * GIB)
+
+    def test_bytes_to_fill_empty_pool(self):
+        # The raw cost of a byte comes from the available space
+        self.assertEqual(
+            fill_bench.bytes_to_fill(
+                _df(0, 350 * GIB), "pool", "cluster", 0.65),
+            175 * GIB)
+
+
+class TestDegradationFill(unittest.TestCase):
+
+    def test_first_stage_below_threshold(self):
+        _stages = [
+            {"fill": 0.2, "probe": {"iops": 100.0}},
+            {"fill": 0.4, "probe": {"iops": 95.0}},
+            {"fill": 0.6, "probe": {"iops": 80.0}},
+            {"fill": 0.8, "probe": {"iops": 60.0}}]
+        self.assertEqual(fill_bench.degradation_fill(_stages, 10), 0.6)
+        self.assertIsNone(fill_bench.degradation_fill(_stages, 50))
+
+    def test_no_reference(self):
+        self.assertIsNone(fill_bench.degradation_fill([], 10))
+        self.assertIsNone(fill_bench.degradation_fill(
+            [{"fill": 0.2, "probe": {"iops": 0.0}}], 10))
+
+
+class TestFillState(unittest.TestCase):
+
+    def test_save_load_remove(self):
+        with tempfile.TemporaryDirectory() as path:
+            _store = fill_bench.FillState(
+                os.path.join(path, "woodpecker", "fill-bench.json"))
+            self.assertIsNone(_store.load())
+            _store.save({"next-index": 3})
+            self.assertEqual(_store.load(), {"next-index": 3})
+            _store.remove()
+            self.assertIsNone(_store.load())
+            _store.remove()
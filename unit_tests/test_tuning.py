@@ -0,0 +1,91 @@
+# Copyright 2020 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import tuning
+
+
+class TestOverrides(unittest.TestCase):
+
+    def test_parse_overrides(self):
+        self.assertEqual(
+            tuning.parse_overrides("rbd_cache=false ms_type=async+posix"),
+            {"rbd_cache": "false", "ms_type": "async+posix"})
+        self.assertEqual(tuning.parse_overrides(None), {})
+
+    def test_invalid_overrides(self):
+        for value in ("rbd_cache", "=false", "rbd_cache="):
+            with self.assertRaises(ValueError):
+                tuning.parse_overrides(value)
+
+    def test_parse_matrix(self):
+        _matrix = tuning.parse_matrix(
+            "rbd_cache=true,false rbd_cache_size=1,2", {"debug_ms": "0"})
+        self.assertEqual(len(_matrix), 4)
+        self.assertIn(
+            {"debug_ms": "0", "rbd_cache": "false", "rbd_cache_size": "2"},
+            _matrix)
+
+    def test_render_overrides(self):
+        self.assertEqual(
+            tuning.render_overrides(
+                "[global]\nfsid = 1\n", {"b": "2", "a": "1"}),
+            "[global]\nfsid = 1\n# Client overrides of this run\n"
+            "[client]\na = 1\nb = 2\n")
+
+
+class TestRank(unittest.TestCase):
+
+    def test_default_metric_prefers_total_iops(self):
+        self.assertEqual(
+            tuning.default_rank_metric(
+                {"delta-percent/iops": 1.0, "read_iops": 1.0, "iops": 1.0}),
+            "iops")
+
+    def test_default_metric_skips_relative_metrics(self):
+        self.assertEqual(
+            tuning.default_rank_metric(
+                {"change-percent/read_iops": 1.0, "write_bw": 1.0}),
+            "write_bw")
+        self.assertIsNone(tuning.default_rank_metric({"seconds": 1.0}))
+
+    def test_rank_throughput(self):
+        _ranking = tuning.rank([
+            ({"rbd_cache": "false"}, {"iops": 10.0}),
+            ({"rbd_cache": "true"}, {"iops": 20.0})])
+        self.assertEqual(
+            [run["ceph-config"] for run in _ranking],
+            [{"rbd_cache": "true"}, {"rbd_cache": "false"}])
+        self.assertEqual(_ranking[0]["rank"], 1)
+        self.assertEqual(_ranking[0]["metric"], "iops")
+
+    def test_rank_latency(self):
+        _ranking = tuning.rank([
+            ({"a": "1"}, {"read_clat_p99_ns": 20.0}),
+            ({"a": "2"}, {"read_clat_p99_ns": 10.0}),
+            ({"a": "3"}, {})], metric="read_clat_p99_ns")
+        self.assertEqual(
+            [run["value"] for run in _ranking], [10.0, 20.0])
+
+    def test_rank_mean_latency(self):
+        _ranking = tuning.rank([
+            ({"a": "1"}, {"read_lat_ns": 2000.0}),
+            ({"a": "2"}, {"read_lat_ns": 1000.0})], metric="read_lat_ns")
+        self.assertEqual(
+            [run["ceph-config"] for run in _ranking],
+            [{"a": "2"}, {"a": "1"}])
+        self.assertTrue(tuning.lower_is_better("Average Latency(s)"))
+        self.assertTrue(tuning.lower_is_better("4194304/16/write/latency-s"))
+        self.assertFalse(tuning.lower_is_better("read_iops"))